@@ -1,32 +1,46 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
+import sys
 
+# The GUI imports these on its worker thread once the window is up; they are
+# listed so a lazily imported module can never be left out of the build.
+lazy_imports = ['parser', 'pipeline', 'formatter', 'snapshot', 'api_client', 'fetch_engine',
+                'card_cache', 'bulk_data', 'name_index', 'requests', 'tkinter.filedialog',
+                'tkinter.simpledialog']
+
+# A prebuilt name index (python bulk_data.py FILE --export-index name_index.bin)
+# is shipped when present; it is loaded as-is instead of being built at launch.
+bundled_data = [('name_index.bin', '.')] if os.path.exists('name_index.bin') else []
 
 a = Analysis(
     ['main_gui.py'],
     pathex=[],
     binaries=[],
-    datas=[],
-    hiddenimports=[],
+    datas=bundled_data,
+    hiddenimports=lazy_imports,
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['numpy', 'PIL'],  # Only used by the command-line statistics and image export.
     noarchive=False,
     optimize=0,
 )
 pyz = PYZ(a.pure)
 
+# One self-contained executable on Windows and Linux; an .app bundle on macOS.
+onefile = sys.platform != 'darwin'
+
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
+    *([a.binaries, a.datas] if onefile else []),
     [],
+    exclude_binaries=not onefile,
     name='MtgDeckFormatter',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=False,  # UPX-packed libraries are unpacked on every launch, which slows start-up.
     upx_exclude=[],
     runtime_tmpdir=None,
     console=False,
@@ -36,3 +50,19 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
 )
+
+if not onefile:
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='MtgDeckFormatter',
+    )
+    app = BUNDLE(
+        coll,
+        name='MtgDeckFormatter.app',
+        bundle_identifier=None,
+    )
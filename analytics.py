@@ -0,0 +1,248 @@
+# analytics.py
+import re
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from formatter import WIDTH
+from models import Card, CardData
+from parser import UNCOUNTED_SECTIONS
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for deck statistics.
+    np = None
+
+# ----- Tweakables -----
+COLORS = "WUBRG"
+CARD_TYPES = ('Creature', 'Instant', 'Sorcery', 'Artifact', 'Enchantment', 'Planeswalker', 'Land', 'Battle')
+RARITIES = ('common', 'uncommon', 'rare', 'mythic', 'special', 'bonus')
+MAX_CURVE = 7  # Mana values of 7 and more share the last curve bucket.
+MOST_PLAYED = 25
+
+_LAND = 1 << CARD_TYPES.index('Land')
+_SYMBOL = re.compile(r'\{([^}]+)\}')
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("Deck statistics need NumPy: pip install numpy")
+
+
+def _pips(mana_cost: str) -> List[int]:
+    """Colored pips per color of a mana cost; hybrid and Phyrexian symbols count for each of their colors."""
+    counts = [0] * len(COLORS)
+    for symbol in _SYMBOL.findall(mana_cost or ''):
+        for part in symbol.split('/'):
+            i = COLORS.find(part)
+            if i >= 0 and len(part) == 1:
+                counts[i] += 1
+    return counts
+
+
+def _type_flags(type_line: str) -> int:
+    words = set((type_line or '').replace('—', ' ').split())
+    return sum(1 << i for i, name in enumerate(CARD_TYPES) if name in words)
+
+
+class Corpus:
+    """
+    Deck statistics for one deck or thousands, computed with NumPy.
+
+    Every distinct card (CardData) becomes one row of a set of columnar
+    arrays: mana value, a WUBRG color bitmask, colored pips per color, a
+    bitmask of card types, rarity and price. Deck membership is a sparse
+    deck x card quantity matrix kept as COO triples, so curves, breakdowns
+    and totals for every deck at once are a handful of bincounts.
+
+    Statistics describe the front face, which is the one that is cast, and
+    leave meld results out since they are never in a deck themselves, as
+    well as maybeboard cards.
+    """
+
+    def __init__(self):
+        _require_numpy()
+        self.deck_names: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._cards: List[CardData] = []
+        self._deck_idx = array('i')
+        self._card_idx = array('i')
+        self._qty = array('i')
+        self._columns: Optional[Dict[str, 'np.ndarray']] = None
+
+    def __len__(self) -> int:
+        return len(self.deck_names)
+
+    def _row(self, data: CardData) -> int:
+        key = data.id or data.name
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = len(self._cards)
+            self._cards.append(data)
+            self._columns = None
+        return row
+
+    def add_deck(self, name: str, deck: Iterable[Card]) -> int:
+        """Adds a resolved deck and returns its index."""
+        index = len(self.deck_names)
+        self.deck_names.append(name)
+        for card in deck:
+            if card.section in UNCOUNTED_SECTIONS:
+                continue
+            self._deck_idx.append(index)
+            self._card_idx.append(self._row(card.data))
+            self._qty.append(card.quantity)
+        return index
+
+    def columns(self) -> Dict[str, 'np.ndarray']:
+        """The per-card arrays, one row per distinct card, encoded on first use after cards were added."""
+        if self._columns is not None:
+            return self._columns
+        cards = self._cards
+        n = len(cards)
+        mana_value = np.fromiter((c.mana_value for c in cards), dtype=np.float32, count=n)
+        colors = np.fromiter((sum(1 << COLORS.index(x) for x in set(c.colors) if x in COLORS) for c in cards),
+                             dtype=np.uint8, count=n)
+        fronts = [c.card_faces[0] if c.card_faces else None for c in cards]
+        pips = np.array([_pips(f.mana_cost) if f else [0] * len(COLORS) for f in fronts],
+                        dtype=np.int16).reshape(n, len(COLORS))
+        types = np.fromiter((_type_flags(f.type_line) if f else 0 for f in fronts), dtype=np.uint16, count=n)
+        rarity = np.fromiter((RARITIES.index(c.rarity) if c.rarity in RARITIES else -1 for c in cards),
+                             dtype=np.int8, count=n)
+        price = np.fromiter((float(c.price_eur) if c.price_eur else np.nan for c in cards),
+                            dtype=np.float64, count=n)
+        self._columns = {'mana_value': mana_value, 'colors': colors, 'pips': pips,
+                         'types': types, 'rarity': rarity, 'price': price}
+        return self._columns
+
+    def matrix(self) -> Tuple['np.ndarray', 'np.ndarray', 'np.ndarray']:
+        """The deck x card quantity matrix as COO (deck index, card index, quantity) arrays."""
+        return (np.frombuffer(self._deck_idx, dtype=np.int32), np.frombuffer(self._card_idx, dtype=np.int32),
+                np.frombuffer(self._qty, dtype=np.int32))
+
+    def per_deck(self) -> Dict[str, 'np.ndarray']:
+        """Every statistic for every deck at once: arrays with one row per deck."""
+        cols = self.columns()
+        deck, card, qty = self.matrix()
+        n = len(self.deck_names)
+        qty = qty.astype(np.float64)
+
+        def tally(weights, buckets=None, size=1):
+            index = deck if buckets is None else deck * size + buckets
+            counts = np.bincount(index, weights=weights, minlength=n * size)
+            return counts if buckets is None else counts.reshape(n, size)
+
+        types = cols['types'][card]
+        nonland = qty * ((types & _LAND) == 0)
+        curve_bucket = np.minimum(cols['mana_value'][card], MAX_CURVE).astype(np.int64)
+        type_bits = (types[:, None] >> np.arange(len(CARD_TYPES), dtype=np.uint16)) & 1
+        rarity = cols['rarity'][card].astype(np.int64)
+        known = rarity >= 0
+        price = cols['price'][card]
+        priced = ~np.isnan(price)
+
+        return {
+            'cards': tally(qty),
+            'unique_cards': tally(None),
+            'nonland_cards': tally(nonland),
+            'mana_value_sum': tally(nonland * cols['mana_value'][card]),
+            'curve': tally(nonland, curve_bucket, MAX_CURVE + 1),
+            'color_pips': np.stack([tally(qty * cols['pips'][card, i]) for i in range(len(COLORS))], axis=1),
+            'colors': np.stack([tally(qty * ((cols['colors'][card] >> i) & 1)) for i in range(len(COLORS))],
+                               axis=1),
+            'types': np.stack([tally(qty * type_bits[:, i]) for i in range(len(CARD_TYPES))], axis=1),
+            'rarity': tally(qty * known, np.where(known, rarity, 0), len(RARITIES)),
+            'price': tally(np.where(priced, price, 0.0) * qty),
+            'unpriced_cards': tally(qty * ~priced),
+        }
+
+    def play_rates(self) -> Tuple['np.ndarray', 'np.ndarray']:
+        """Per distinct card: the number of decks that play it, and the copies played across all decks."""
+        deck, card, qty = self.matrix()
+        n = len(self._cards)
+        # A card listed twice in one deck (main deck and sideboard) counts as one deck.
+        pairs = np.unique(deck.astype(np.int64) * max(n, 1) + card)
+        decks = np.bincount(pairs % max(n, 1), minlength=n)
+        return decks, np.bincount(card, weights=qty, minlength=n)
+
+    def summary(self, deck: Optional[int] = None) -> Dict:
+        """
+        JSON-ready statistics of one deck (by index) or, by default, of the
+        whole corpus, where counts are summed over all decks and the most
+        played cards and average deck price are added.
+        """
+        stats = self.per_deck()
+        if deck is not None:
+            stats = {name: values[deck] for name, values in stats.items()}
+        else:
+            stats = {name: values.sum(axis=0) for name, values in stats.items()}
+
+        def counts(values, labels):
+            return {label: int(v) for label, v in zip(labels, values)}
+
+        curve_labels = [str(i) for i in range(MAX_CURVE)] + [f"{MAX_CURVE}+"]
+        result = {
+            'cards': int(stats['cards']),
+            'nonland_cards': int(stats['nonland_cards']),
+            'average_mana_value': round(float(stats['mana_value_sum'] / stats['nonland_cards']), 2)
+            if stats['nonland_cards'] else 0.0,
+            'curve': counts(stats['curve'], curve_labels),
+            'color_pips': counts(stats['color_pips'], COLORS),
+            'colors': counts(stats['colors'], COLORS),
+            'types': counts(stats['types'], CARD_TYPES),
+            'rarity': counts(stats['rarity'], RARITIES),
+            'price_total': round(float(stats['price']), 2),
+            'unpriced_cards': int(stats['unpriced_cards']),
+        }
+        if deck is not None:
+            result['unique_cards'] = int(stats['unique_cards'])
+            return result
+
+        decks, copies = self.play_rates()
+        top = np.argsort(-decks, kind='stable')[:MOST_PLAYED]
+        result.update({
+            'decks': len(self.deck_names),
+            'unique_cards': len(self._cards),
+            'average_deck_price': round(result['price_total'] / len(self.deck_names), 2) if self.deck_names else 0.0,
+            'most_played': [{'name': self._cards[i].name, 'decks': int(decks[i]), 'copies': int(copies[i])}
+                            for i in top],
+        })
+        return result
+
+
+def deck_stats(deck: Iterable[Card]) -> Dict:
+    """Statistics of a single resolved deck (see Corpus.summary)."""
+    corpus = Corpus()
+    corpus.add_deck('deck', deck)
+    return corpus.summary(0)
+
+
+def _bar(value: int, peak: int, width: int) -> str:
+    return "█" * (round(value / peak * width) if peak else 0)
+
+
+def format_summary(deck: Iterable[Card], width: int = WIDTH) -> str:
+    """A 'Deck Statistics' section to print below the text report."""
+    stats = deck_stats(deck)
+    rule = "─" * width
+    lines = [rule, " DECK STATISTICS ".center(width), rule, "Mana Curve (nonland):"]
+    peak = max(stats['curve'].values())
+    label_width = max(len(label) for label in stats['curve'])
+    for label, count in stats['curve'].items():
+        bar_width = width - label_width - 12
+        bar = _bar(count, peak, bar_width)
+        lines.append(f"  {label.rjust(label_width)} │ {bar + ' ' if bar else ''}{count}")
+    lines.append(f"  Average mana value: {stats['average_mana_value']:.2f}")
+
+    def joined(title, items):
+        shown = [f"{label} {count}" for label, count in items if count]
+        return f"{title}: " + ("   •   ".join(shown) if shown else "None")
+
+    lines.append("")
+    lines.append(joined("Color Pips", stats['color_pips'].items()))
+    lines.append(joined("Types", stats['types'].items()))
+    lines.append(joined("Rarity", ((r.title(), n) for r, n in stats['rarity'].items())))
+    price = f"Total Price: €{stats['price_total']:.2f}"
+    if stats['unpriced_cards']:
+        price += f" ({stats['unpriced_cards']} cards without a price)"
+    lines.append(price)
+    return "\n".join(lines) + "\n"
@@ -1,27 +1,150 @@
 # api_client.py
-import requests
-import time
-from typing import Dict, Optional
+import atexit
+import os
+import sqlite3
+import threading
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional
+
+import fetch_engine
+import metrics
+from bulk_data import OfflineStore, default_store_path
+from card_cache import CachedCard, CardCache, normalize_name
+from name_index import NameIndex, bundled_index_path, resolve_queries
+
+if TYPE_CHECKING:
+    import requests
 
 SCRYFALL_API_BASE = "https://api.scryfall.com"
 
+# Scryfall accepts at most 75 identifiers per /cards/collection request.
+COLLECTION_BATCH_SIZE = 75
+
+# Expired cache entries with an ETag/Last-Modified are revalidated with one
+# conditional GET each; beyond this many, re-fetching them through
+# /cards/collection is faster than waiting for that many requests. Entries
+# that came from /cards/collection have no validators (the endpoint only has
+# one ETag for the whole batch) and are always re-fetched in batches.
+REVALIDATE_LIMIT = 100
+
+_UNSET = object()
+_card_cache = _UNSET
+_offline_store: Optional[OfflineStore] = None
+_name_index = _UNSET
+
+
+def get_card_cache() -> Optional[CardCache]:
+    """Returns the shared on-disk card cache, opening it on first use."""
+    global _card_cache
+    if _card_cache is _UNSET:
+        try:
+            _card_cache = CardCache()
+            # Writes the access times the cache batches in memory.
+            atexit.register(_card_cache.close)
+        except (OSError, sqlite3.Error) as err:
+            print(f"Card cache unavailable, continuing without it: {err}")
+            _card_cache = None
+    return _card_cache
+
+
+def set_card_cache(cache: Optional[CardCache]):
+    """Replaces the shared card cache. Pass None to disable caching."""
+    global _card_cache
+    _card_cache = cache
+
+
+def set_offline_store(store: Optional[OfflineStore]):
+    """
+    Switches the client to offline mode: every lookup is answered from an
+    imported bulk-data store and no network requests are made. Pass None to
+    go back online.
+    """
+    global _offline_store, _name_index
+    _offline_store = store
+    _name_index = _UNSET
+
+
+def get_name_index() -> Optional[NameIndex]:
+    """
+    Returns the local name index used to resolve names before fetching.
+
+    It is loaded on first use from the offline store if one is set, otherwise
+    from a bulk-data store at the default location if one has been imported,
+    otherwise from an index bundled with the app. Stores keep a prebuilt
+    copy of their index, so none of these is built from scratch at launch.
+    Without any of them there is no index and names go to Scryfall.
+    """
+    global _name_index
+    if _name_index is _UNSET:
+        _name_index = None
+        store = _offline_store
+        if store is None and os.path.exists(default_store_path()):
+            store = OfflineStore()
+        if store is not None:
+            _name_index = store.name_index()
+        else:
+            _name_index = NameIndex.load(bundled_index_path())
+    return _name_index
+
+
+def set_name_index(index: Optional[NameIndex]):
+    """Replaces the local name index. Pass None to always resolve names remotely."""
+    global _name_index
+    _name_index = index
+
+
+def _fetch_offline(card_name: str) -> Optional[Dict]:
+    card = _offline_store.get_by_name(card_name)
+    if card is None:
+        # The local index stands in for Scryfall's server-side fuzzy matching.
+        match = get_name_index().resolve(card_name)
+        if match:
+            card = _offline_store.get_by_id(match.card_id)
+    if card is None:
+        print(f"Error: Card '{card_name}' not found in the offline store.")
+    return card
+
+
+@metrics.timed('fetch_card_data')
 def fetch_card_data(card_name: str) -> Optional[Dict]:
     """
     Fetches card data from the Scryfall API for a given card name.
 
     Uses the 'fuzzy' search to accommodate minor typos or variations.
     Returns the JSON response as a dictionary, or None if the card is not found.
+    Cards already in the card cache are returned without a network call
+    (expired ones are revalidated), and a name that another thread is already
+    fetching is not requested again.
     """
-    # Scryfall API good practice: wait 50-100ms between requests.
-    time.sleep(0.1) 
-    
+    if _offline_store:
+        return _fetch_offline(card_name)
+
+    cache = get_card_cache()
+    if cache:
+        cached = cache.get_by_name(card_name, allow_stale=True)
+        if cached and not cached.stale:
+            return cached
+        if cached and cached.has_validators:
+            return refresh_card(cached)
+
+    # Concurrent lookups of the same name share one request.
+    return fetch_engine.flights.do(('named', normalize_name(card_name)),
+                                   lambda: _fetch_named(card_name, cache))
+
+
+def _fetch_named(card_name: str, cache: Optional[CardCache]) -> Optional[Dict]:
+    # requests is imported where it is needed, so offline runs never load the HTTP stack.
+    import requests
+    # Pacing, retries and timeouts are handled by the shared fetch engine.
     url = f"{SCRYFALL_API_BASE}/cards/named"
     params = {'fuzzy': card_name}
-    
+
     try:
-        response = requests.get(url, params=params)
+        response = fetch_engine.request('GET', url, params=params)
         response.raise_for_status()  # Raises an HTTPError for bad responses (4xx or 5xx)
-        return response.json()
+        card = response.json()
+        if cache:
+            _put(cache, card, response, aliases=[card_name])
+        return card
     except requests.exceptions.HTTPError as err:
         if err.response.status_code == 404:
             print(f"Error: Card '{card_name}' not found.")
@@ -30,4 +153,442 @@ def fetch_card_data(card_name: str) -> Optional[Dict]:
         return None
     except requests.exceptions.RequestException as err:
         print(f"Request Error fetching '{card_name}': {err}")
-        return None
\ No newline at end of file
+        return None
+
+
+@metrics.timed('fetch_card_printing')
+def fetch_card_printing(set_code: str, collector_number: str) -> Optional[Dict]:
+    """
+    Fetches one exact printing by set code and collector number.
+    Returns the JSON response as a dictionary, or None if there is no such printing.
+    """
+    if _offline_store:
+        return _offline_store.get_by_printing(set_code, collector_number)
+
+    cache = get_card_cache()
+    if cache:
+        cached = cache.get_by_printing(set_code, collector_number, allow_stale=True)
+        if cached and not cached.stale:
+            return cached
+        if cached and cached.has_validators:
+            return refresh_card(cached)
+
+    key = ('printing', set_code.lower(), collector_number.lower())
+    return fetch_engine.flights.do(key, lambda: _fetch_printing(set_code, collector_number, cache))
+
+
+def _fetch_printing(set_code: str, collector_number: str, cache: Optional[CardCache]) -> Optional[Dict]:
+    url = f"{SCRYFALL_API_BASE}/cards/{set_code.lower()}/{collector_number}"
+    label = f"{set_code.upper()} #{collector_number}"
+    import requests
+    try:
+        response = fetch_engine.request('GET', url)
+        response.raise_for_status()
+        card = response.json()
+        if cache:
+            _put(cache, card, response)
+        return card
+    except requests.exceptions.HTTPError as err:
+        if err.response.status_code == 404:
+            print(f"Error: Printing {label} not found.")
+        else:
+            print(f"HTTP Error fetching {label}: {err}")
+        return None
+    except requests.exceptions.RequestException as err:
+        print(f"Request Error fetching {label}: {err}")
+        return None
+
+
+def _put(cache: CardCache, card: Dict, response: 'requests.Response', aliases=()):
+    cache.put(card, aliases=aliases, etag=response.headers.get('ETag'),
+              last_modified=response.headers.get('Last-Modified'))
+
+
+def refresh_card(stale: CachedCard) -> Optional[Dict]:
+    """
+    Revalidates an expired cache entry with a conditional GET on /cards/{id}.
+
+    Returns the cached card if the server answers 304 Not Modified, the new
+    card on 200, the stale card if the request fails, or None if the card no
+    longer exists.
+    """
+    return fetch_engine.flights.do(('revalidate', stale['id']), lambda: _revalidate(stale, get_card_cache()))
+
+
+def _revalidate(stale: CachedCard, cache: Optional[CardCache]) -> Optional[Dict]:
+    import requests
+    headers = {}
+    if stale.etag:
+        headers['If-None-Match'] = stale.etag
+    if stale.last_modified:
+        headers['If-Modified-Since'] = stale.last_modified
+
+    try:
+        response = fetch_engine.request('GET', f"{SCRYFALL_API_BASE}/cards/{stale['id']}", headers=headers)
+    except requests.exceptions.RequestException as err:
+        print(f"Request Error revalidating '{stale['name']}', using the cached data: {err}")
+        return stale
+
+    if response.status_code == 304:
+        if cache:
+            cache.revalidated(stale['id'])
+        stale.stale = False
+        return stale
+    if response.status_code == 404:
+        print(f"Error: Card '{stale['name']}' no longer exists.")
+        return None
+    if not response.ok:
+        print(f"HTTP Error revalidating '{stale['name']}', using the cached data: {response.status_code}")
+        return stale
+
+    card = response.json()
+    if cache:
+        _put(cache, card, response)
+    return card
+
+
+def _identifier_key(identifier: Dict) -> tuple:
+    """Hashable, case-insensitive form of a /cards/collection identifier."""
+    return tuple(sorted((k, str(v).lower()) for k, v in identifier.items()))
+
+
+@metrics.timed('fetch_collection')
+def _fetch_collection(identifiers: List[Dict], cancel: Optional[threading.Event] = None) -> Optional[Dict]:
+    """
+    Posts one chunk of identifiers to /cards/collection.
+
+    Returns the decoded list object ({'data': [...], 'not_found': [...]}),
+    or None if the whole request failed. Raises fetch_engine.Cancelled if
+    cancel was set before the request went out.
+    """
+    import requests
+    url = f"{SCRYFALL_API_BASE}/cards/collection"
+    try:
+        response = fetch_engine.request('POST', url, cancel=cancel, json={'identifiers': identifiers})
+        response.raise_for_status()
+        return response.json()
+    except requests.exceptions.RequestException as err:
+        print(f"Request Error fetching a batch of {len(identifiers)} cards: {err}")
+        return None
+
+
+def _fold(value: str) -> str:
+    return " ".join(value.casefold().split())
+
+
+def _identifier_match(identifier: Dict) -> tuple:
+    """The key under which _card_matches files the card an identifier asks for."""
+    if 'id' in identifier:
+        return ('id', identifier['id'].lower())
+    if 'collector_number' in identifier:
+        return ('printing', identifier['set'].lower(), identifier['collector_number'].lower())
+    if 'set' in identifier:
+        return ('name', _fold(identifier['name']), identifier['set'].lower())
+    return ('name', _fold(identifier['name']))
+
+
+def _card_matches(card: Dict) -> List[tuple]:
+    """Every _identifier_match key a card from /cards/collection answers: id, printing, name and face names."""
+    set_code = (card.get('set') or '').lower()
+    names = {_fold(card.get('name', ''))}
+    names.update(_fold(face['name']) for face in card.get('card_faces') or [] if face.get('name'))
+    keys = [('id', (card.get('id') or '').lower()),
+            ('printing', set_code, str(card.get('collector_number', '')).lower())]
+    for name in names:
+        keys.append(('name', name))
+        keys.append(('name', name, set_code))
+    return keys
+
+
+def _query_identifier(query: Dict) -> Dict:
+    """
+    The /cards/collection identifier for a parsed (and possibly index-resolved)
+    query. A set code and collector number pin an exact printing; a set code
+    alone narrows a name to that set.
+    """
+    if query.get('set') and query.get('collector_number'):
+        return {'set': query['set'], 'collector_number': query['collector_number']}
+    if query.get('set'):
+        return {'name': query['name'], 'set': query['set']}
+    if query.get('id'):
+        return {'id': query['id']}
+    return {'name': query['name']}
+
+
+def query_key(query: Dict) -> tuple:
+    """A hashable key that is equal for queries that resolve to the same card or printing."""
+    return _identifier_key(_query_identifier(query))
+
+
+def _fetch_cached(query: Dict, cache: CardCache) -> Optional[CachedCard]:
+    """The cache entry for a query, fresh or stale."""
+    identifier = _query_identifier(query)
+    if 'collector_number' in identifier:
+        return cache.get_by_printing(identifier['set'], identifier['collector_number'], allow_stale=True)
+    if 'set' in identifier:
+        cached = cache.get_by_name(identifier['name'], allow_stale=True)
+        return cached if cached and cached.get('set', '').lower() == identifier['set'].lower() else None
+    if 'id' in identifier:
+        return cache.get_by_id(identifier['id'], allow_stale=True)
+    return cache.get_by_name(identifier['name'], allow_stale=True)
+
+
+def _fetch_single(query: Dict) -> Optional[Dict]:
+    """Resolves a query the collection endpoint could not: exact printing first, then by name."""
+    if query.get('set') and query.get('collector_number'):
+        card = fetch_card_printing(query['set'], query['collector_number'])
+        if card:
+            return card
+    return fetch_card_data(query.get('query_name', query['name']))
+
+
+def _resolve_chunk(chunk: List[Dict], cache: Optional[CardCache],
+                   cancel: Optional[threading.Event] = None) -> Dict[tuple, Optional[Dict]]:
+    """
+    Resolves one /cards/collection-sized chunk of queries, falling back to
+    fuzzy lookups. Raises fetch_engine.Cancelled once cancel is set.
+    """
+    identifiers = [_query_identifier(query) for query in chunk]
+    result = _fetch_collection(identifiers, cancel)
+    if cancel is not None and cancel.is_set():
+        raise fetch_engine.Cancelled()
+
+    # Returned cards are matched to identifiers by what they are, not by
+    # position, so a reordered or de-duplicated response cannot mix them up.
+    found: Dict[tuple, Dict] = {}
+    not_found = set()
+    if result is not None:
+        for card in result.get('data', []):
+            for match in _card_matches(card):
+                found.setdefault(match, card)
+        not_found = {_identifier_key(i) for i in result.get('not_found', [])}
+
+    resolved = {}
+    for query, identifier in zip(chunk, identifiers):
+        key = _identifier_key(identifier)
+        card = None if key in not_found else found.get(_identifier_match(identifier))
+        if card is None:
+            resolved[key] = _fetch_single(query)
+            continue
+        if cache:
+            cache.put(card, aliases=[query['name'], query.get('query_name', '')])
+        resolved[key] = card
+    return resolved
+
+
+def fetch_many(card_names: List[str]) -> List[Optional[Dict]]:
+    """Runs fetch_card_data for several names concurrently, keeping their order."""
+    return list(fetch_engine.get_executor().map(fetch_card_data, card_names))
+
+
+def iter_cards_batch(card_queries: List[Dict],
+                     on_batch: Optional[Callable[[int, int, List[str]], None]] = None,
+                     cancel: Optional[threading.Event] = None) -> Iterator[Optional[Dict]]:
+    """
+    Resolves many parsed queries (as returned by parse_decklist) at once,
+    yielding the card JSON (or None) for each query in order as soon as it is
+    available.
+
+    Queries that name a printing ('set' and 'collector_number', as parsed from
+    'Sol Ring (CMM) 400') are looked up as that exact printing. Other queries
+    are first run through the local name index when one is available, so that
+    known cards are requested by exact Scryfall id. Identifiers are
+    de-duplicated and sent to /cards/collection in chunks of up to
+    COLLECTION_BATCH_SIZE. Only names the endpoint lists under 'not_found' (or
+    whole chunks that failed) fall back to the fuzzy lookup in
+    fetch_card_data. Cards already in the card cache are never sent, and are
+    yielded without waiting for the network; expired ones are revalidated
+    with conditional requests where possible, i.e. when they came from a
+    single-card lookup. Expired cards from an earlier batch have no
+    validators and are sent again with the rest. Identifiers that a concurrent
+    call is already fetching are waited on rather than sent twice.
+    on_batch(done, total, names) is called after every chunk, where
+    done/total count unique cards. Once cancel is set, chunks that have not
+    been sent yet are dropped and the iteration stops early; the same
+    happens when the caller closes the generator.
+    """
+    index = get_name_index()
+    if index:
+        card_queries = resolve_queries(card_queries, index)
+
+    keys = [query_key(query) for query in card_queries]
+    unique: Dict[tuple, Dict] = {}
+    for key, query in zip(keys, card_queries):
+        unique.setdefault(key, query)
+
+    resolved: Dict[tuple, Optional[Dict]] = {}
+    total = len(unique)
+
+    if _offline_store:
+        for key, query in unique.items():
+            card = None
+            if query.get('set') and query.get('collector_number'):
+                card = _offline_store.get_by_printing(query['set'], query['collector_number'])
+            if card is None and query.get('id'):
+                card = _offline_store.get_by_id(query['id'])
+            resolved[key] = card or _fetch_offline(query['name'])
+        if on_batch and total:
+            on_batch(total, total, [query['name'] for query in unique.values()])
+        for key in keys:
+            yield resolved[key]
+        return
+
+    cache = get_card_cache()
+    stale: Dict[tuple, CachedCard] = {}
+    if cache:
+        for key, query in unique.items():
+            cached = _fetch_cached(query, cache)
+            if cached is None:
+                continue
+            if not cached.stale:
+                resolved[key] = cached
+            elif cached.has_validators and len(stale) < REVALIDATE_LIMIT:
+                stale[key] = cached
+        if on_batch and resolved:
+            on_batch(len(resolved), total, [])
+
+    executor = fetch_engine.get_executor()
+    revalidations = {key: executor.submit(refresh_card, cached) for key, cached in stale.items()}
+
+    # Identifiers another caller is already fetching are waited on, not re-sent.
+    owned, borrowed = fetch_engine.flights.claim(
+        ('collection',) + key for key in unique if key not in resolved and key not in stale)
+    pending = [(key[1:], unique[key[1:]]) for key in owned]
+    chunks = [pending[start:start + COLLECTION_BATCH_SIZE]
+              for start in range(0, len(pending), COLLECTION_BATCH_SIZE)]
+
+    # Chunks are posted concurrently; the shared limiter keeps the total rate in check.
+    # stop is set once this generator is done, so queued or rate-limited chunks are not sent.
+    stop = threading.Event()
+    futures = []
+    for chunk in chunks:
+        future = executor.submit(_resolve_chunk, [query for _, query in chunk], cache, stop)
+        future.add_done_callback(lambda f, keys=[key for key, _ in chunk]: _publish_chunk(f, keys))
+        futures.append(future)
+    chunk_of = {key: i for i, chunk in enumerate(chunks) for key, _ in chunk}
+    done = total - len(pending) - len(borrowed) - len(revalidations)
+
+    # Yield in deck order, waiting on a chunk only when its first card is next.
+    try:
+        for key in keys:
+            if key not in resolved:
+                if cancel is not None and cancel.is_set():
+                    return
+                flight = revalidations.get(key) or borrowed.get(('collection',) + key)
+                if flight is not None:
+                    resolved[key] = flight.result()
+                    if resolved[key] is fetch_engine.ABANDONED:
+                        resolved[key] = _fetch_single(unique[key])
+                    done += 1
+                    names = [unique[key]['name']]
+                else:
+                    chunk = chunks[chunk_of[key]]
+                    resolved.update(futures[chunk_of[key]].result())
+                    done += len(chunk)
+                    names = [query['name'] for _, query in chunk]
+                if on_batch:
+                    on_batch(done, total, names)
+            yield resolved[key]
+    finally:
+        # Cancelled, or closed by the caller: drop every chunk that has not been sent yet.
+        stop.set()
+        for future in futures + list(revalidations.values()):
+            future.cancel()
+
+
+def _publish_chunk(future, keys: List[tuple]):
+    """Hands a finished chunk's cards to any caller waiting on the same identifiers."""
+    if future.cancelled() or isinstance(future.exception(), fetch_engine.Cancelled):
+        for key in keys:
+            fetch_engine.flights.publish(('collection',) + key, fetch_engine.ABANDONED)
+        return
+    try:
+        result = future.result()
+    except Exception as err:
+        print(f"Error resolving a batch of {len(keys)} cards: {err}")
+        result = {}
+    for key in keys:
+        fetch_engine.flights.publish(('collection',) + key, result.get(key))
+
+
+def fetch_cards_batch(card_queries: List[Dict],
+                      on_batch: Optional[Callable[[int, int, List[str]], None]] = None) -> List[Optional[Dict]]:
+    """
+    Resolves many parsed queries at once; see iter_cards_batch.
+
+    Returns a list aligned with card_queries: the card JSON for each query, or
+    None if it could not be resolved.
+    """
+    return list(iter_cards_batch(card_queries, on_batch=on_batch))
+
+
+def resolve_card_ids(card_queries: List[Dict]) -> List[Optional[str]]:
+    """
+    Returns the Scryfall id each parsed query resolves to (or None), for
+    price lookups. Cards already in the card cache are answered from it
+    whatever the age of their entry, so only cards that were never looked
+    up before are fetched, once, through iter_cards_batch.
+    """
+    index = get_name_index()
+    if index:
+        card_queries = resolve_queries(card_queries, index)
+
+    keys = [query_key(query) for query in card_queries]
+    ids: Dict[tuple, Optional[str]] = {}
+    unknown: Dict[tuple, Dict] = {}
+    cache = None if _offline_store else get_card_cache()
+    for key, query in zip(keys, card_queries):
+        if key in ids or key in unknown:
+            continue
+        cached = _fetch_cached(query, cache) if cache else None
+        if cached is not None:
+            ids[key] = cached['id']
+        else:
+            unknown[key] = query
+
+    for key, card in zip(unknown, iter_cards_batch(list(unknown.values()))):
+        ids[key] = card.get('id') if card else None
+    return [ids[key] for key in keys]
+
+
+@metrics.timed('fetch_prices')
+def fetch_prices(card_ids: List[str],
+                 on_batch: Optional[Callable[[int, int, List[str]], None]] = None) -> Dict[str, Dict]:
+    """
+    Fetches the current 'prices' block of each card id and returns {id: prices}.
+
+    Scryfall has no price-only endpoint, so the ids are posted to
+    /cards/collection in chunks of COLLECTION_BATCH_SIZE and only the prices
+    are kept; the card cache is updated with update_prices, leaving the
+    cached rules data alone. Ids missing from the result were not found or
+    their chunk failed. In offline mode the prices come from the store.
+    on_batch(done, total, names) is called after every chunk.
+    """
+    ids = list(dict.fromkeys(card_ids))
+    found: Dict[str, Dict] = {}
+    if _offline_store:
+        for card_id in ids:
+            card = _offline_store.get_by_id(card_id)
+            if card:
+                found[card_id] = card.get('prices') or {}
+        if on_batch and ids:
+            on_batch(len(ids), len(ids), [])
+        return found
+
+    chunks = [ids[start:start + COLLECTION_BATCH_SIZE] for start in range(0, len(ids), COLLECTION_BATCH_SIZE)]
+    executor = fetch_engine.get_executor()
+    futures = [executor.submit(_fetch_collection, [{'id': card_id} for card_id in chunk]) for chunk in chunks]
+    done = 0
+    for chunk, future in zip(chunks, futures):
+        result = future.result() or {}
+        for card in result.get('data', []):
+            found[card['id']] = card.get('prices') or {}
+        done += len(chunk)
+        if on_batch:
+            on_batch(done, len(ids), [])
+
+    metrics.incr('prices.refreshed', len(found))
+    cache = get_card_cache()
+    if cache and found:
+        cache.update_prices(found)
+    return found
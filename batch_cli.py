@@ -0,0 +1,242 @@
+# batch_cli.py
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import metrics
+from parser import parse_decklist
+from api_client import fetch_cards_batch, query_key, set_offline_store
+from bulk_data import OfflineStore
+from pipeline import build_card, resolve_related
+from formatter import format_deck_as_text
+from models import Card
+
+
+def iter_decklists(source: str) -> Iterator[Tuple[str, str]]:
+    """
+    Yields (deck name, decklist text) pairs from a directory of text files,
+    a glob pattern, or a JSONL file whose records have a 'decklist' field
+    (and optionally a 'name' or 'id').
+    """
+    if source.endswith('.jsonl'):
+        with open(source, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                name = record.get('name') or record.get('id') or f"deck-{line_number}"
+                yield str(name), record['decklist']
+        return
+
+    if os.path.isdir(source):
+        paths = sorted(glob.glob(os.path.join(source, '*.txt')))
+    else:
+        paths = sorted(glob.glob(source, recursive=True))
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            yield os.path.splitext(os.path.basename(path))[0], f.read()
+
+
+def _safe_filename(name: str) -> str:
+    return re.sub(r'[^\w.-]+', '_', name).strip('._') or 'deck'
+
+
+def resolve_unique_cards(decks: Dict[str, List[Dict]]) -> Dict[tuple, Optional[Dict]]:
+    """
+    Resolves every distinct card (or exact printing) across all decks exactly
+    once, plus the meld results they reference, and returns a query_key -> JSON table.
+    """
+    table: Dict[tuple, Optional[Dict]] = {}
+
+    def resolve(queries: List[Dict]):
+        for query, card in zip(queries, fetch_cards_batch(queries)):
+            table[query_key(query)] = card
+
+    unique = {query_key(q): q for queries in decks.values() for q in queries}
+    resolve(list(unique.values()))
+
+    found = [card for card in table.values() if card]
+    related = resolve_related(found, known={card['name'].lower(): card for card in found})
+    for name, card in related.items():
+        table.setdefault(query_key({'name': name}), card)
+    return table
+
+
+# Each worker process receives the resolved card table once, at start-up.
+_worker_table: Dict[tuple, Optional[Dict]] = {}
+
+
+def _init_worker(table: Dict[tuple, Optional[Dict]]):
+    global _worker_table
+    _worker_table = table
+
+
+def _build_deck(card_queries: List[Dict], table: Dict[tuple, Optional[Dict]]) -> Tuple[List[Card], List[str]]:
+    """Builds a deck from the resolved card table; returns (cards, names that were not found)."""
+    deck = []
+    missing = []
+    seen = set()
+    for query in card_queries:
+        card_json = table.get(query_key(query))
+        if not card_json:
+            missing.append(query['name'])
+            continue
+        key = (query.get('section', 'main'), card_json.get('id') or card_json.get('name'), bool(query.get('foil')))
+        if key in seen:
+            continue
+        card = build_card(card_json, query['quantity'], lambda n: table.get(query_key({'name': n})), key[0])
+        seen.add(key)
+        deck.append(card)
+    return deck, missing
+
+
+def _render_deck(name: str, card_queries: List[Dict], out_path: str) -> Tuple[str, List[str], float]:
+    """Renders one deck from the shared table and writes it; returns (name, missing names, seconds)."""
+    start = time.perf_counter()
+    deck, missing = _build_deck(card_queries, _worker_table)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        f.write(format_deck_as_text(deck))
+    return name, missing, time.perf_counter() - start
+
+
+def corpus_stats(decks: Dict[str, List[Dict]], table: Dict[tuple, Optional[Dict]]) -> Dict:
+    """Metagame statistics (see analytics.Corpus) over every deck of the batch."""
+    from analytics import Corpus
+    corpus = Corpus()
+    for name, queries in decks.items():
+        corpus.add_deck(name, _build_deck(queries, table)[0])
+    return corpus.summary()
+
+
+def save_corpus_snapshot(path: str, source: str, decks: Dict[str, List[Dict]],
+                         texts: Dict[str, str], table: Dict[tuple, Optional[Dict]]) -> int:
+    """Writes every resolved deck of the batch into one snapshot archive (see snapshot.py)."""
+    from snapshot import SnapshotDeck, write_snapshot
+    resolved = (SnapshotDeck(name, _build_deck(queries, table)[0], queries, source, texts.get(name, ""))
+                for name, queries in decks.items())
+    return write_snapshot(path, resolved, {'source': source})
+
+
+def run_batch(source: str, out_dir: str, workers: Optional[int] = None, stats: bool = False,
+              snapshot: Optional[str] = None) -> Dict:
+    """
+    Formats every decklist in `source` into `out_dir`, one .txt per deck, and
+    returns a summary of failures and timings. Cards are looked up once per
+    distinct name or printing across the whole corpus, not once per deck line.
+    With stats set, the summary also holds statistics over the whole corpus;
+    with snapshot, every resolved deck is also saved to that archive.
+    """
+    timings = {}
+    started = time.perf_counter()
+
+    decks: Dict[str, List[Dict]] = {}
+    texts: Dict[str, str] = {}
+    failures = []
+    for name, text in iter_decklists(source):
+        while name in decks:
+            name += '_'
+        queries = parse_decklist(text)
+        if queries:
+            decks[name] = queries
+            if snapshot:
+                texts[name] = text
+        else:
+            failures.append({'deck': name, 'error': "Decklist is empty or could not be parsed."})
+    timings['parse'] = time.perf_counter() - started
+
+    step = time.perf_counter()
+    table = resolve_unique_cards(decks)
+    timings['resolve'] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    deck_seconds = {}
+    unresolved = set()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(table,)) as pool:
+        futures = {
+            pool.submit(_render_deck, name, queries, os.path.join(out_dir, _safe_filename(name) + '.txt')): name
+            for name, queries in decks.items()
+        }
+        for future in as_completed(futures):
+            try:
+                name, missing, seconds = future.result()
+            except Exception as err:
+                failures.append({'deck': futures[future], 'error': str(err)})
+                continue
+            deck_seconds[name] = seconds
+            unresolved.update(missing)
+            if missing:
+                failures.append({'deck': name, 'error': "Cards not found: " + ", ".join(missing)})
+    timings['render'] = time.perf_counter() - step
+
+    if stats:
+        step = time.perf_counter()
+        corpus = corpus_stats(decks, table)
+        timings['stats'] = time.perf_counter() - step
+    if snapshot:
+        step = time.perf_counter()
+        save_corpus_snapshot(snapshot, source, decks, texts, table)
+        timings['snapshot'] = time.perf_counter() - step
+    timings['total'] = time.perf_counter() - started
+
+    return {
+        'decks': len(decks),
+        'written': len(deck_seconds),
+        'deck_lines': sum(len(queries) for queries in decks.values()),
+        'unique_cards': len(table),
+        'unresolved_cards': sorted(unresolved),
+        'failures': failures,
+        'timings': timings,
+        'slowest_decks': sorted(deck_seconds.items(), key=lambda item: item[1], reverse=True)[:10],
+        # Counters and stages of this process; decks are rendered in worker processes.
+        'metrics': metrics.report() if metrics.is_enabled() else None,
+        'stats': corpus if stats else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    arg_parser = argparse.ArgumentParser(description="Format many decklists at once.")
+    arg_parser.add_argument("source", help="A directory of .txt decklists, a glob pattern, or a .jsonl file.")
+    arg_parser.add_argument("--out", default="formatted_decks", help="Directory to write one report per deck into.")
+    arg_parser.add_argument("--workers", type=int, default=None, help="Render processes (default: CPU count).")
+    arg_parser.add_argument("--summary", default=None, help="Write the JSON summary here instead of stdout.")
+    arg_parser.add_argument("--offline", metavar="DB",
+                            help="Answer every lookup from a store built by bulk_data.py instead of the API.")
+    arg_parser.add_argument("--metrics", action="store_true",
+                            help="Add request counters and per-stage timings to the summary.")
+    arg_parser.add_argument("--metrics-port", type=int, default=None,
+                            help="Also serve the metrics for Prometheus on this port while running.")
+    arg_parser.add_argument("--stats", action="store_true",
+                            help="Add mana curve, color, type, rarity, price and play-rate statistics "
+                                 "over all decks to the summary (needs NumPy).")
+    arg_parser.add_argument("--snapshot", metavar="FILE",
+                            help="Also save every resolved deck to this archive, for main.py --snapshot.")
+    args = arg_parser.parse_args(argv)
+
+    if args.metrics:
+        metrics.enable()
+    if args.metrics_port:
+        metrics.serve_prometheus(args.metrics_port)
+    if args.offline:
+        set_offline_store(OfflineStore(args.offline))
+
+    summary = run_batch(args.source, args.out, workers=args.workers, stats=args.stats,
+                        snapshot=args.snapshot)
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    else:
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+    if summary['failures']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
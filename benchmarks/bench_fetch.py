@@ -0,0 +1,184 @@
+# benchmarks/bench_fetch.py
+"""
+End-to-end benchmark against the local Scryfall stand-in (scryfall_stub.py).
+
+For every deck size, runs each scenario in a fresh process with an empty
+card cache and reports wall time, requests issued (and how many were
+throttled), bytes transferred and the peak resident memory of that process:
+
+    fetch_card_data      one fuzzy lookup per card (only up to --max-single cards)
+    build_detailed_deck  the GUI's whole pipeline: parse, batch fetch, render
+    format_deck_as_text  rendering only, no network
+    refresh_prices       a batch lookup of a deck whose cached prices have all
+                         expired (only up to --max-single cards); the cache is
+                         warmed with single lookups first, which is not counted
+
+    python benchmarks/bench_fetch.py [--sizes 10,100,1000,10000] [--latency 0.05]
+                                     [--throttle 0.0] [--rate-limit 0] [--rate 10]
+                                     [--json results.json]
+
+--rate sets the client's own request rate; it defaults to the rate used
+against the real API, so timings include the pacing real users see.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List
+
+from common import card_pool, peak_rss_bytes
+from scryfall_stub import StubScryfall
+
+SCENARIOS = ("fetch_card_data", "build_detailed_deck", "format_deck_as_text", "refresh_prices")
+SINGLE_REQUEST_SCENARIOS = ("fetch_card_data", "refresh_prices")
+
+
+def _load_cards(path: str, size: int) -> List[Dict]:
+    cards = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if len(cards) == size:
+                break
+            cards.append(json.loads(line))
+    return cards
+
+
+def _stub_stats(base_url: str) -> Dict:
+    with urllib.request.urlopen(f"{base_url}/_stats") as response:
+        return json.load(response)
+
+
+def run_scenario(scenario: str, size: int, cards_path: str, base_url: str, rate: float) -> Dict:
+    """
+    Runs one scenario in this process and returns its wall time and peak RSS.
+    Scenarios with an uncounted set-up step also return their own request and
+    byte counts.
+    """
+    import queue
+
+    import api_client
+    import fetch_engine
+
+    api_client.SCRYFALL_API_BASE = base_url
+    api_client.set_card_cache(None)
+    api_client.set_name_index(None)
+    fetch_engine.limiter = fetch_engine.TokenBucket(rate)
+    counts = None
+
+    if scenario == "refresh_prices":
+        from card_cache import CardCache
+        cache_path = os.path.join(os.path.dirname(cards_path), f"cache-{size}.sqlite3")
+        cards = _load_cards(cards_path, size)
+        api_client.set_card_cache(CardCache(cache_path))
+        api_client.fetch_many([card['name'] for card in cards])
+        # The same entries, now all past their price TTL.
+        api_client.set_card_cache(CardCache(cache_path, prices_ttl=-1))
+
+        before = _stub_stats(base_url)
+        start = time.perf_counter()
+        found = sum(1 for card in api_client.fetch_cards_batch([{'name': c['name'], 'quantity': 1} for c in cards])
+                    if card)
+        output = ""
+        after = _stub_stats(base_url)
+        counts = {key: after[key] - before[key]
+                  for key in ('requests', 'throttled', 'not_modified', 'bytes_in', 'bytes_out')}
+    elif scenario == "format_deck_as_text":
+        from formatter import format_deck_as_text
+        from models import Card
+        deck = [Card.from_scryfall_json(card, 1 + i % 4) for i, card in enumerate(_load_cards(cards_path, size))]
+        start = time.perf_counter()
+        output = format_deck_as_text(deck)
+        found = len(deck)
+    elif scenario == "fetch_card_data":
+        names = [card['name'] for card in _load_cards(cards_path, size)]
+        start = time.perf_counter()
+        found = sum(1 for name in names if api_client.fetch_card_data(name))
+        output = ""
+    else:
+        from main_gui import build_detailed_deck
+        decklist = "".join(f"{1 + i % 4} {card['name']}\n" for i, card in enumerate(_load_cards(cards_path, size)))
+        messages: queue.Queue = queue.Queue()
+        start = time.perf_counter()
+        build_detailed_deck(decklist, messages)
+        output = "".join(m[1] for m in messages.queue if m[0] == 'block')
+        found = sum(1 for m in messages.queue if m[0] == 'block')
+
+    result = {'scenario': scenario, 'size': size, 'found': found, 'output_chars': len(output),
+              'seconds': time.perf_counter() - start, 'peak_rss': peak_rss_bytes()}
+    if counts:
+        result.update(counts)
+    return result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--sizes", default="10,100,1000,10000",
+                            help="comma-separated deck sizes (distinct cards per deck)")
+    arg_parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    arg_parser.add_argument("--max-single", type=int, default=100,
+                            help="largest deck for the one-request-per-card scenario")
+    arg_parser.add_argument("--latency", type=float, default=0.0, help="stub response latency, seconds")
+    arg_parser.add_argument("--throttle", type=float, default=0.0, help="fraction of random 429s")
+    arg_parser.add_argument("--rate-limit", type=float, default=0.0, help="stub requests/second limit (0 = off)")
+    arg_parser.add_argument("--retry-after", type=float, default=1.0)
+    arg_parser.add_argument("--rate", type=float, default=None, help="client requests/second")
+    arg_parser.add_argument("--json", help="also write the results to this file")
+    arg_parser.add_argument("--child", nargs=5, help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.child:
+        scenario, size, cards_path, base_url, rate = args.child
+        result = run_scenario(scenario, int(size), cards_path, base_url, float(rate))
+        print(json.dumps(result))
+        return
+
+    import fetch_engine
+    rate = args.rate = args.rate or fetch_engine.REQUESTS_PER_SECOND
+    sizes = [int(s) for s in args.sizes.split(",")]
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    pool = card_pool(max(sizes))
+
+    stub = StubScryfall(pool, args.latency, args.throttle, args.rate_limit, args.retry_after)
+    base_url = stub.start()
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cards_path = os.path.join(tmp, "cards.jsonl")
+        with open(cards_path, "w", encoding="utf-8") as f:
+            for card in pool:
+                f.write(json.dumps(card) + "\n")
+
+        print(f"{'scenario':<20} {'cards':>6} {'seconds':>9} {'requests':>9} {'429s':>5} {'304s':>5} "
+              f"{'KiB sent':>9} {'KiB recv':>9} {'peak MiB':>9}")
+        for size in sizes:
+            for scenario in scenarios:
+                if scenario in SINGLE_REQUEST_SCENARIOS and size > args.max_single:
+                    continue
+                before = stub.stats.snapshot()
+                out = subprocess.run(
+                    [sys.executable, __file__, "--child", scenario, str(size), cards_path, base_url, str(rate)],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                after = stub.stats.snapshot()
+
+                result = json.loads(out.strip().splitlines()[-1])
+                for key in ('requests', 'throttled', 'not_modified', 'bytes_in', 'bytes_out'):
+                    result.setdefault(key, after[key] - before[key])
+                results.append(result)
+                print(f"{scenario:<20} {size:>6} {result['seconds']:>9.3f} {result['requests']:>9} "
+                      f"{result['throttled']:>5} {result['not_modified']:>5} {result['bytes_in'] / 1024:>9.1f} "
+                      f"{result['bytes_out'] / 1024:>9.1f} {result['peak_rss'] / 2**20:>9.1f}")
+    stub.stop()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'settings': {k: v for k, v in vars(args).items() if k not in ('child', 'json')},
+                       'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
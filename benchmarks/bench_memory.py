@@ -0,0 +1,104 @@
+# benchmarks/bench_memory.py
+"""
+Memory benchmark for the card models.
+
+Builds DECKS decks of DECK_SIZE cards drawn from a pool of POOL distinct
+cards, once with the original per-deck dataclasses ("before") and once with
+the interned CardData flyweights ("after"), each in a fresh process, and
+reports the resident set size the decks add.
+
+    python benchmarks/bench_memory.py [--decks 10000] [--deck-size 100] [--pool 3000]
+"""
+import argparse
+import json
+import random
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from common import card_pool, rss_bytes
+
+
+# --- The models as they were before CardData: one full copy per deck entry ---
+@dataclass
+class LegacyCardFace:
+    name: str
+    mana_cost: str
+    type_line: str
+    oracle_text: str
+    power: Optional[str]
+    toughness: Optional[str]
+    loyalty: Optional[str]
+    image_url: str
+
+
+@dataclass
+class LegacyCard:
+    name: str
+    colors: List[str]
+    quantity: int
+    price_usd: Optional[str] = None
+    rarity: Optional[str] = None
+    card_faces: List[LegacyCardFace] = field(default_factory=list)
+    all_parts: Optional[List[Dict]] = None
+
+    @classmethod
+    def from_scryfall_json(cls, d: Dict, quantity: int) -> 'LegacyCard':
+        # Mirrors the old factory, including the per-call copies made by
+        # decoding each deck's data separately (as a per-deck fetch would).
+        d = json.loads(json.dumps(d))
+        faces_json = d['card_faces'] if len(d.get('card_faces', [])) > 1 else [d]
+        faces = [LegacyCardFace(f.get('name', 'N/A'), f.get('mana_cost', ''), f.get('type_line', 'N/A'),
+                                f.get('oracle_text', 'N/A'), f.get('power'), f.get('toughness'),
+                                f.get('loyalty'), f.get('image_uris', {}).get('normal', ''))
+                 for f in faces_json]
+        return cls(d.get('name', 'N/A'), d.get('colors', []), quantity, d.get('prices', {}).get('eur'),
+                   d.get('rarity'), faces, d.get('all_parts'))
+
+
+def build(mode: str, decks: int, deck_size: int, pool_size: int) -> Dict:
+    from models import Card
+
+    pool = card_pool(pool_size)
+    rng = random.Random(42)
+    factory = LegacyCard.from_scryfall_json if mode == "before" else Card.from_scryfall_json
+
+    baseline = rss_bytes()
+    corpus = []
+    for _ in range(decks):
+        corpus.append([factory(card, rng.randint(1, 4)) for card in rng.sample(pool, deck_size)])
+    grown = rss_bytes() - baseline
+    return {'mode': mode, 'entries': decks * deck_size, 'rss_bytes': grown}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--decks", type=int, default=10_000)
+    arg_parser.add_argument("--deck-size", type=int, default=100)
+    arg_parser.add_argument("--pool", type=int, default=3_000)
+    arg_parser.add_argument("--mode", choices=["before", "after"], help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(build(args.mode, args.decks, args.deck_size, args.pool)))
+        return
+
+    results = {}
+    for mode in ("before", "after"):
+        out = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--decks", str(args.decks),
+             "--deck-size", str(args.deck_size), "--pool", str(args.pool)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results[mode] = json.loads(out)
+
+    for mode in ("before", "after"):
+        r = results[mode]
+        print(f"{mode:>6}: {r['entries']:>9,} deck entries   RSS +{r['rss_bytes'] / 2**20:8.1f} MiB")
+    ratio = results['before']['rss_bytes'] / max(results['after']['rss_bytes'], 1)
+    print(f"  flyweight models use {ratio:.1f}x less memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/bench_parser.py
+"""
+Parser benchmark: a 100k-line mixed-format decklist and adversarial lines
+full of parentheses, parsed with the single-pass scanner in parser.py and
+with the backtracking regex it replaced.
+
+    python benchmarks/bench_parser.py [--lines 100000] [--parens 2000]
+"""
+import argparse
+import re
+import time
+
+import common  # noqa: F401  (puts the repo root on sys.path)
+
+from parser import parse_decklist
+
+LEGACY_PATTERN = re.compile(r"^\s*(\d+x?\s*)?(.*?)(?:\s\(.*\)\s*\d*)?$")
+
+LINE_TEMPLATES = [
+    "1x Sol Ring (EOE) 245",
+    "4 Lightning Bolt (M10) 146",
+    "1 Arcane Signet (M3C) 283 *F*",
+    "Counterspell",
+    "SB: 2 Pyroblast",
+    "3 Fire // Ice [MH2] 290",
+    "1 B.F.M. (Big Furry Monster)",
+]
+
+
+def legacy_parse(text: str):
+    parsed = []
+    for line in text.strip().split('\n'):
+        line = line.strip()
+        if not line or line.startswith('//'):
+            continue
+        match = LEGACY_PATTERN.match(line)
+        if match:
+            quantity = int(match.group(1).lower().replace('x', '').strip()) if match.group(1) else 1
+            parsed.append({'quantity': quantity, 'name': match.group(2).strip()})
+    return parsed
+
+
+def time_it(func, text: str) -> float:
+    start = time.perf_counter()
+    func(text)
+    return time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--lines", type=int, default=100_000)
+    arg_parser.add_argument("--parens", type=int, default=2_000,
+                            help="Parenthesis groups per adversarial line.")
+    args = arg_parser.parse_args()
+
+    sections = ["Deck"] + [f"{1 + i % 4} Card Name {i} ({LINE_TEMPLATES[i % 3][-9:-6]}) {i}"
+                           if i % 7 == 0 else LINE_TEMPLATES[i % len(LINE_TEMPLATES)]
+                           for i in range(args.lines)] + ["Sideboard", "2 Pyroblast"]
+    bulk = "\n".join(sections)
+    adversarial = "\n".join("1 Card" + " (x" * args.parens + ")" * args.parens + " 1x" for _ in range(10))
+
+    print(f"{'input':<28}{'scanner':>12}{'legacy regex':>16}")
+    for label, text in ((f"{args.lines:,} mixed lines", bulk), ("10 adversarial lines", adversarial)):
+        new = time_it(parse_decklist, text)
+        old = time_it(legacy_parse, text)
+        print(f"{label:<28}{new:>10.3f} s{old:>14.3f} s")
+
+
+if __name__ == "__main__":
+    main()
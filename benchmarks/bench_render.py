@@ -0,0 +1,47 @@
+# benchmarks/bench_render.py
+"""
+Rendering microbenchmark: formats a 100-card deck 1,000 times.
+
+"cold" builds a fresh DeckRenderer for every render, so every oracle line is
+wrapped again (the cost every deck paid before renderers were shared);
+"memoized" reuses one renderer, as format_deck_as_text does.
+
+    python benchmarks/bench_render.py [--deck-size 100] [--repeat 1000] [--width 72]
+"""
+import argparse
+import time
+
+from common import card_pool
+
+from formatter import DeckRenderer
+from models import Card
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--deck-size", type=int, default=100)
+    arg_parser.add_argument("--repeat", type=int, default=1000)
+    arg_parser.add_argument("--width", type=int, default=72)
+    args = arg_parser.parse_args()
+
+    deck = [Card.from_scryfall_json(card, 1 + i % 4) for i, card in enumerate(card_pool(args.deck_size))]
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        cold = DeckRenderer(args.width).format_deck(deck)
+    cold_seconds = time.perf_counter() - start
+
+    renderer = DeckRenderer(args.width)
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        warm = renderer.format_deck(deck)
+    warm_seconds = time.perf_counter() - start
+
+    assert cold == warm
+    for label, seconds in (("cold", cold_seconds), ("memoized", warm_seconds)):
+        print(f"{label:>9}: {seconds:7.3f} s total   {seconds / args.repeat * 1000:7.3f} ms/deck")
+    print(f"  speed-up: {cold_seconds / warm_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start benchmark for the CLI and the GUI.
+
+Every measurement runs in a fresh interpreter, --runs times, and the median
+is reported:
+
+    import main / import main_gui   module import time, from -X importtime,
+                                    with the slowest imports of the last run
+    cli first output                spawn to the first line main.py prints, for
+                                    an offline deck and for a saved snapshot
+    gui first frame                 spawn to the window's first update(), and
+                                    to the worker having loaded the pipeline
+                                    (skipped when there is no display)
+
+Nothing touches the network: the deck is answered from an offline store
+built from the fixture cards.
+
+    python benchmarks/bench_startup.py [--runs 5] [--top 10] [--json results.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+from common import FIXTURE, ROOT
+
+GUI_PROBE = """
+import sys, time
+import tkinter as tk
+try:
+    root = tk.Tk()
+except tk.TclError:
+    print("no-display", flush=True)
+    sys.exit(0)
+import main_gui
+app = main_gui.MtgDeckFormatterApp(root)
+root.update()
+print("frame", flush=True)
+while app.session is None:
+    root.update()
+    time.sleep(0.001)
+print("ready", flush=True)
+root.destroy()
+"""
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    return env
+
+
+def import_time(module: str) -> Tuple[float, List[Tuple[float, str]]]:
+    """Seconds to import a module in a fresh interpreter, and the slowest imports it triggers (self time)."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, env=_env(), cwd=ROOT, check=True)
+    total = 0.0
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            continue  # The header line.
+        if not name.startswith("  "):  # A top-level import: everything before it belongs to it.
+            if name.strip() == module:
+                total = cumulative_us / 1e6
+                break
+            entries = []
+            continue
+        entries.append((self_us / 1e6, name.strip()))
+    return total, sorted(entries, reverse=True)
+
+
+def time_to_lines(args: List[str], markers: Tuple[str, ...] = ()) -> Dict[str, Optional[float]]:
+    """
+    Spawns a process and returns the seconds until its first line of output
+    ('first') and until each marker line, plus the total run time ('exit').
+    """
+    start = time.perf_counter()
+    proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            text=True, env=_env(), cwd=ROOT)
+    times: Dict[str, Optional[float]] = {'first': None}
+    for line in proc.stdout:
+        now = time.perf_counter() - start
+        if times['first'] is None:
+            times['first'] = now
+        if line.strip() in markers:
+            times[line.strip()] = now
+    proc.wait()
+    times['exit'] = time.perf_counter() - start
+    return times
+
+
+def _median(values: List[Optional[float]]) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return statistics.median(values) if values else None
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--runs", type=int, default=5)
+    arg_parser.add_argument("--top", type=int, default=10, help="slowest imports to list per module")
+    arg_parser.add_argument("--json", help="also write the results to this file")
+    args = arg_parser.parse_args()
+
+    results: Dict[str, Dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, "cards.sqlite3")
+        snapshot = os.path.join(tmp, "deck.mtgsnap")
+        deck = os.path.join(tmp, "deck.txt")
+        with open(FIXTURE, encoding="utf-8") as f:
+            names = sorted({card['name'] for card in json.load(f)})
+        with open(deck, "w", encoding="utf-8") as f:
+            f.write("".join(f"{1 + i % 4} {name}\n" for i, name in enumerate(names)))
+        subprocess.run([sys.executable, "bulk_data.py", FIXTURE, "--db", store], env=_env(), cwd=ROOT,
+                       check=True, stdout=subprocess.DEVNULL)
+        subprocess.run([sys.executable, "main.py", deck, "--offline", store, "--save-snapshot", snapshot],
+                       env=_env(), cwd=ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        for module in ("main", "main_gui"):
+            runs = [import_time(module) for _ in range(args.runs)]
+            results[f"import {module}"] = {'seconds': _median([total for total, _ in runs]),
+                                           'slowest': [[name, seconds] for seconds, name in runs[-1][1][:args.top]]}
+
+        cli = {
+            "cli first output (offline)": [sys.executable, "main.py", deck, "--offline", store],
+            "cli first output (snapshot)": [sys.executable, "main.py", "--snapshot", snapshot],
+        }
+        for label, command in cli.items():
+            runs = [time_to_lines(command) for _ in range(args.runs)]
+            results[label] = {'seconds': _median([r['first'] for r in runs]),
+                              'exit_seconds': _median([r['exit'] for r in runs])}
+
+        runs = [time_to_lines([sys.executable, "-c", GUI_PROBE], ("frame", "ready", "no-display"))
+                for _ in range(args.runs)]
+        if any('no-display' in r for r in runs):
+            results["gui first frame"] = {'seconds': None, 'skipped': "no display"}
+        else:
+            results["gui first frame"] = {'seconds': _median([r.get('frame') for r in runs]),
+                                          'ready_seconds': _median([r.get('ready') for r in runs])}
+
+    print(f"{'measurement':<30} {'median ms':>10}   notes")
+    for label, result in results.items():
+        seconds = result['seconds']
+        shown = f"{seconds * 1000:10.1f}" if seconds is not None else f"{'-':>10}"
+        notes = ""
+        if 'exit_seconds' in result:
+            notes = f"exits after {result['exit_seconds'] * 1000:.1f} ms"
+        elif 'ready_seconds' in result and result['ready_seconds'] is not None:
+            notes = f"pipeline loaded after {result['ready_seconds'] * 1000:.1f} ms"
+        elif 'skipped' in result:
+            notes = f"skipped: {result['skipped']}"
+        print(f"{label:<30} {shown}   {notes}")
+        for name, self_seconds in result.get('slowest', []):
+            print(f"    {name:<34} {self_seconds * 1000:8.1f} ms self")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'settings': {'runs': args.runs, 'python': sys.version.split()[0]}, 'results': results},
+                      f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
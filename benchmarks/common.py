@@ -0,0 +1,44 @@
+# benchmarks/common.py
+"""Helpers shared by the benchmark scripts."""
+import json
+import os
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+FIXTURE = os.path.join(ROOT, "fixtures", "bulk_sample.json")
+
+
+def rss_bytes() -> int:
+    """Current resident set size (Linux /proc), falling back to the peak RSS."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process so far."""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def card_pool(size: int) -> List[Dict]:
+    """Distinct synthetic cards, cloned from the fixture with unique ids and names."""
+    from bulk_data import iter_bulk_cards
+    templates = list(iter_bulk_cards(FIXTURE))
+    pool = []
+    for i in range(size):
+        card = json.loads(json.dumps(templates[i % len(templates)]))
+        card['id'] = f"{card['id'][:-6]}{i:06d}"
+        card['name'] = f"{card['name']} {i}"
+        card['collector_number'] = str(i)
+        pool.append(card)
+    return pool
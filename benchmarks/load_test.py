@@ -0,0 +1,118 @@
+# benchmarks/load_test.py
+"""
+Load test for the formatting service (service.py).
+
+Starts the service in-process against the local Scryfall stand-in (or
+targets a running service with --url), then has CLIENTS concurrent clients
+each POST REQUESTS decklists to /format over keep-alive connections.
+Decks are drawn from a shared card pool, so clients overlap the way real
+users do. Reports throughput, p50/p90/p99 latency, and how many requests
+reached the stand-in.
+
+    python benchmarks/load_test.py [--clients 16] [--requests 50] [--deck-size 100]
+                                   [--pool 2000] [--latency 0.05] [--url http://127.0.0.1:8765]
+"""
+import argparse
+import http.client
+import random
+import statistics
+import threading
+import time
+from typing import List
+from urllib.parse import urlsplit
+
+from common import card_pool
+from scryfall_stub import StubScryfall
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_client(url: str, decks: List[str], latencies: List[float], errors: List[str]):
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=300)
+    for decklist in decks:
+        start = time.perf_counter()
+        try:
+            conn.request('POST', '/format', body=decklist.encode('utf-8'),
+                         headers={'Content-Type': 'text/plain; charset=utf-8'})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(f"HTTP {response.status}")
+                continue
+        except (OSError, http.client.HTTPException) as err:
+            errors.append(str(err))
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=300)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--clients", type=int, default=16)
+    arg_parser.add_argument("--requests", type=int, default=50, help="decklists per client")
+    arg_parser.add_argument("--deck-size", type=int, default=100)
+    arg_parser.add_argument("--pool", type=int, default=2000, help="distinct cards the decks are drawn from")
+    arg_parser.add_argument("--latency", type=float, default=0.05, help="stand-in response latency, seconds")
+    arg_parser.add_argument("--url", help="test a running service instead of starting one")
+    args = arg_parser.parse_args()
+
+    pool = card_pool(args.pool)
+    rng = random.Random(42)
+    stub = None
+    if args.url:
+        url = args.url
+    else:
+        import tempfile
+        import api_client
+        import service
+        from card_cache import CardCache
+
+        stub = StubScryfall(pool, latency=args.latency)
+        api_client.SCRYFALL_API_BASE = stub.start()
+        api_client.set_name_index(None)
+        cache_dir = tempfile.mkdtemp()
+        api_client.set_card_cache(CardCache(f"{cache_dir}/cards.sqlite3"))
+        server = service.make_server(port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    workloads = [
+        ["".join(f"{rng.randint(1, 4)} {card['name']}\n" for card in rng.sample(pool, args.deck_size))
+         for _ in range(args.requests)]
+        for _ in range(args.clients)
+    ]
+    latencies: List[float] = []
+    errors: List[str] = []
+    threads = [threading.Thread(target=run_client, args=(url, decks, latencies, errors)) for decks in workloads]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    print(f"{args.clients} clients x {args.requests} decks of {args.deck_size} cards against {url}")
+    print(f"  wall time:   {wall:8.2f} s   ({len(latencies) / wall:.1f} decks/s)")
+    if latencies:
+        print(f"  latency:     p50 {_percentile(latencies, 50) * 1000:8.1f} ms   "
+              f"p90 {_percentile(latencies, 90) * 1000:8.1f} ms   "
+              f"p99 {_percentile(latencies, 99) * 1000:8.1f} ms   "
+              f"mean {statistics.mean(latencies) * 1000:8.1f} ms")
+    print(f"  errors:      {len(errors)}" + (f" (first: {errors[0]})" if errors else ""))
+    if stub:
+        stats = stub.stats.snapshot()
+        print(f"  upstream:    {stats['requests']} requests, {stats['throttled']} throttled, "
+              f"{stats['bytes_out'] / 1024:.1f} KiB received")
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
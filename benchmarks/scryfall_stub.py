@@ -0,0 +1,281 @@
+# benchmarks/scryfall_stub.py
+"""
+A local stand-in for the parts of the Scryfall API this tool uses:
+
+    GET  /cards/named?fuzzy=...|exact=...
+    POST /cards/collection
+    GET  /cards/{set}/{collector_number}
+    GET  /cards/{id}
+    GET  /_stats                  (the counters below; not itself counted)
+
+Cards are served from recorded JSON (the bulk-data fixture, or a synthetic
+pool cloned from it). Single-card responses carry an ETag and answer
+If-None-Match with 304, and responses are gzipped for clients that accept
+it. Latency, random 429s and a server-side rate limit can be configured,
+and every request and byte (as sent on the wire) is counted, so benchmarks
+can run without network access.
+
+    python benchmarks/scryfall_stub.py [--port 8089] [--cards 10000] [--latency 0.05]
+                                       [--throttle 0.0] [--rate-limit 0] [--retry-after 1]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from common import card_pool
+
+# Mirrors the real endpoint's limit.
+MAX_IDENTIFIERS = 75
+
+
+class StubStats:
+    """Thread-safe request and byte counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.not_modified = 0
+        self.by_endpoint: Dict[str, int] = {}
+
+    def record(self, endpoint: str, bytes_in: int, bytes_out: int, status: int):
+        with self._lock:
+            self.requests += 1
+            self.throttled += status == 429
+            self.not_modified += status == 304
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.by_endpoint[endpoint] = self.by_endpoint.get(endpoint, 0) + 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {'requests': self.requests, 'throttled': self.throttled, 'not_modified': self.not_modified,
+                    'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out,
+                    'by_endpoint': dict(self.by_endpoint)}
+
+
+class StubScryfall:
+    """
+    The stand-in server. start() serves on a background thread and returns
+    the base URL to put in api_client.SCRYFALL_API_BASE.
+
+    latency:     seconds added to every response.
+    throttle:    fraction of requests answered with a 429, at random.
+    rate_limit:  requests per second above which requests get a 429 (0 = off).
+    retry_after: the Retry-After value sent with every 429.
+    """
+
+    def __init__(self, cards: Iterable[Dict], latency: float = 0.0, throttle: float = 0.0,
+                 rate_limit: float = 0.0, retry_after: float = 1.0, seed: int = 42):
+        self.latency = latency
+        self.throttle = throttle
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.stats = StubStats()
+        self._rng = random.Random(seed)
+        self._window: deque = deque()
+        self._window_lock = threading.Lock()
+
+        self.by_id: Dict[str, Dict] = {}
+        self.by_name: Dict[str, Dict] = {}
+        self.by_printing: Dict[tuple, Dict] = {}
+        for card in cards:
+            self.by_id[card['id']] = card
+            self.by_name.setdefault(card['name'].lower(), card)
+            for face in card.get('card_faces', []):
+                self.by_name.setdefault(face['name'].lower(), card)
+            self.by_printing[(card['set'].lower(), card['collector_number'].lower())] = card
+
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        stub = self
+
+        class Handler(_Handler):
+            server_stub = stub
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _should_throttle(self) -> bool:
+        if self.throttle and self._rng.random() < self.throttle:
+            return True
+        if not self.rate_limit:
+            return False
+        with self._window_lock:
+            now = time.monotonic()
+            while self._window and now - self._window[0] >= 1.0:
+                self._window.popleft()
+            if len(self._window) >= self.rate_limit:
+                return True
+            self._window.append(now)
+            return False
+
+    def named(self, params: Dict[str, List[str]]) -> Optional[Dict]:
+        exact = params.get('exact', [None])[0]
+        if exact is not None:
+            return self.by_name.get(exact.lower())
+        fuzzy = (params.get('fuzzy', [''])[0]).lower()
+        card = self.by_name.get(fuzzy)
+        if card is None and fuzzy:
+            # Good enough for a stand-in: the first name that contains the query.
+            card = next((c for name, c in self.by_name.items() if fuzzy in name), None)
+        return card
+
+    def collection(self, identifiers: List[Dict]) -> Dict:
+        data, not_found = [], []
+        for identifier in identifiers:
+            card = None
+            if 'id' in identifier:
+                card = self.by_id.get(identifier['id'])
+            elif 'collector_number' in identifier:
+                card = self.by_printing.get((identifier['set'].lower(), identifier['collector_number'].lower()))
+            elif 'name' in identifier:
+                card = self.by_name.get(identifier['name'].lower())
+                if card and 'set' in identifier and card['set'].lower() != identifier['set'].lower():
+                    card = None
+            if card is None:
+                not_found.append(identifier)
+            else:
+                data.append(card)
+        return {'object': 'list', 'not_found': not_found, 'data': data}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_stub: StubScryfall
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, endpoint: str, status: int, body: Dict, bytes_in: int = 0, headers: Dict = None):
+        payload = json.dumps(body, separators=(',', ':')).encode('utf-8')
+        headers = dict(headers or {})
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            payload = gzip.compress(payload, compresslevel=6)
+            headers['Content-Encoding'] = 'gzip'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+        self.server_stub.stats.record(endpoint, bytes_in, len(payload), status)
+
+    def _send_card(self, endpoint: str, card: Optional[Dict]):
+        """A single card with an ETag, or 304 if the client already has this version."""
+        if card is None:
+            return self._not_found(endpoint)
+        etag = '"' + hashlib.sha1(json.dumps(card, sort_keys=True).encode('utf-8')).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            self.server_stub.stats.record(endpoint, 0, 0, 304)
+            return
+        self._send(endpoint, 200, card, headers={'ETag': etag})
+
+    def _not_found(self, endpoint: str, bytes_in: int = 0):
+        self._send(endpoint, 404, {'object': 'error', 'code': 'not_found', 'status': 404,
+                                   'details': 'No card found.'}, bytes_in)
+
+    def _throttled(self, endpoint: str, bytes_in: int) -> bool:
+        stub = self.server_stub
+        if stub.latency:
+            time.sleep(stub.latency)
+        if not stub._should_throttle():
+            return False
+        self._send(endpoint, 429, {'object': 'error', 'code': 'rate_limited', 'status': 429,
+                                   'details': 'Too many requests.'},
+                   bytes_in, {'Retry-After': f"{stub.retry_after:g}"})
+        return True
+
+    def do_GET(self):
+        stub = self.server_stub
+        url = urlsplit(self.path)
+        parts = [unquote(p) for p in url.path.strip('/').split('/')]
+
+        if parts == ['_stats']:
+            payload = json.dumps(stub.stats.snapshot()).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        if parts == ['cards', 'named']:
+            if self._throttled('named', 0):
+                return
+            return self._send_card('named', stub.named(parse_qs(url.query)))
+
+        if len(parts) == 3 and parts[0] == 'cards':
+            if self._throttled('printing', 0):
+                return
+            return self._send_card('printing', stub.by_printing.get((parts[1].lower(), parts[2].lower())))
+
+        if len(parts) == 2 and parts[0] == 'cards':
+            if self._throttled('id', 0):
+                return
+            return self._send_card('id', stub.by_id.get(parts[1]))
+
+        self._not_found('other')
+
+    def do_POST(self):
+        stub = self.server_stub
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        if urlsplit(self.path).path.rstrip('/') != '/cards/collection':
+            return self._not_found('other', length)
+        if self._throttled('collection', length):
+            return
+
+        identifiers = json.loads(body or b'{}').get('identifiers', [])
+        if len(identifiers) > MAX_IDENTIFIERS:
+            return self._send('collection', 422, {'object': 'error', 'code': 'bad_request', 'status': 422,
+                                                  'details': 'Too many identifiers.'}, length)
+        self._send('collection', 200, stub.collection(identifiers), length)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--port", type=int, default=8089)
+    arg_parser.add_argument("--cards", type=int, default=10_000, help="size of the synthetic card pool")
+    arg_parser.add_argument("--latency", type=float, default=0.0)
+    arg_parser.add_argument("--throttle", type=float, default=0.0)
+    arg_parser.add_argument("--rate-limit", type=float, default=0.0)
+    arg_parser.add_argument("--retry-after", type=float, default=1.0)
+    args = arg_parser.parse_args()
+
+    stub = StubScryfall(card_pool(args.cards), args.latency, args.throttle, args.rate_limit, args.retry_after)
+    print(f"Serving {len(stub.by_id):,} cards on {stub.start(port=args.port)} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(json.dumps(stub.stats.snapshot(), indent=2))
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
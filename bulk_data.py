@@ -0,0 +1,301 @@
+# bulk_data.py
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from card_cache import default_cache_dir, normalize_name
+from name_index import NameIndex
+
+# ----- Tweakables -----
+READ_CHUNK_CHARS = 1 << 20
+
+# Only the fields the rest of the app reads are kept, which shrinks a
+# default_cards dump to a fraction of its size on disk.
+CARD_FIELDS = (
+    'id', 'oracle_id', 'name', 'layout', 'released_at', 'set', 'collector_number',
+    'mana_cost', 'cmc', 'type_line', 'oracle_text', 'power', 'toughness', 'loyalty',
+    'colors', 'color_identity', 'rarity', 'prices', 'image_uris', 'card_faces', 'all_parts',
+)
+FACE_FIELDS = (
+    'name', 'mana_cost', 'type_line', 'oracle_text', 'power', 'toughness', 'loyalty',
+    'colors', 'image_uris',
+)
+PART_FIELDS = ('id', 'component', 'name', 'type_line')
+
+
+def default_store_path() -> str:
+    return os.path.join(default_cache_dir(), "offline.sqlite3")
+
+
+def iter_bulk_cards(path: str, chunk_chars: int = READ_CHUNK_CHARS) -> Iterator[Dict]:
+    """
+    Streams the card objects out of a Scryfall bulk-data file.
+
+    Bulk files are a single JSON array that can exceed 1 GB, so the array is
+    decoded one element at a time from a sliding text buffer instead of being
+    loaded with json.load.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(chunk_chars).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"{path} is not a JSON array of cards.")
+        pos = 1
+        eof = False
+
+        while True:
+            # Skip the whitespace and commas between array elements.
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+
+            try:
+                card, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The element is cut off by the end of the buffer: read more.
+                if eof:
+                    raise
+                more = f.read(chunk_chars)
+                eof = not more
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+
+            yield card
+            pos = end
+
+
+def _compact(card: Dict) -> Dict:
+    """Drops everything from a card object that Card.from_scryfall_json and friends never read."""
+    out = {k: card[k] for k in CARD_FIELDS if k in card}
+    if 'image_uris' in out:
+        out['image_uris'] = {'normal': out['image_uris'].get('normal', '')}
+    if 'card_faces' in out:
+        faces = []
+        for face in out['card_faces']:
+            face = {k: face[k] for k in FACE_FIELDS if k in face}
+            if 'image_uris' in face:
+                face['image_uris'] = {'normal': face['image_uris'].get('normal', '')}
+            faces.append(face)
+        out['card_faces'] = faces
+    if 'all_parts' in out:
+        out['all_parts'] = [{k: p[k] for k in PART_FIELDS if k in p} for p in out['all_parts']]
+    return out
+
+
+class OfflineStore:
+    """
+    A compact, indexed SQLite copy of a Scryfall bulk file.
+
+    Cards are stored as zlib-compressed JSON in the same shape the API returns,
+    indexed by id, by normalized name (including each face of multi-faced
+    cards) and by set/collector number.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        if path is None:
+            os.makedirs(default_cache_dir(), exist_ok=True)
+            path = default_store_path()
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key   TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS cards (
+                id               TEXT PRIMARY KEY,
+                oracle_id        TEXT,
+                name             TEXT NOT NULL,
+                name_key         TEXT NOT NULL,
+                set_code         TEXT,
+                collector_number TEXT,
+                released_at      TEXT,
+                digest           BLOB NOT NULL,
+                data             BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS cards_name ON cards(name_key, released_at);
+            CREATE INDEX IF NOT EXISTS cards_printing ON cards(set_code, collector_number);
+            CREATE TABLE IF NOT EXISTS aliases (
+                name_key TEXT NOT NULL,
+                card_id  TEXT NOT NULL,
+                PRIMARY KEY (name_key, card_id)
+            );
+        """)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @property
+    def name_index_path(self) -> str:
+        return self.path + ".names"
+
+    def name_index(self) -> NameIndex:
+        """
+        The name index over this store's catalogue. It is loaded from the
+        prebuilt file next to the store, which every import rewrites, and only
+        built from the catalogue (and saved) if that file is missing or stale.
+        """
+        version = self.version or ""
+        index = NameIndex.load(self.name_index_path, stamp=version)
+        if index is None:
+            index = NameIndex.from_store(self)
+            try:
+                index.save(self.name_index_path, stamp=version)
+            except OSError as err:
+                print(f"Could not save the name index: {err}")
+        return index
+
+    @property
+    def version(self) -> Optional[str]:
+        """The updated_at timestamp of the bulk file this store was last built from."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else None
+
+    def get_by_id(self, card_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM cards WHERE id = ?", (card_id,)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def get_by_name(self, name: str) -> Optional[Dict]:
+        """Returns the newest printing with this exact (normalized) card or face name."""
+        key = normalize_name(name)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM cards WHERE name_key = ? ORDER BY released_at DESC LIMIT 1", (key,)
+            ).fetchone()
+            if row is None:
+                row = self._conn.execute(
+                    "SELECT c.data FROM aliases a JOIN cards c ON c.id = a.card_id "
+                    "WHERE a.name_key = ? ORDER BY c.released_at DESC LIMIT 1", (key,)
+                ).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def get_by_printing(self, set_code: str, collector_number: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM cards WHERE set_code = ? AND collector_number = ?",
+                (set_code.lower(), collector_number.lower())
+            ).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def import_file(self, path: str, updated_at: Optional[str] = None, force: bool = False) -> Optional[int]:
+        """
+        Imports a bulk file into the store.
+
+        updated_at should be the bulk file's 'updated_at' from Scryfall's
+        /bulk-data listing; it defaults to the file's modification time. The
+        import is skipped (returning None) unless the file is newer than the
+        one the store was built from, or force is set. Otherwise only rows
+        whose content changed are rewritten, cards missing from the new file
+        are removed, and the number of changed rows is returned. The whole
+        import runs in one transaction, so an interrupted run changes nothing.
+        """
+        if updated_at is None:
+            mtime = os.path.getmtime(path)
+            updated_at = datetime.fromtimestamp(mtime, tz=timezone.utc).isoformat()
+
+        current = self.version
+        if current is not None and updated_at <= current and not force:
+            return None
+
+        changed = 0
+        with self._lock:
+            conn = self._conn
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen (id TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM seen")
+            try:
+                for card in iter_bulk_cards(path):
+                    if 'id' not in card or 'name' not in card:
+                        continue
+                    card = _compact(card)
+                    payload = json.dumps(card, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+                    digest = hashlib.blake2b(payload, digest_size=16).digest()
+                    conn.execute("INSERT OR IGNORE INTO seen VALUES (?)", (card['id'],))
+
+                    row = conn.execute("SELECT digest FROM cards WHERE id = ?", (card['id'],)).fetchone()
+                    if row and row[0] == digest:
+                        continue
+
+                    changed += 1
+                    conn.execute(
+                        "INSERT OR REPLACE INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (card['id'], card.get('oracle_id'), card['name'], normalize_name(card['name']),
+                         card.get('set', '').lower(), card.get('collector_number', '').lower(),
+                         card.get('released_at', ''), digest, zlib.compress(payload, 6))
+                    )
+                    conn.execute("DELETE FROM aliases WHERE card_id = ?", (card['id'],))
+                    face_names = {normalize_name(f['name']) for f in card.get('card_faces', []) if 'name' in f}
+                    face_names.discard(normalize_name(card['name']))
+                    conn.executemany("INSERT OR IGNORE INTO aliases VALUES (?, ?)",
+                                     [(key, card['id']) for key in face_names])
+
+                removed = conn.execute("DELETE FROM cards WHERE id NOT IN (SELECT id FROM seen)").rowcount
+                conn.execute("DELETE FROM aliases WHERE card_id NOT IN (SELECT id FROM seen)")
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (updated_at,))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+        # Build the name index now, so later runs load it instead of building it at launch.
+        self.name_index()
+        return changed + removed
+
+    def catalogue(self) -> Iterator[Tuple[str, str, List[str]]]:
+        """
+        Yields (name, id, face names) once per distinct card name, using the
+        newest printing's id.
+        """
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT c.name, c.id, (SELECT group_concat(a.name_key, '\n') FROM aliases a WHERE a.card_id = c.id)
+                FROM cards c
+                WHERE c.id = (SELECT n.id FROM cards n WHERE n.name_key = c.name_key
+                              ORDER BY n.released_at DESC LIMIT 1)
+            """).fetchall()
+        for name, card_id, faces in rows:
+            yield name, card_id, faces.split('\n') if faces else []
+
+    def names(self) -> List[str]:
+        """Returns every distinct card name in the store."""
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT name FROM cards").fetchall()
+        return [row[0] for row in rows]
+
+
+def main(argv: Optional[List[str]] = None):
+    arg_parser = argparse.ArgumentParser(description="Import a Scryfall bulk-data file for offline use.")
+    arg_parser.add_argument("bulk_file", help="Path to an oracle_cards or default_cards JSON file.")
+    arg_parser.add_argument("--db", default=None, help="Offline store to write (default: user cache dir).")
+    arg_parser.add_argument("--updated-at", default=None,
+                            help="The file's 'updated_at' from /bulk-data (default: file modification time).")
+    arg_parser.add_argument("--force", action="store_true", help="Re-import even if the file is not newer.")
+    arg_parser.add_argument("--export-index", metavar="FILE",
+                            help="Also write the store's name index here, e.g. name_index.bin to bundle with the app.")
+    args = arg_parser.parse_args(argv)
+
+    store = OfflineStore(args.db)
+    changed = store.import_file(args.bulk_file, updated_at=args.updated_at, force=args.force)
+    if changed is None:
+        print(f"Offline store is already up to date ({store.version}).")
+    else:
+        print(f"Imported {args.bulk_file}: {changed} cards changed.")
+    if args.export_index:
+        store.name_index().save(args.export_index, stamp=store.version or "")
+        print(f"Wrote the name index to {args.export_index}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
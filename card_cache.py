@@ -0,0 +1,349 @@
+# card_cache.py
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import metrics
+
+# ----- Tweakables -----
+RULES_TTL = 30 * 24 * 60 * 60  # Oracle text, faces, etc. almost never change.
+PRICES_TTL = 24 * 60 * 60      # Scryfall refreshes prices roughly once a day.
+MAX_BYTES = 64 * 1024 * 1024
+# Fields kept uncompressed: enough to key, dedupe and re-intern a card
+# without inflating the rest of its JSON.
+HEAD_FIELDS = ('id', 'oracle_id', 'name', 'set', 'collector_number', 'all_parts')
+SCHEMA_VERSION = 2
+SQL_BATCH = 500  # Ids per 'IN (...)' query, well below SQLite's parameter limit.
+ACCESS_FLUSH = 256  # Cache hits whose last_access is kept in memory before it is written.
+
+
+def default_cache_dir() -> str:
+    """Returns the per-user cache directory for this application."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "MtgDeckFormatter")
+
+
+def normalize_name(name: str) -> str:
+    """Cache key for a card name: case-insensitive, whitespace-collapsed."""
+    return " ".join(name.lower().split())
+
+
+class CachedCard(Mapping):
+    """
+    Read-only card JSON as loaded from the cache.
+
+    The identifying fields and prices are held as-is; the rest of the card
+    stays zlib-compressed until something reads a field outside of those
+    (e.g. Card.from_scryfall_json building a card it has not seen yet).
+    'stale' is set when the entry has outlived its TTL and was only returned
+    so the caller can revalidate it with 'etag' / 'last_modified'.
+    """
+    __slots__ = ('_head', '_body', 'stale', 'etag', 'last_modified')
+
+    def __init__(self, head: Dict, body: bytes, stale: bool = False,
+                 etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self._head = head
+        self._body = body
+        self.stale = stale
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def _inflate(self):
+        if self._body is not None:
+            rest = json.loads(zlib.decompress(self._body))
+            rest.update(self._head)
+            self._head = rest
+            self._body = None
+
+    def __getitem__(self, key):
+        try:
+            return self._head[key]
+        except KeyError:
+            if self._body is None:
+                raise
+        self._inflate()
+        return self._head[key]
+
+    def __iter__(self) -> Iterator[str]:
+        self._inflate()
+        return iter(self._head)
+
+    def __len__(self) -> int:
+        self._inflate()
+        return len(self._head)
+
+    def __reduce__(self):
+        return CachedCard, (self._head, self._body)
+
+    @property
+    def has_validators(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+
+class CardCache:
+    """
+    A persistent SQLite cache of raw Scryfall card JSON.
+
+    Cards are stored once per Scryfall id and can be looked up by id, by exact
+    printing (set code and collector number) or by any name they were
+    requested under. The 'prices' block is stored separately from the rules
+    data so both can expire on their own TTL. Rules data is stored
+    zlib-compressed and only inflated when a field of it is read, and the
+    ETag / Last-Modified of the response a card came from is kept so an
+    expired entry can be revalidated instead of downloaded again. Only
+    single-card responses (/cards/named, /cards/{id}, a printing) carry
+    validators; cards stored from a /cards/collection batch, the usual path
+    for decks, have none and are downloaded again once they expire. When the
+    cache grows beyond max_bytes the least recently used cards are evicted.
+    """
+
+    def __init__(self, path: Optional[str] = None, rules_ttl: float = RULES_TTL,
+                 prices_ttl: float = PRICES_TTL, max_bytes: int = MAX_BYTES):
+        if path is None:
+            os.makedirs(default_cache_dir(), exist_ok=True)
+            path = os.path.join(default_cache_dir(), "cards.sqlite3")
+        self.path = path
+        self.rules_ttl = rules_ttl
+        self.prices_ttl = prices_ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        # Hits only touch last_access in memory; it is written in batches, see _flush_access.
+        self._accessed: Dict[str, float] = {}
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            # Older layouts held uncompressed JSON; it is only a cache, so start over.
+            self._conn.executescript("""
+                DROP TABLE IF EXISTS cards;
+                DROP TABLE IF EXISTS names;
+                DROP TABLE IF EXISTS printings;
+            """)
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS cards (
+                id             TEXT PRIMARY KEY,
+                head_json      TEXT NOT NULL,
+                body           BLOB NOT NULL,
+                prices_json    TEXT NOT NULL,
+                etag           TEXT,
+                last_modified  TEXT,
+                rules_fetched  REAL NOT NULL,
+                prices_fetched REAL NOT NULL,
+                last_access    REAL NOT NULL,
+                size           INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS cards_last_access ON cards(last_access);
+            CREATE TABLE IF NOT EXISTS names (
+                name_key TEXT PRIMARY KEY,
+                card_id  TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS printings (
+                set_code         TEXT NOT NULL,
+                collector_number TEXT NOT NULL,
+                card_id          TEXT NOT NULL,
+                PRIMARY KEY (set_code, collector_number)
+            );
+        """)
+
+    def close(self):
+        with self._lock:
+            self._flush_access()
+            self._conn.commit()
+            self._conn.close()
+
+    def _flush_access(self):
+        """Writes the pending last_access times; the caller commits."""
+        if self._accessed:
+            self._conn.executemany("UPDATE cards SET last_access = ? WHERE id = ?",
+                                   [(when, card_id) for card_id, when in self._accessed.items()])
+            self._accessed.clear()
+
+    # Every getter returns None on a miss or expiry. With allow_stale=True an
+    # expired entry is returned instead, marked stale, for revalidation.
+
+    def get_by_name(self, name: str, allow_stale: bool = False) -> Optional[CachedCard]:
+        """Returns the cached card JSON for a name."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT card_id FROM names WHERE name_key = ?", (normalize_name(name),)
+            ).fetchone()
+            return self._load(row[0] if row else None, allow_stale)
+
+    def get_by_printing(self, set_code: str, collector_number: str,
+                        allow_stale: bool = False) -> Optional[CachedCard]:
+        """
+        Returns the cached JSON of one exact printing. Unlike name lookups,
+        this never returns a different printing of the card.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT card_id FROM printings WHERE set_code = ? AND collector_number = ?",
+                (set_code.lower(), collector_number.lower())
+            ).fetchone()
+            return self._load(row[0] if row else None, allow_stale)
+
+    def get_by_id(self, card_id: str, allow_stale: bool = False) -> Optional[CachedCard]:
+        """Returns the cached card JSON for a Scryfall id."""
+        with self._lock:
+            return self._load(card_id, allow_stale)
+
+    def _load(self, card_id: Optional[str], allow_stale: bool) -> Optional[CachedCard]:
+        row = None
+        if card_id is not None:
+            row = self._conn.execute(
+                "SELECT head_json, body, prices_json, etag, last_modified, rules_fetched, prices_fetched "
+                "FROM cards WHERE id = ?", (card_id,)
+            ).fetchone()
+
+        now = time.time()
+        stale = row is not None and (now - row[5] > self.rules_ttl or now - row[6] > self.prices_ttl)
+        if row is None or (stale and not allow_stale):
+            self.misses += 1
+            metrics.incr('cache.misses')
+            return None
+
+        if stale:
+            self.stale += 1
+            metrics.incr('cache.stale')
+        else:
+            self.hits += 1
+            metrics.incr('cache.hits')
+        # A write transaction per hit would cost more than the hit saves, so
+        # access times are batched; they only order the eviction.
+        self._accessed[card_id] = now
+        if len(self._accessed) >= ACCESS_FLUSH:
+            self._flush_access()
+            self._conn.commit()
+        head = json.loads(row[0])
+        head['prices'] = json.loads(row[2])
+        return CachedCard(head, row[1], stale, row[3], row[4])
+
+    def revalidated(self, card_id: str):
+        """Marks a card fresh again after the server confirmed it is unchanged (304)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE cards SET rules_fetched = ?, prices_fetched = ?, last_access = ? WHERE id = ?",
+                (now, now, now, card_id)
+            )
+            self._conn.commit()
+
+    def get_prices(self, card_ids: Iterable[str]) -> Dict[str, Tuple[Dict, float]]:
+        """
+        Returns {id: (prices, fetched)} for the cached cards among card_ids,
+        whatever their age, without touching their rules data.
+        """
+        ids = list(dict.fromkeys(card_ids))
+        found = {}
+        with self._lock:
+            for start in range(0, len(ids), SQL_BATCH):
+                chunk = ids[start:start + SQL_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT id, prices_json, prices_fetched FROM cards WHERE id IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+                for card_id, prices_json, fetched in rows:
+                    found[card_id] = (json.loads(prices_json), fetched)
+        return found
+
+    def stale_price_ids(self, card_ids: Iterable[str]) -> List[str]:
+        """The ids among card_ids whose cached prices have expired or that are not cached at all."""
+        ids = list(dict.fromkeys(card_ids))
+        known = self.get_prices(ids)
+        now = time.time()
+        return [card_id for card_id in ids
+                if card_id not in known or now - known[card_id][1] > self.prices_ttl]
+
+    def update_prices(self, prices_by_id: Dict[str, Dict]):
+        """
+        Stores freshly fetched 'prices' blocks for cards that are already
+        cached. Their rules data and validators are left as they are, so a
+        price refresh never rewrites the compressed card body.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE cards SET prices_json = ?, prices_fetched = ? WHERE id = ?",
+                [(json.dumps(prices, separators=(',', ':')), now, card_id)
+                 for card_id, prices in prices_by_id.items()]
+            )
+            self._conn.commit()
+
+    def put(self, card: Dict, aliases: Iterable[str] = (), etag: Optional[str] = None,
+            last_modified: Optional[str] = None):
+        """
+        Stores a card's JSON, indexed under its id, its printing (set and
+        collector number), its name and any aliases (e.g. the fuzzy query that
+        resolved to it), then enforces max_bytes. etag and last_modified are
+        the validators of the response the card came from, if any.
+        """
+        card_id = card.get('id')
+        if not card_id:
+            return
+
+        head = {k: card[k] for k in HEAD_FIELDS if k in card}
+        rest = {k: v for k, v in card.items() if k != 'prices' and k not in head}
+        head_json = json.dumps(head, separators=(',', ':'))
+        body = zlib.compress(json.dumps(rest, separators=(',', ':')).encode('utf-8'))
+        prices_json = json.dumps(card.get('prices', {}), separators=(',', ':'))
+        size = len(head_json) + len(body) + len(prices_json)
+        now = time.time()
+
+        name_keys = {normalize_name(card.get('name', ''))}
+        name_keys.update(normalize_name(alias) for alias in aliases)
+        name_keys.discard('')
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (card_id, head_json, body, prices_json, etag, last_modified, now, now, now, size)
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO names VALUES (?, ?)",
+                [(key, card_id) for key in name_keys]
+            )
+            if card.get('set') and card.get('collector_number'):
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO printings VALUES (?, ?, ?)",
+                    (card['set'].lower(), card['collector_number'].lower(), card_id)
+                )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        self._flush_access()
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cards").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        doomed = []
+        for card_id, size in self._conn.execute("SELECT id, size FROM cards ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            doomed.append((card_id,))
+            total -= size
+
+        self._conn.executemany("DELETE FROM cards WHERE id = ?", doomed)
+        self._conn.execute("DELETE FROM names WHERE card_id NOT IN (SELECT id FROM cards)")
+        self._conn.execute("DELETE FROM printings WHERE card_id NOT IN (SELECT id FROM cards)")
+
+    def stats(self) -> Dict[str, int]:
+        """Returns hit/miss counters and the current size of the cache."""
+        with self._lock:
+            count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cards").fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'stale': self.stale, 'cards': count, 'bytes': size}
@@ -0,0 +1,220 @@
+# fetch_engine.py
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import metrics
+
+# requests (with urllib3, ssl and friends) is the slowest import of the app,
+# so it is only loaded once the first request is about to be sent.
+if TYPE_CHECKING:
+    import requests
+
+# ----- Tweakables -----
+# Scryfall asks for 50-100 ms between requests, i.e. about 10 per second.
+REQUESTS_PER_SECOND = 10.0
+BURST = 2
+MAX_WORKERS = 8
+REQUEST_TIMEOUT = (3.05, 20)  # (connect, read) seconds
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+USER_AGENT = "MtgDeckFormatter/1.0"
+
+try:
+    import brotli  # noqa: F401 - lets urllib3 decode 'br' responses
+    ACCEPT_ENCODING = "br, gzip, deflate"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+
+class TokenBucket:
+    """
+    A thread-safe token-bucket rate limiter.
+
+    acquire() blocks until the caller may send a request. pause() stops every
+    caller for a while, e.g. when the server answers 429 with Retry-After.
+    """
+
+    def __init__(self, rate: float = REQUESTS_PER_SECOND, capacity: int = BURST):
+        self.interval = 1.0 / rate
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._next_free = 0.0      # When the next request slot opens once the burst is spent.
+        self._paused_until = 0.0
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            next_free = max(self._next_free, now)
+            ready = max(next_free - (self.capacity - 1) * self.interval, self._paused_until)
+            self._next_free = max(next_free, ready) + self.interval
+        wait = ready - now
+        if wait > 0:
+            metrics.add_time('rate_limit_wait', wait)
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class Cancelled(Exception):
+    """Raised by request() when its cancel event was set before the request went out."""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical lookups.
+
+    The first caller to claim a key owns it and must publish its result; any
+    caller that asks for the same key meanwhile gets the owner's Future
+    instead of issuing its own request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def claim(self, keys: Iterable[Hashable]) -> Tuple[List[Hashable], Dict[Hashable, Future]]:
+        """Returns (keys now owned by the caller, {key: Future} for keys already in flight)."""
+        owned, borrowed = [], {}
+        with self._lock:
+            for key in keys:
+                future = self._calls.get(key)
+                if future is None:
+                    self._calls[key] = Future()
+                    owned.append(key)
+                else:
+                    borrowed[key] = future
+        return owned, borrowed
+
+    def publish(self, key: Hashable, value: Any):
+        with self._lock:
+            future = self._calls.pop(key, None)
+        if future is not None:
+            future.set_result(value)
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """Runs func() unless an identical call is already in flight, then shares its result."""
+        owned, borrowed = self.claim([key])
+        if not owned:
+            return borrowed[key].result()
+        value = None
+        try:
+            value = func()
+        finally:
+            self.publish(key, value)
+        return value
+
+
+limiter = TokenBucket()
+flights = SingleFlight()
+# Published instead of a result when the owner of a key gave up before
+# fetching it (e.g. a cancelled job); whoever waited should fetch it itself.
+ABANDONED = object()
+
+_session: Optional['requests.Session'] = None
+_executor: Optional[ThreadPoolExecutor] = None
+_init_lock = threading.Lock()
+
+
+def get_session() -> 'requests.Session':
+    """Returns the process-wide Session, whose pooled connections are kept alive between requests."""
+    global _session
+    with _init_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=MAX_WORKERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({'User-Agent': USER_AGENT, 'Accept': 'application/json',
+                                    'Accept-Encoding': ACCEPT_ENCODING})
+            _session = session
+    return _session
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Returns the shared worker pool that concurrent lookups run on."""
+    global _executor
+    with _init_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="scryfall")
+    return _executor
+
+
+def _retry_after(response: 'requests.Response') -> Optional[float]:
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        from email.utils import parsedate_to_datetime
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def _backoff(attempt: int) -> float:
+    delay = BACKOFF_BASE * (2 ** attempt)
+    return random.uniform(delay / 2, delay)
+
+
+def request(method: str, url: str, cancel: Optional[threading.Event] = None,
+            **kwargs) -> 'requests.Response':
+    """
+    Sends a request through the shared session and rate limiter.
+
+    429 responses honor Retry-After (pausing every worker, not just this one);
+    429s without it, 5xx responses, timeouts and connection errors are retried
+    with jittered exponential backoff. The final response is returned as-is,
+    so callers still decide what a 404 means; the last network error is
+    re-raised if every attempt failed. If cancel is set by the time the
+    limiter lets the request (or a retry) through, Cancelled is raised and
+    nothing is sent.
+    """
+    import requests
+    kwargs.setdefault('timeout', REQUEST_TIMEOUT)
+    session = get_session()
+
+    for attempt in range(MAX_RETRIES + 1):
+        if attempt:
+            metrics.incr('http.retries')
+        limiter.acquire()
+        if cancel is not None and cancel.is_set():
+            raise Cancelled(url)
+        metrics.incr('http.requests')
+        try:
+            with metrics.timer('http_request'):
+                response = session.request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            metrics.incr('http.errors')
+            if attempt == MAX_RETRIES:
+                raise
+            time.sleep(_backoff(attempt))
+            continue
+
+        if response.status_code == 304:
+            metrics.incr('http.not_modified')
+        elif response.status_code == 404:
+            metrics.incr('http.not_found')
+        elif response.status_code == 429:
+            metrics.incr('http.throttled')
+        elif response.status_code >= 500:
+            metrics.incr('http.server_errors')
+        if response.status_code != 429 and response.status_code < 500:
+            return response
+        if attempt == MAX_RETRIES:
+            return response
+
+        delay = _retry_after(response) if response.status_code == 429 else None
+        if delay is None:
+            delay = _backoff(attempt)
+        if response.status_code == 429:
+            limiter.pause(delay)
+        time.sleep(delay)
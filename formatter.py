@@ -1,36 +1,20 @@
 # formatter.py
 import textwrap
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Tuple
+import metrics
 from models import Card
+from parser import UNCOUNTED_SECTIONS
 
 # ----- Tweakables -----
 WIDTH = 72
-WRAP_WIDTH = WIDTH - 4
-SECT_RULE = "─" * WIDTH
-CARD_SEPARATOR = "·" * (WIDTH - 8)
-MELD_RULE = "─" * (WIDTH - 2)
-
-
-# ... (all other helper functions remain the same) ...
-def _rule(char="─", width=WIDTH) -> str:
-    return char * width
-
-
-def _center(title: str, pad_char=" ") -> str:
-    title = f" {title.strip()} "
-    if len(title) >= WIDTH:
-        return title[:WIDTH]
-    side = (WIDTH - len(title)) // 2
-    return f"{pad_char * side}{title}{pad_char * (WIDTH - len(title) - side)}"
-
-
-def _wrap(text: str, initial_indent: str = "  ", subsequent_indent: str = "  ") -> str:
-    wrapper = textwrap.TextWrapper(width=WRAP_WIDTH,
-                                   initial_indent=initial_indent,
-                                   subsequent_indent=subsequent_indent,
-                                   break_long_words=False,
-                                   break_on_hyphens=False)
-    return wrapper.fill(text)
+MAX_MEMOIZED_CARDS = 50_000
+SECTION_TITLES = {
+    'main': "Main Deck",
+    'sideboard': "Sideboard",
+    'commander': "Commander",
+    'companion': "Companion",
+    'maybeboard': "Maybeboard",
+}
 
 
 def _safe(val, default="") -> str:
@@ -66,135 +50,259 @@ def _is_meld_card(card: Card) -> bool:
         return False
 
     meld_components = {"meld_part", "meld_result"}
-    return any(part.get("component") in meld_components for part in card.all_parts)
-
-
-def _format_face(face, faces_len: int, face_index: int) -> List[str]:
-    lines: List[str] = []
-    if faces_len > 1:
-        title = _face_title(face_index, [None] * faces_len)
-        label = face.name if not title else f"{face.name} ({title})"
-        lines.append("")
-        lines.append(_center(label, "-"))
-    if face.power is not None and face.toughness is not None:
-        lines.append(f"  P/T: {face.power}/{face.toughness}")
-    if face.loyalty is not None:
-        lines.append(f"  Loyalty: {face.loyalty}")
-    if face.oracle_text:
-        if not (face.power is not None or face.loyalty is not None):
+    return any(part.component in meld_components for part in card.all_parts)
+
+
+class DeckRenderer:
+    """
+    Renders decks as fixed-width text.
+
+    A renderer reuses one TextWrapper per indent style and memoizes each
+    card's rendered block (everything but the quantity), keyed by the shared
+    CardData and meld result. A staple that appears in thousands of decks is
+    therefore wrapped once per renderer, i.e. once per output width.
+    """
+
+    def __init__(self, width: int = WIDTH):
+        self.width = width
+        self.wrap_width = width - 4
+        self.sect_rule = "─" * width
+        self.card_separator = self._center("·" * (width - 8))
+        self.meld_rule = "─" * (width - 2)
+        self._wrappers: Dict[Tuple[str, str], textwrap.TextWrapper] = {}
+        self._memo: Dict[tuple, Tuple[str, List[str]]] = {}
+
+    def _center(self, title: str, pad_char=" ") -> str:
+        title = f" {title.strip()} "
+        if len(title) >= self.width:
+            return title[:self.width]
+        side = (self.width - len(title)) // 2
+        return f"{pad_char * side}{title}{pad_char * (self.width - len(title) - side)}"
+
+    def _columns(self, left: str, right: str) -> str:
+        """
+        left, and right flush with the right margin. When both do not fit on
+        one line with a space between them, right goes on a line of its own.
+        """
+        if right and len(left) + 1 + len(right) > self.width:
+            return f"{left}\n{right.rjust(self.width)}"
+        return f"{left}{right.rjust(self.width - len(left))}"
+
+    def _wrap(self, text: str, initial_indent: str = "  ", subsequent_indent: str = "  ") -> str:
+        wrapper = self._wrappers.get((initial_indent, subsequent_indent))
+        if wrapper is None:
+            wrapper = textwrap.TextWrapper(width=self.wrap_width,
+                                           initial_indent=initial_indent,
+                                           subsequent_indent=subsequent_indent,
+                                           break_long_words=False,
+                                           break_on_hyphens=False)
+            self._wrappers[(initial_indent, subsequent_indent)] = wrapper
+        return wrapper.fill(text)
+
+    def _format_face(self, face, faces_len: int, face_index: int) -> List[str]:
+        lines: List[str] = []
+        if faces_len > 1:
+            title = _face_title(face_index, [None] * faces_len)
+            label = face.name if not title else f"{face.name} ({title})"
             lines.append("")
-        lines.append("Text:")
-        bullet_prefixes = ("•", "-", "–")
-        for raw_line in face.oracle_text.split("\n"):
-            stripped = raw_line.strip()
-            if not stripped: continue
-            if stripped.startswith(bullet_prefixes):
-                bullet_wrap = textwrap.TextWrapper(
-                    width=WRAP_WIDTH, initial_indent="    " + stripped[0] + " ",
-                    subsequent_indent="      ", break_long_words=False, break_on_hyphens=False
-                )
-                lines.append(bullet_wrap.fill(stripped[1:].lstrip()))
-            else:
-                lines.append(_wrap(stripped))
-    return lines
-
-
-def _format_meld_section(card: Card) -> List[str]:
-    lines: List[str] = []
-    lines.append("~ Meld Information ~")
-    is_result = any(p["component"] == "meld_result" and p["name"] == card.name for p in card.all_parts)
-    if is_result:
-        parts = [p["name"] for p in card.all_parts if p["component"] == "meld_part"]
-        lines.append("  This is the result of melding:")
-        for p in parts: lines.append(f"    • {p}")
-    else:
-        try:
-            partner = next(
-                p["name"] for p in card.all_parts if p["component"] == "meld_part" and p["name"] != card.name)
-            result_name = next(p["name"] for p in card.all_parts if p["component"] == "meld_result")
-            lines.append(f"  Melds with: {partner}")
-            lines.append(f"  To become:  {result_name}")
-        except StopIteration:
-            lines.append("  Meld data is incomplete.")
-    if getattr(card, "meld_result_card", None):
-        lines.append("")
-        lines.extend(_format_card_block(card.meld_result_card, is_sub_card=True))
-    return lines
-
-
-# --- MODIFIED: This function is updated to include rarity ---
-def _format_card_header(card: Card) -> List[str]:
-    lines: List[str] = []
-    first_face = card.card_faces[0] if card.card_faces else None
-    if not first_face: return []
-
-    # Line 1: Quantity, Name, and Mana Cost
-    qty_name = f"{card.quantity}x {card.name}"
-    mana_cost = _format_mana_cost(first_face)
-    lines.append(f"{qty_name}{mana_cost.rjust(WIDTH - len(qty_name))}")
-
-    # Line 2: Type Line, Rarity, Colors, and Price
-
-    # Build the left-side string (Type and Rarity)
-    # Using .title() to make "common" -> "Common", "rare" -> "Rare", etc.
-    type_line_str = first_face.type_line or ''
-    if card.rarity:
-        type_line_str = f"{type_line_str} - {card.rarity.title()}"
-    type_line = f"  {type_line_str}"
-
-    # Build the right-side string (Colors and Price)
-    right_side_info = []
-    if _should_display_colors(card):
-        right_side_info.append(f"Colors: {_format_colors(card.colors)}")
-    if card.price_usd:
-        right_side_info.append(f"Price: €{card.price_usd}")
-
-    right_str = "   •   ".join(right_side_info)
-
-    if right_str:
-        lines.append(f"{type_line}{right_str.rjust(WIDTH - len(type_line))}")
-    else:
-        lines.append(type_line)
-
-    return lines
-
-
-# -----------------------------------------------------------------
-
-
-def _format_card_block(card: Card, is_sub_card: bool = False) -> List[str]:
-    out: List[str] = []
-    if is_sub_card:
-        out.append(MELD_RULE)
-        out.extend(_format_card_header(card))
-    else:
-        out.extend(_format_card_header(card))
-    for i, face in enumerate(card.card_faces):
-        out.extend(_format_face(face, faces_len=len(card.card_faces), face_index=i))
-    return out
-
-
-def format_deck_as_text(deck: List[Card]) -> str:
-    output: List[str] = []
-    total_cards = sum(card.quantity for card in deck)
-    output.append(SECT_RULE)
-    output.append(_center("MTG DECKLIST REPORT"))
-    output.append(_center(f"Total Cards: {total_cards}   •   Unique Cards: {len(deck)}"))
-    output.append(SECT_RULE)
-    output.append("")
-    for idx, card in enumerate(deck, start=1):
-        if idx > 1:
-            output.append("")
-            output.append(_center(CARD_SEPARATOR))
-            output.append("")
-
-        output.extend(_format_card_block(card))
+            lines.append(self._center(label, "-"))
+        if face.power is not None and face.toughness is not None:
+            lines.append(f"  P/T: {face.power}/{face.toughness}")
+        if face.loyalty is not None:
+            lines.append(f"  Loyalty: {face.loyalty}")
+        if face.oracle_text:
+            if not (face.power is not None or face.loyalty is not None):
+                lines.append("")
+            lines.append("Text:")
+            bullet_prefixes = ("•", "-", "–")
+            for raw_line in face.oracle_text.split("\n"):
+                stripped = raw_line.strip()
+                if not stripped: continue
+                if stripped.startswith(bullet_prefixes):
+                    lines.append(self._wrap(stripped[1:].lstrip(), "    " + stripped[0] + " ", "      "))
+                else:
+                    lines.append(self._wrap(stripped))
+        return lines
+
+    def _format_meld_section(self, card: Card) -> List[str]:
+        lines: List[str] = []
+        lines.append("~ Meld Information ~")
+        is_result = any(p.component == "meld_result" and p.name == card.name for p in card.all_parts)
+        if is_result:
+            parts = [p.name for p in card.all_parts if p.component == "meld_part"]
+            lines.append("  This is the result of melding:")
+            for p in parts: lines.append(f"    • {p}")
+        else:
+            try:
+                partner = next(
+                    p.name for p in card.all_parts if p.component == "meld_part" and p.name != card.name)
+                result_name = next(p.name for p in card.all_parts if p.component == "meld_result")
+                lines.append(f"  Melds with: {partner}")
+                lines.append(f"  To become:  {result_name}")
+            except StopIteration:
+                lines.append("  Meld data is incomplete.")
+        if getattr(card, "meld_result_card", None):
+            lines.append("")
+            lines.extend(self._format_card_block(card.meld_result_card, is_sub_card=True))
+        return lines
+
+    def _format_quantity_line(self, card: Card) -> str:
+        # Line 1: Quantity, Name, and Mana Cost
+        qty_name = f"{card.quantity}x {card.name}"
+        mana_cost = _format_mana_cost(card.card_faces[0])
+        return self._columns(qty_name, mana_cost)
+
+    def _format_type_line(self, card: Card) -> str:
+        # Line 2: Type Line, Rarity, Colors, and Price
+        first_face = card.card_faces[0]
+
+        # Build the left-side string (Type and Rarity)
+        # Using .title() to make "common" -> "Common", "rare" -> "Rare", etc.
+        type_line_str = first_face.type_line or ''
+        if card.rarity:
+            type_line_str = f"{type_line_str} - {card.rarity.title()}"
+        type_line = f"  {type_line_str}"
+
+        # Build the right-side string (Colors and Price)
+        right_side_info = []
+        if _should_display_colors(card):
+            right_side_info.append(f"Colors: {_format_colors(card.colors)}")
+        if card.price_eur:
+            right_side_info.append(f"Price: €{card.price_eur}")
+
+        right_str = "   •   ".join(right_side_info)
+
+        if right_str:
+            return self._columns(type_line, right_str)
+        return type_line
+
+    def _format_card_block(self, card: Card, is_sub_card: bool = False) -> List[str]:
+        out: List[str] = []
+        if is_sub_card:
+            out.append(self.meld_rule)
+        if card.card_faces:
+            out.append(self._format_quantity_line(card))
+            out.append(self._format_type_line(card))
+        for i, face in enumerate(card.card_faces):
+            out.extend(self._format_face(face, faces_len=len(card.card_faces), face_index=i))
+        return out
+
+    def _card_body(self, card: Card) -> List[str]:
+        """Everything in a card's block below its quantity line."""
+        output = self._format_card_block(card)[1:] if card.card_faces else []
 
         if _is_meld_card(card):
             output.append("")
-            output.extend(_format_meld_section(card))
-
-    while output and not output[-1].strip():
-        output.pop()
-    output.append("")
-    return "\n".join(output)
\ No newline at end of file
+            output.extend(self._format_meld_section(card))
+
+        while output and not output[-1].strip():
+            output.pop()
+        return output
+
+    @metrics.timed('format_card')
+    def format_card(self, card: Card) -> str:
+        """Renders one card's block (without the separator), memoized per card."""
+        meld = card.meld_result_card
+        key = (card.data, meld.data if meld else None, meld.quantity if meld else None)
+        body = self._memo.get(key)
+        if body is None:
+            if len(self._memo) >= MAX_MEMOIZED_CARDS:
+                self._memo.clear()
+            body = "".join(line + "\n" for line in self._card_body(card))
+            self._memo[key] = body
+        if not card.card_faces:
+            return body
+        return self._format_quantity_line(card) + "\n" + body
+
+    def format_header(self, total_cards: int, unique_cards: int) -> str:
+        """The report header with deck totals, ready to be placed above the card blocks."""
+        output: List[str] = [
+            self.sect_rule,
+            self._center("MTG DECKLIST REPORT"),
+            self._center(f"Total Cards: {total_cards}   •   Unique Cards: {unique_cards}"),
+            self.sect_rule,
+        ]
+        return "\n".join(output) + "\n"
+
+    def section_heading(self, section: str) -> str:
+        return self._center(SECTION_TITLES.get(section, section.title()).upper(), "─")
+
+    def deck_block(self, card: Card, idx: int, previous_section: str = 'main') -> str:
+        """
+        A card's block as it appears at position idx (1-based) of a deck,
+        after a card of previous_section. A card that opens another section
+        is preceded by that section's heading instead of the separator.
+        """
+        block = self.format_card(card)
+        if card.section != previous_section:
+            block = self.section_heading(card.section) + "\n\n" + block
+            return "\n" + block if idx > 1 else block
+        if idx > 1:
+            return "\n" + self.card_separator + "\n\n" + block
+        return block
+
+    def iter_blocks(self, deck: Iterable[Card]) -> Iterator[str]:
+        section = 'main'
+        for idx, card in enumerate(deck, start=1):
+            yield self.deck_block(card, idx, section)
+            section = card.section
+
+    def stream(self, deck: Iterable[Card]) -> Iterator[Tuple[str, str]]:
+        total_cards = 0
+        unique_cards = 0
+        section = 'main'
+        for idx, card in enumerate(deck, start=1):
+            if card.section not in UNCOUNTED_SECTIONS:
+                total_cards += card.quantity
+                unique_cards += 1
+            yield 'card', self.deck_block(card, idx, section)
+            section = card.section
+        yield 'header', self.format_header(total_cards, unique_cards)
+
+    def format_deck(self, deck: List[Card]) -> str:
+        counted = [card for card in deck if card.section not in UNCOUNTED_SECTIONS]
+        header = self.format_header(sum(card.quantity for card in counted), len(counted))
+        if not deck:
+            return header
+        return header + "\n" + "".join(self.iter_blocks(deck))
+
+
+_renderers: Dict[int, DeckRenderer] = {}
+
+
+def get_renderer(width: int = WIDTH) -> DeckRenderer:
+    """Returns the shared renderer for a width, so its memo is reused across decks."""
+    renderer = _renderers.get(width)
+    if renderer is None:
+        renderer = _renderers[width] = DeckRenderer(width)
+    return renderer
+
+
+def format_deck_header(total_cards: int, unique_cards: int, width: int = WIDTH) -> str:
+    """The report header with deck totals, ready to be placed above the card blocks."""
+    return get_renderer(width).format_header(total_cards, unique_cards)
+
+
+def iter_deck_blocks(deck: Iterable[Card], width: int = WIDTH) -> Iterator[str]:
+    """
+    Renders cards one at a time, yielding each card's text block (preceded by
+    the separator from the previous card, or the heading of the section it
+    opens) as soon as the card is available.
+    """
+    return get_renderer(width).iter_blocks(deck)
+
+
+def stream_deck_as_text(deck: Iterable[Card], width: int = WIDTH) -> Iterator[Tuple[str, str]]:
+    """
+    Streaming variant of format_deck_as_text.
+
+    Yields ('card', block) for every card as soon as it arrives and, once the
+    totals are known, a final ('header', header). Placing the header and a
+    blank line above the concatenated blocks gives format_deck_as_text's output.
+    """
+    return get_renderer(width).stream(deck)
+
+
+@metrics.timed('format_deck_as_text')
+def format_deck_as_text(deck: List[Card], width: int = WIDTH) -> str:
+    return get_renderer(width).format_deck(deck)
@@ -0,0 +1,255 @@
+# images.py
+import argparse
+import hashlib
+import os
+import re
+import shutil
+import struct
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+import fetch_engine
+from card_cache import default_cache_dir
+from models import Card
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is only needed for thumbnails and sheets.
+    Image = None
+
+# ----- Tweakables -----
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+THUMB_SIZE = (146, 204)  # About 30% of Scryfall's 488x680 'normal' images.
+SHEET_COLUMNS = 10
+SHEET_BACKGROUND = (24, 24, 24)
+THUMB_QUALITY = 85
+
+
+def card_image_urls(card: Card) -> List[str]:
+    """The image URL of every face of a card that has one (split cards share one image)."""
+    urls = []
+    for face in card.card_faces:
+        if face.image_url and face.image_url not in urls:
+            urls.append(face.image_url)
+    return urls
+
+
+class ImageCache:
+    """
+    A size-bounded disk cache of card images and their thumbnails.
+
+    Files are named after a hash of their URL. Every hit refreshes the
+    file's modification time, and once the cache grows beyond max_bytes the
+    least recently used files are deleted.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = MAX_CACHE_BYTES):
+        self.path = path or os.path.join(default_cache_dir(), "images")
+        os.makedirs(self.path, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.downloads = 0
+        self._lock = threading.Lock()
+        # Half-written .tmp files of running downloads are not part of the cache yet.
+        self._total = sum(entry.stat().st_size for entry in os.scandir(self.path)
+                          if entry.is_file() and entry.name.endswith('.jpg'))
+
+    def _file(self, url: str, suffix: str = "") -> str:
+        return os.path.join(self.path, hashlib.sha1(url.encode('utf-8')).hexdigest() + suffix + ".jpg")
+
+    def _hit(self, path: str) -> bool:
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def _store(self, path: str, data: bytes):
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._total += len(data)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted((e for e in os.scandir(self.path) if e.is_file() and e.name.endswith('.jpg')),
+                         key=lambda e: e.stat().st_mtime)
+        self._total = sum(e.stat().st_size for e in entries)
+        for entry in entries:
+            if self._total <= self.max_bytes * 0.9:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._total -= size
+            except OSError:
+                pass
+
+    def image(self, url: str) -> Optional[str]:
+        """Returns the path of the cached image, downloading it first if needed."""
+        path = self._file(url)
+        if self._hit(path):
+            return path
+        # Two decks asking for the same image at once download it once.
+        return fetch_engine.flights.do(('image', url), lambda: self._download(url, path))
+
+    def _download(self, url: str, path: str) -> Optional[str]:
+        # requests is imported where it is needed, so runs with every image cached never load it.
+        import requests
+        if self._hit(path):
+            return path
+        try:
+            response = fetch_engine.request('GET', url, headers={'Accept': 'image/*'})
+            response.raise_for_status()
+        except requests.exceptions.RequestException as err:
+            print(f"Request Error fetching image {url}: {err}")
+            return None
+        self._store(path, response.content)
+        self.downloads += 1
+        return path
+
+    def thumbnail(self, url: str, size=THUMB_SIZE) -> Optional[str]:
+        """Returns the path of the image's thumbnail, made once from the cached image."""
+        _require_pillow()
+        path = self._file(url, f"-{size[0]}x{size[1]}")
+        if self._hit(path):
+            return path
+        source = self.image(url)
+        if source is None:
+            return None
+        try:
+            with Image.open(source) as img:
+                img = img.convert('RGB')
+                img.thumbnail(size)
+                tmp = f"{path}.{threading.get_ident()}.tmp"
+                img.save(tmp, 'JPEG', quality=THUMB_QUALITY)
+        except OSError as err:
+            print(f"Could not make a thumbnail of {url}: {err}")
+            return None
+        os.replace(tmp, path)
+        with self._lock:
+            self._total += os.path.getsize(path)
+        return path
+
+
+def _require_pillow():
+    if Image is None:
+        raise RuntimeError("Thumbnails and image sheets need Pillow: pip install Pillow")
+
+
+def prefetch_images(deck: Iterable[Card], cache: ImageCache, thumbnails: bool = True) -> Dict[str, Optional[str]]:
+    """
+    Downloads every face image of a deck concurrently (paced by the shared
+    rate limiter) and, if thumbnails is set, makes their thumbnails.
+    Returns {url: path of the thumbnail or image, or None if it failed}.
+    """
+    urls = list(dict.fromkeys(url for card in deck for url in card_image_urls(card)))
+    fetch = cache.thumbnail if thumbnails else cache.image
+    return dict(zip(urls, fetch_engine.get_executor().map(fetch, urls)))
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def write_contact_sheet(deck: List[Card], out_path: str, cache: ImageCache,
+                        columns: int = SHEET_COLUMNS, size=THUMB_SIZE) -> int:
+    """
+    Writes a PNG contact sheet with the front face of every card in the deck.
+
+    The PNG is encoded one row of cards at a time, with thumbnails read from
+    the cache as each row is drawn, so memory stays at one row of tiles no
+    matter how large the deck is. Returns the number of tiles drawn.
+    """
+    _require_pillow()
+    tiles = [card_image_urls(card)[:1] for card in deck]
+    tiles = [urls[0] for urls in tiles if urls]
+    columns = max(1, min(columns, len(tiles) or 1))
+    rows = (len(tiles) + columns - 1) // columns
+    width, height = columns * size[0], max(rows, 1) * size[1]
+
+    drawn = 0
+    compressor = zlib.compressobj(6)
+    with open(out_path, 'wb') as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        for row in range(max(rows, 1)):
+            band = Image.new('RGB', (width, size[1]), SHEET_BACKGROUND)
+            for column, url in enumerate(tiles[row * columns:(row + 1) * columns]):
+                path = cache.thumbnail(url, size)
+                if path is None:
+                    continue
+                with Image.open(path) as thumb:
+                    x = column * size[0] + (size[0] - thumb.width) // 2
+                    y = (size[1] - thumb.height) // 2
+                    band.paste(thumb, (x, y))
+                drawn += 1
+            raw = band.tobytes()
+            stride = width * 3
+            scanlines = b"".join(b"\x00" + raw[i:i + stride] for i in range(0, len(raw), stride))
+            data = compressor.compress(scanlines)
+            if data:
+                f.write(_png_chunk(b"IDAT", data))
+        f.write(_png_chunk(b"IDAT", compressor.flush()))
+        f.write(_png_chunk(b"IEND", b""))
+    return drawn
+
+
+def _safe_filename(name: str) -> str:
+    return re.sub(r'[^\w.-]+', '_', name).strip('._') or 'card'
+
+
+def export_thumbnails(deck: Iterable[Card], out_dir: str, cache: ImageCache, size=THUMB_SIZE) -> int:
+    """Copies a thumbnail of every face image into out_dir, named after the card. Returns the count."""
+    os.makedirs(out_dir, exist_ok=True)
+    written = 0
+    for card in deck:
+        urls = card_image_urls(card)
+        for i, url in enumerate(urls):
+            path = cache.thumbnail(url, size)
+            if path is None:
+                continue
+            suffix = f"_{i + 1}" if len(urls) > 1 else ""
+            shutil.copyfile(path, os.path.join(out_dir, _safe_filename(card.name) + suffix + ".jpg"))
+            written += 1
+    return written
+
+
+def main(argv: Optional[List[str]] = None):
+    from api_client import set_offline_store
+    from bulk_data import OfflineStore
+    from parser import parse_decklist
+    from pipeline import iter_deck_cards
+
+    arg_parser = argparse.ArgumentParser(description="Export card images of a decklist.")
+    arg_parser.add_argument("decklist", help="Decklist file.")
+    arg_parser.add_argument("--sheet", metavar="PNG", help="Write a contact sheet of the deck to this file.")
+    arg_parser.add_argument("--thumbs", metavar="DIR", help="Write one thumbnail per card face into this directory.")
+    arg_parser.add_argument("--columns", type=int, default=SHEET_COLUMNS)
+    arg_parser.add_argument("--cache-dir", default=None, help="Image cache directory (default: user cache dir).")
+    arg_parser.add_argument("--offline", metavar="DB",
+                            help="Answer card lookups from a store built by bulk_data.py (images are still downloaded).")
+    args = arg_parser.parse_args(argv)
+
+    if not (args.sheet or args.thumbs):
+        arg_parser.error("nothing to do: pass --sheet and/or --thumbs")
+    _require_pillow()
+    if args.offline:
+        set_offline_store(OfflineStore(args.offline))
+
+    with open(args.decklist, encoding='utf-8') as f:
+        deck = list(iter_deck_cards(parse_decklist(f)))
+    cache = ImageCache(args.cache_dir)
+    prefetch_images(deck, cache)
+    if args.sheet:
+        print(f"Wrote {write_contact_sheet(deck, args.sheet, cache, args.columns)} cards to {args.sheet}")
+    if args.thumbs:
+        print(f"Wrote {export_thumbnails(deck, args.thumbs, cache)} thumbnails to {args.thumbs}")
+    print(f"Downloaded {cache.downloads} images.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,15 @@
 # main.py
+import argparse
+import os
+import sys
+from typing import Iterable, Optional, Union
+
 from parser import parse_decklist
-from api_client import fetch_card_data
-from models import Card
-from formatter import format_deck_as_text
+from api_client import set_offline_store
+from bulk_data import OfflineStore
+from pipeline import iter_deck_cards
+from formatter import format_deck_as_text, stream_deck_as_text
+import metrics
 
 # Example decklist with various formats
 SAMPLE_DECKLIST = """
@@ -15,38 +22,121 @@ Lightning Bolt
 4 Counterspell
 """
 
-def process_decklist(decklist_text: str):
+def process_decklist(decklist: Union[str, Iterable[str]], stats: bool = False,
+                     save_snapshot: Optional[str] = None, source: str = ""):
     """
     The main workflow function.
-    Parses a decklist, fetches data for each card, and prints the formatted result.
+    Parses a decklist (a string, an open file or any iterable of lines),
+    fetches data for each card, and prints each card's formatted block as
+    soon as it is ready. The totals header follows once every card is in,
+    then, if stats is set, a deck statistics section. With save_snapshot,
+    the resolved deck is also written to that snapshot file, together with
+    the decklist text.
     """
+    if save_snapshot and not isinstance(decklist, str):
+        # The snapshot keeps the text, so read the lines once up front.
+        decklist = "".join(decklist)
+
     print("Parsing decklist...")
-    card_queries = parse_decklist(decklist_text)
-    
+    card_queries = parse_decklist(decklist)
+
     if not card_queries:
         print("Decklist is empty or could not be parsed.")
         return
 
     print(f"Found {len(card_queries)} unique cards. Fetching data from Scryfall...")
-    
-    detailed_deck = []
-    for query in card_queries:
-        card_name = query['name']
-        quantity = query['quantity']
-        
-        print(f"  Fetching: {card_name}")
-        scryfall_json = fetch_card_data(card_name)
-        
-        if scryfall_json:
-            card_object = Card.from_scryfall_json(scryfall_json, quantity)
-            detailed_deck.append(card_object)
+
+    # Progress goes to stderr so it does not interleave with the streamed report.
+    def report_batch(done, total, names):
+        print(f"  Fetched {done}/{total}: {', '.join(names)}", file=sys.stderr)
 
     print("\n--- Detailed Decklist ---\n")
-    formatted_output = format_deck_as_text(detailed_deck)
-    print(formatted_output)
+    resolved = []
+
+    def collect(cards):
+        # Keeps every card for the statistics and the snapshot while it streams through.
+        for card in cards:
+            resolved.append(card)
+            yield card
+
+    deck = iter_deck_cards(card_queries, on_batch=report_batch)
+    for kind, text in stream_deck_as_text(collect(deck)):
+        if kind == 'card':
+            print(text, end="", flush=True)
+        else:
+            print()
+            print(text)
+
+    if stats:
+        from analytics import format_summary
+        print(format_summary(resolved))
+
+    if save_snapshot:
+        from snapshot import SnapshotDeck, write_snapshot
+        name = os.path.splitext(os.path.basename(source))[0] or "deck"
+        write_snapshot(save_snapshot, [SnapshotDeck(name, resolved, card_queries, source, decklist)])
+        print(f"Saved the resolved deck to {save_snapshot}", file=sys.stderr)
+
+
+def print_snapshot(path: str, deck_name: Optional[str] = None, stats: bool = False) -> bool:
+    """
+    Prints the report of a deck saved with --save-snapshot (or batch_cli.py
+    --snapshot) without any lookups. Archives of several decks need a deck
+    name; without one their deck names are listed. Returns False on error.
+    """
+    from snapshot import Snapshot
+    try:
+        snapshot = Snapshot(path)
+    except (OSError, ValueError) as err:
+        print(f"Could not open the snapshot: {err}", file=sys.stderr)
+        return False
+    with snapshot:
+        if deck_name is None and len(snapshot) > 1:
+            print(f"{path} holds {len(snapshot)} decks; pick one with --deck:", file=sys.stderr)
+            for name in snapshot.deck_names():
+                print(f"  {name}", file=sys.stderr)
+            return False
+        try:
+            deck = snapshot.deck(deck_name if deck_name is not None else 0)
+        except KeyError:
+            print(f"No deck named {deck_name!r} in {path}.", file=sys.stderr)
+            return False
+    print(format_deck_as_text(deck.cards))
+    if stats:
+        from analytics import format_summary
+        print(format_summary(deck.cards))
+    return True
 
 
 if __name__ == "__main__":
-    # You can replace SAMPLE_DECKLIST with input() to make it interactive
-    # user_input = input("Paste your decklist here:\n")
-    process_decklist(SAMPLE_DECKLIST)
\ No newline at end of file
+    arg_parser = argparse.ArgumentParser(description="Format an MTG decklist with card data from Scryfall.")
+    arg_parser.add_argument("decklist", nargs="?", help="Decklist file to format (default: a built-in sample).")
+    arg_parser.add_argument("--offline", metavar="DB",
+                            help="Answer every lookup from a store built by bulk_data.py instead of the API.")
+    arg_parser.add_argument("--metrics", metavar="FILE",
+                            help="Write request counters and per-stage timings of the run to this JSON file.")
+    arg_parser.add_argument("--stats", action="store_true",
+                            help="Print mana curve, color, type, rarity and price statistics (needs NumPy).")
+    arg_parser.add_argument("--save-snapshot", metavar="FILE",
+                            help="Also save the resolved deck, so it can be re-rendered later without lookups.")
+    arg_parser.add_argument("--snapshot", metavar="FILE",
+                            help="Print a deck from a saved snapshot instead; nothing is fetched.")
+    arg_parser.add_argument("--deck", metavar="NAME", help="The deck to print from a snapshot of several decks.")
+    args = arg_parser.parse_args()
+
+    if args.metrics:
+        metrics.enable()
+    if args.offline:
+        set_offline_store(OfflineStore(args.offline))
+
+    if args.snapshot:
+        if not print_snapshot(args.snapshot, args.deck, stats=args.stats):
+            sys.exit(1)
+    elif args.decklist:
+        with open(args.decklist, encoding="utf-8") as f:
+            process_decklist(f, stats=args.stats, save_snapshot=args.save_snapshot, source=args.decklist)
+    else:
+        process_decklist(SAMPLE_DECKLIST, stats=args.stats, save_snapshot=args.save_snapshot, source="sample")
+
+    if args.metrics:
+        metrics.write_report(args.metrics)
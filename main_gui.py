@@ -3,66 +3,105 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
 import threading
 import queue
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Optional
 
-from parser import parse_decklist
-from api_client import fetch_card_data
-from models import Card
-from formatter import format_deck_as_text
+# The parser, the fetch pipeline (and with it the HTTP stack and the card
+# caches) and the formatter are imported by the worker thread once the
+# window is up, so none of them delays the first frame.
+if TYPE_CHECKING:
+    from pipeline import DeckSession
 
-def build_detailed_deck(decklist_text: str, progress_queue: queue.Queue):
+# ----- Tweakables -----
+POLL_MS = 100
+BUSY_POLL_MS = 10          # While rendered output is still waiting to be inserted.
+MAX_INSERT_CHARS = 32_000  # Output inserted into the text widget per tick.
+
+
+def build_detailed_deck(decklist_text: str, progress_queue: queue.Queue,
+                        cancel: Optional[threading.Event] = None,
+                        session: Optional['DeckSession'] = None):
     """
-    This function contains the core logic. It now correctly handles lists
-    with multiple meld parts by processing each one individually.
+    This function contains the core logic. Cards are rendered as soon as their
+    data arrives: every block is put on the queue as ('block', text), and the
+    totals header follows as ('header', text) once the whole deck is known.
+    Progress messages are ('progress', done, total, text, timings), where
+    timings holds the seconds since the start and since the previous batch.
+    Once cancel is set, fetching stops and ('cancelled', None) ends the run.
+    With a session, only cards the session's previous run did not already
+    resolve are fetched.
     """
+    from parser import parse_decklist
+    from pipeline import iter_deck_cards
+    from formatter import stream_deck_as_text
+
     card_queries = parse_decklist(decklist_text)
     if not card_queries:
         progress_queue.put(('done', "Decklist is empty or could not be parsed."))
         return
 
-    detailed_deck = []
-    processed_card_names = set()
-    total_cards = len(card_queries)
-    
-    for i, query in enumerate(card_queries):
-        card_name = query['name']
-        
-        # This check is now only for exact duplicates in the input list, which is fine.
-        if card_name.lower() in {name.lower() for name in processed_card_names}:
-            progress_queue.put(('progress', i + 1, total_cards, f"Skipping {card_name} (already handled)"))
-            continue
+    started = last_batch = time.perf_counter()
 
-        progress_queue.put(('progress', i + 1, total_cards, card_name))
-        
-        scryfall_json = fetch_card_data(card_name)
-        
-        if scryfall_json:
-            card_object = Card.from_scryfall_json(scryfall_json, query['quantity'])
-            
-            if card_object.all_parts:
-                is_part = any(part['component'] == 'meld_part' and part['name'] == card_object.name for part in card_object.all_parts)
-                if is_part:
-                    try:
-                        result_name = next(p['name'] for p in card_object.all_parts if p['component'] == 'meld_result')
-                        result_json = fetch_card_data(result_name)
-                        if result_json:
-                            result_card_object = Card.from_scryfall_json(result_json, 1)
-                            card_object.meld_result_card = result_card_object
-                    except StopIteration:
-                        pass
-
-            detailed_deck.append(card_object)
-            
-            # --- THE FIX ---
-            # We ONLY add the card we just processed. We no longer add its partners.
-            processed_card_names.add(card_object.name)
-            # The aggressive loop that added all parts has been removed.
-
-    if not detailed_deck:
+    def report_batch(done, total, names):
+        nonlocal last_batch
+        now = time.perf_counter()
+        timings = {'elapsed': now - started, 'batch_seconds': now - last_batch}
+        last_batch = now
+        progress_queue.put(('progress', done, total, f"batch of {len(names)} cards", timings))
+
+    if session is not None:
+        deck = session.iter_cards(card_queries, on_batch=report_batch, cancel=cancel)
+    else:
+        deck = iter_deck_cards(card_queries, on_batch=report_batch, cancel=cancel)
+    found_any = False
+    for kind, text in stream_deck_as_text(deck):
+        if cancel is not None and cancel.is_set():
+            # Closing the deck drops the lookups that have not been sent yet.
+            deck.close()
+            progress_queue.put(('cancelled', None))
+            return
+        if kind == 'card':
+            found_any = True
+            progress_queue.put(('block', text))
+        elif found_any:
+            progress_queue.put(('header', text))
+
+    if not found_any:
         progress_queue.put(('done', "No cards were found. Check the card names."))
         return
-    
-    final_output = format_deck_as_text(detailed_deck)
-    progress_queue.put(('done', final_output))
+
+    progress_queue.put(('done', None))
+
+
+def render_snapshot_deck(path: str, deck_name: str, progress_queue: queue.Queue,
+                         cancel: Optional[threading.Event] = None):
+    """
+    Renders a deck from a snapshot file, with the same messages as
+    build_detailed_deck but without any lookups.
+    """
+    from formatter import stream_deck_as_text
+    from snapshot import Snapshot
+
+    with Snapshot(path) as snapshot:
+        deck = snapshot.deck(deck_name)
+    for kind, text in stream_deck_as_text(deck.cards):
+        if cancel is not None and cancel.is_set():
+            progress_queue.put(('cancelled', None))
+            return
+        progress_queue.put(('block' if kind == 'card' else 'header', text))
+    progress_queue.put(('done', None if deck.cards else "The snapshot deck has no cards."))
+
+
+class _JobQueue:
+    """Tags everything a job puts on the shared queue with that job's id."""
+
+    def __init__(self, target: queue.Queue, job_id: int):
+        self.target = target
+        self.job_id = job_id
+
+    def put(self, message):
+        self.target.put((self.job_id, message))
 
 
 class MtgDeckFormatterApp:
@@ -71,8 +110,21 @@ class MtgDeckFormatterApp:
         self.root.title("MTG Deck Formatter")
         self.root.geometry("900x700")
 
+        # One long-lived worker runs the jobs; every message it sends is
+        # tagged with its job id so output of a superseded job is ignored.
         self.comm_queue = queue.Queue()
+        self.jobs = queue.Queue()
+        self.job_id = 0
+        self.cancel_event = threading.Event()
+        self.pending = deque()
+        self.session: Optional['DeckSession'] = None  # Created and only touched by the worker thread.
+        self.worker_thread = threading.Thread(target=self.worker_loop, daemon=True)
+
         self.create_widgets()
+        # Idle callbacks run after Tk has mapped and drawn the window, so the
+        # worker's imports happen behind the first frame rather than before it.
+        self.root.after_idle(self.worker_thread.start)
+        self.root.after(POLL_MS, self.check_queue)
 
     def create_widgets(self):
         style = ttk.Style(self.root)
@@ -93,6 +145,13 @@ class MtgDeckFormatterApp:
         self.process_button = ttk.Button(controls_frame, text="Process Decklist", command=self.start_processing_thread)
         self.process_button.pack(side=tk.LEFT, padx=5)
 
+        self.cancel_button = ttk.Button(controls_frame, text="Cancel", command=self.cancel_processing,
+                                        state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+
+        self.open_button = ttk.Button(controls_frame, text="Open Snapshot...", command=self.open_snapshot)
+        self.open_button.pack(side=tk.LEFT, padx=5)
+
         self.copy_button = ttk.Button(controls_frame, text="Copy Output", command=self.copy_to_clipboard)
         self.copy_button.pack(side=tk.LEFT, padx=5)
 
@@ -125,35 +184,151 @@ class MtgDeckFormatterApp:
             messagebox.showwarning("Input Required", "Please paste a decklist before processing.")
             return
 
-        self.process_button.config(state=tk.DISABLED)
+        self.submit(lambda post, cancel: build_detailed_deck(decklist, post, cancel, self.session))
+
+    def open_snapshot(self):
+        from tkinter import filedialog, simpledialog
+        from snapshot import Snapshot, decklist_text
+
+        path = filedialog.askopenfilename(
+            title="Open Deck Snapshot", filetypes=[("Deck snapshots", "*.mtgsnap"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            with Snapshot(path) as snapshot:
+                names = snapshot.deck_names()
+                name = names[0] if names else None
+                if len(names) > 1:
+                    name = simpledialog.askstring(
+                        "Choose Deck", f"This snapshot holds {len(names)} decks. Deck name:",
+                        initialvalue=names[0], parent=self.root)
+                    if name is None:
+                        return
+                deck = snapshot.deck(name) if name is not None else None
+        except (OSError, ValueError) as err:
+            messagebox.showerror("Open Snapshot", f"Could not open the snapshot: {err}")
+            return
+        except KeyError:
+            messagebox.showerror("Open Snapshot", f"There is no deck named {name!r} in the snapshot.")
+            return
+        if deck is None:
+            messagebox.showwarning("Open Snapshot", "The snapshot holds no decks.")
+            return
+
+        self.input_text.delete("1.0", tk.END)
+        self.input_text.insert("1.0", deck.text or decklist_text(deck.queries))
+        self.submit(lambda post, cancel: render_snapshot_deck(path, name, post, cancel))
+
+    def submit(self, job):
+        """Runs job(post, cancel) on the worker, superseding the current job, if any."""
+        self.cancel_event.set()
+        self.cancel_event = threading.Event()
+        self.job_id += 1
+        self.pending.clear()
+
+        self.set_running(True)
         self.clear_fields(output_only=True) # Clear previous results
         self.progress_bar['value'] = 0
+        self.jobs.put((self.job_id, job, self.cancel_event))
 
-        self.worker_thread = threading.Thread(
-            target=build_detailed_deck,
-            args=(decklist, self.comm_queue)
-        )
-        self.worker_thread.start()
-        self.root.after(100, self.check_queue)
+    def cancel_processing(self):
+        self.cancel_event.set()
+        self.status_label.config(text="Cancelling...")
 
-    def check_queue(self):
+    def set_running(self, running: bool):
+        # Process stays enabled: pressing it again replaces the running job.
+        self.cancel_button.config(state=tk.NORMAL if running else tk.DISABLED)
+
+    def warm_up(self):
+        """Loads what the first job needs: the pipeline, the formatter and the local name index."""
+        from pipeline import DeckSession
+        import formatter  # noqa: F401
+        from api_client import get_name_index
+
+        self.session = DeckSession()
+        get_name_index()
+
+    def worker_loop(self):
         try:
-            message = self.comm_queue.get(block=False)
-            msg_type = message[0]
-            
-            if msg_type == 'progress':
-                current, total, name = message[1], message[2], message[3]
-                self.progress_bar['value'] = (current / total) * 100
-                self.status_label.config(text=f"Fetching ({current}/{total}): {name}...")
-                self.root.after(100, self.check_queue) # Continue checking
-            elif msg_type == 'done':
-                result = message[1]
-                self.process_button.config(state=tk.NORMAL)
-                self.progress_bar['value'] = 100
-                self.status_label.config(text="Processing complete!")
+            self.warm_up()
+        except Exception as err:
+            print(f"Could not preload the card pipeline: {err}")
+        while True:
+            job_id, job, cancel = self.jobs.get()
+            post = _JobQueue(self.comm_queue, job_id)
+            if cancel.is_set():
+                post.put(('cancelled', None))
+                continue
+            try:
+                job(post, cancel)
+            except Exception as err:
+                post.put(('done', f"Error while processing the decklist: {err}"))
+
+    def check_queue(self):
+        # Drain everything that arrived since the last tick. Only the newest
+        # progress update is shown, and messages from superseded jobs are dropped.
+        progress = None
+        while True:
+            try:
+                job_id, message = self.comm_queue.get(block=False)
+            except queue.Empty:
+                break
+            if job_id != self.job_id:
+                continue
+            if message[0] == 'progress':
+                progress = message
+            else:
+                self.pending.append(message)
+
+        if progress:
+            current, total, name, timings = progress[1], progress[2], progress[3], progress[4]
+            self.progress_bar['value'] = (current / total) * 100
+            self.status_label.config(
+                text=f"Fetching ({current}/{total}): {name}... {timings['elapsed']:.1f}s")
+
+        # Blocks go into the text widget a slice at a time, so a huge report
+        # does not freeze Tk in one giant insert.
+        budget = MAX_INSERT_CHARS
+        blocks = []
+        while self.pending and budget > 0:
+            message = self.pending.popleft()
+            if message[0] == 'block':
+                blocks.append(message[1])
+                budget -= len(message[1])
+                continue
+            if blocks:
+                self.append_output("".join(blocks))
+                blocks = []
+            self.handle_message(message)
+        if blocks:
+            self.append_output("".join(blocks))
+
+        self.root.after(BUSY_POLL_MS if self.pending else POLL_MS, self.check_queue)
+
+    def handle_message(self, message):
+        msg_type = message[0]
+        if msg_type == 'header':
+            self.prepend_output(message[1] + "\n")
+        elif msg_type == 'cancelled':
+            self.set_running(False)
+            self.status_label.config(text="Cancelled.")
+        elif msg_type == 'done':
+            result = message[1]
+            self.set_running(False)
+            self.progress_bar['value'] = 100
+            self.status_label.config(text="Processing complete!")
+            if result is not None:
                 self.update_output(result)
-        except queue.Empty:
-            self.root.after(100, self.check_queue) # Continue checking
+
+    def append_output(self, text):
+        self.output_text.config(state=tk.NORMAL)
+        self.output_text.insert(tk.END, text)
+        self.output_text.config(state=tk.DISABLED)
+
+    def prepend_output(self, text):
+        self.output_text.config(state=tk.NORMAL)
+        self.output_text.insert("1.0", text)
+        self.output_text.config(state=tk.DISABLED)
 
     def update_output(self, text):
         self.output_text.config(state=tk.NORMAL)
@@ -0,0 +1,191 @@
+# metrics.py
+import functools
+import json
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+# ----- Tweakables -----
+PROMETHEUS_PREFIX = "mtgdeck"
+
+# Instrumentation is off unless a caller turns it on; while it is off every
+# hook below returns after a single flag check.
+_enabled = False
+_lock = threading.Lock()
+_started = time.time()
+_counters: Dict[str, int] = {}
+_timers: Dict[str, list] = {}  # name -> [count, total seconds, max seconds]
+
+
+def enable(on: bool = True):
+    """Turns instrumentation on (or off again). Wall time is counted from here."""
+    global _enabled, _started
+    if on and not _enabled:
+        _started = time.time()
+    _enabled = on
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    """Clears every counter and timer, e.g. between runs of a long-lived process."""
+    global _started
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+        _started = time.time()
+
+
+def incr(name: str, amount: int = 1):
+    """Adds to a counter (requests, retries, cache hits, ...)."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def add_time(name: str, seconds: float):
+    """Records one timed call of a stage."""
+    if not _enabled:
+        return
+    with _lock:
+        timer = _timers.get(name)
+        if timer is None:
+            _timers[name] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            if seconds > timer[2]:
+                timer[2] = seconds
+
+
+class _Timer:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        add_time(self.name, time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name: str):
+    """A context manager that times its block as one call of a stage."""
+    return _Timer(name) if _enabled else _NULL_TIMER
+
+
+def timed(name: str) -> Callable:
+    """Decorator: times every call of the function as the given stage."""
+    def decorate(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                add_time(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def report() -> Dict:
+    """
+    The per-run report: every counter, and for every stage its call count,
+    total and longest time in seconds. Stages that run on worker threads are
+    summed across threads, so they can add up to more than the wall time.
+    """
+    with _lock:
+        return {
+            'wall_seconds': round(time.time() - _started, 6),
+            'counters': dict(sorted(_counters.items())),
+            'stages': {name: {'calls': t[0], 'seconds': round(t[1], 6), 'max_seconds': round(t[2], 6)}
+                       for name, t in sorted(_timers.items())},
+        }
+
+
+def write_report(path: str):
+    """Writes report() to a JSON file."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report(), f, indent=2)
+        f.write("\n")
+
+
+def _metric_name(name: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+def prometheus_text() -> str:
+    """The current metrics in the Prometheus text exposition format."""
+    data = report()
+    lines = []
+    for name, value in data['counters'].items():
+        metric = f"{PROMETHEUS_PREFIX}_{_metric_name(name)}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+
+    stage_metric = f"{PROMETHEUS_PREFIX}_stage_seconds"
+    if data['stages']:
+        lines.append(f"# TYPE {stage_metric} summary")
+    for name, stage in data['stages'].items():
+        lines.append(f'{stage_metric}_sum{{stage="{name}"}} {stage["seconds"]}')
+        lines.append(f'{stage_metric}_count{{stage="{name}"}} {stage["calls"]}')
+    return "\n".join(lines) + "\n"
+
+
+def serve_prometheus(port: int, host: str = "127.0.0.1") -> Optional['ThreadingHTTPServer']:
+    """
+    Enables instrumentation and serves /metrics for Prometheus on a background
+    thread, for long-running processes. Returns the server (call shutdown()
+    to stop it), or None if the port could not be opened.
+    """
+    # Imported here: every module imports metrics, and http.server is slow to load.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class PrometheusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            payload = prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    enable()
+    try:
+        server = ThreadingHTTPServer((host, port), PrometheusHandler)
+    except OSError as err:
+        print(f"Could not serve metrics on {host}:{port}: {err}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    return server
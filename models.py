@@ -1,9 +1,26 @@
 # models.py
-from dataclasses import dataclass, field
-from typing import List, Dict, Optional
+import sys
+import weakref
+from dataclasses import dataclass
+from typing import Dict, NamedTuple, Optional, Tuple
 
+import metrics
 
-@dataclass
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Interns short strings that repeat across thousands of cards (type lines, rarities, ...)."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class RelatedPart(NamedTuple):
+    """A compact form of one entry of Scryfall's 'all_parts' list."""
+    id: str
+    component: str
+    name: str
+    type_line: str
+
+
+@dataclass(slots=True)
 class CardFace:
     """Represents a single face of a Magic card."""
     name: str
@@ -16,61 +33,187 @@ class CardFace:
     image_url: str
 
 
-@dataclass
+class CardData:
+    """
+    The immutable data of one Scryfall card object.
+
+    Instances are flyweights: CardData.intern() returns the same object for
+    every request of the same Scryfall id, so a card that appears in 10,000
+    decks is held in memory once. Treat instances as read-only.
+    """
+    __slots__ = ('id', 'name', 'colors', 'price_eur', 'rarity', 'card_faces', 'all_parts', 'mana_value',
+                 'price_usd', '__weakref__')
+
+    _registry: 'weakref.WeakValueDictionary[str, CardData]' = weakref.WeakValueDictionary()
+
+    def __init__(self, id: str, name: str, colors: Tuple[str, ...], price_eur: Optional[str],
+                 rarity: Optional[str], card_faces: Tuple[CardFace, ...],
+                 all_parts: Optional[Tuple[RelatedPart, ...]], mana_value: float = 0.0,
+                 price_usd: Optional[str] = None):
+        self.id = id
+        self.name = name
+        self.colors = colors
+        self.price_eur = price_eur
+        self.rarity = rarity
+        self.card_faces = card_faces
+        self.all_parts = all_parts
+        self.mana_value = mana_value
+        self.price_usd = price_usd
+
+    def __repr__(self) -> str:
+        return f"CardData(id={self.id!r}, name={self.name!r})"
+
+    def _fields(self) -> tuple:
+        """The constructor arguments, in order."""
+        return (self.id, self.name, self.colors, self.price_eur, self.rarity,
+                self.card_faces, self.all_parts, self.mana_value, self.price_usd)
+
+    def __reduce__(self):
+        # Unpickled copies (e.g. in worker processes) are re-interned on arrival.
+        return CardData._from_fields, self._fields()
+
+    @classmethod
+    def _from_fields(cls, *fields) -> 'CardData':
+        """
+        The interned CardData with exactly these fields. A different version
+        of an interned card (e.g. one read back from a snapshot with its
+        archived prices) is returned as a separate object and leaves the
+        interned one in place.
+        """
+        data = cls._registry.get(fields[0])
+        if data is not None and data._fields() == fields:
+            return data
+        version = cls(*fields)
+        if data is None:
+            cls._registry[version.id] = version
+        return version
+
+    @classmethod
+    def intern(cls, scryfall_data: Dict) -> 'CardData':
+        """
+        Returns the shared CardData for a Scryfall card object, building it
+        only the first time that card (at its current prices) is seen.
+        """
+        key = scryfall_data.get('id') or scryfall_data.get('oracle_id') or scryfall_data.get('name', 'N/A')
+        prices = scryfall_data.get('prices') or {}
+        price_eur, price_usd = prices.get('eur'), prices.get('usd')
+        data = cls._registry.get(key)
+        if data is not None and data.price_eur == price_eur and data.price_usd == price_usd:
+            return data
+
+        data = cls(
+            id=key,
+            name=_intern(scryfall_data.get('name', 'N/A')),
+            colors=tuple(_intern(c) for c in scryfall_data.get('colors', [])),
+            price_eur=price_eur,
+            rarity=_intern(scryfall_data.get('rarity', None)),
+            card_faces=_faces_from_json(scryfall_data),
+            all_parts=_parts_from_json(scryfall_data.get('all_parts', None)),
+            mana_value=float(scryfall_data.get('cmc') or 0.0),
+            price_usd=price_usd,
+        )
+        cls._registry[key] = data
+        return data
+
+
+def _faces_from_json(scryfall_data: Dict) -> Tuple[CardFace, ...]:
+    faces = []
+
+    if 'card_faces' in scryfall_data and len(scryfall_data['card_faces']) > 1:
+        for face_data in scryfall_data['card_faces']:
+            face = CardFace(
+                name=_intern(face_data.get('name', 'N/A')),
+                mana_cost=_intern(face_data.get('mana_cost', '')),
+                type_line=_intern(face_data.get('type_line', 'N/A')),
+                oracle_text=face_data.get('oracle_text', 'N/A'),
+                power=_intern(face_data.get('power', None)),
+                toughness=_intern(face_data.get('toughness', None)),
+                loyalty=_intern(face_data.get('loyalty', None)),
+                image_url=face_data.get('image_uris', {}).get('normal', '')
+            )
+            faces.append(face)
+    else:
+        card_info = scryfall_data['card_faces'][0] if 'card_faces' in scryfall_data else scryfall_data
+
+        single_face = CardFace(
+            name=_intern(scryfall_data.get('name', 'N/A')),
+            mana_cost=_intern(card_info.get('mana_cost', '')),
+            type_line=_intern(scryfall_data.get('type_line', 'N/A')),
+            oracle_text=card_info.get('oracle_text', 'N/A'),
+            power=_intern(scryfall_data.get('power', None)),
+            toughness=_intern(scryfall_data.get('toughness', None)),
+            loyalty=_intern(scryfall_data.get('loyalty', None)),
+            image_url=card_info.get('image_uris', {}).get('normal', '')
+        )
+        faces.append(single_face)
+
+    return tuple(faces)
+
+
+def _parts_from_json(all_parts) -> Optional[Tuple[RelatedPart, ...]]:
+    if all_parts is None:
+        return None
+    return tuple(
+        RelatedPart(
+            id=part.get('id', ''),
+            component=_intern(part.get('component', '')),
+            name=_intern(part.get('name', '')),
+            type_line=_intern(part.get('type_line', '')),
+        )
+        for part in all_parts
+    )
+
+
+@dataclass(slots=True)
 class Card:
-    """A structured representation of a Magic card, supporting multiple faces."""
-    name: str
-    colors: List[str]
+    """
+    One entry of a deck: a quantity and the section it is listed in, plus a
+    reference to the shared CardData. Card attributes (name, card_faces, ...)
+    are read through to that data.
+    """
+    data: CardData
     quantity: int
-    price_usd: Optional[str] = None
-    rarity: Optional[str] = None  # --- NEW: Field to store the card's rarity ---
-    card_faces: List[CardFace] = field(default_factory=list)
-    all_parts: Optional[List[Dict]] = None
     meld_result_card: Optional['Card'] = None
+    section: str = 'main'
+
+    @property
+    def name(self) -> str:
+        return self.data.name
+
+    @property
+    def colors(self) -> Tuple[str, ...]:
+        return self.data.colors
+
+    @property
+    def price_eur(self) -> Optional[str]:
+        return self.data.price_eur
+
+    @property
+    def price_usd(self) -> Optional[str]:
+        return self.data.price_usd
+
+    @property
+    def rarity(self) -> Optional[str]:
+        return self.data.rarity
+
+    @property
+    def mana_value(self) -> float:
+        return self.data.mana_value
+
+    @property
+    def card_faces(self) -> Tuple[CardFace, ...]:
+        return self.data.card_faces
+
+    @property
+    def all_parts(self) -> Optional[Tuple[RelatedPart, ...]]:
+        return self.data.all_parts
 
     @classmethod
-    def from_scryfall_json(cls, scryfall_data: Dict, quantity: int) -> 'Card':
+    @metrics.timed('from_scryfall_json')
+    def from_scryfall_json(cls, scryfall_data: Dict, quantity: int, section: str = 'main') -> 'Card':
         """
         Factory method to create a Card object from Scryfall API JSON.
-        Handles both single-faced and multi-faced cards.
+        Handles both single-faced and multi-faced cards; the card data itself
+        is interned and shared with every other entry of the same card.
         """
-        faces = []
-
-        if 'card_faces' in scryfall_data and len(scryfall_data['card_faces']) > 1:
-            for face_data in scryfall_data['card_faces']:
-                face = CardFace(
-                    name=face_data.get('name', 'N/A'),
-                    mana_cost=face_data.get('mana_cost', ''),
-                    type_line=face_data.get('type_line', 'N/A'),
-                    oracle_text=face_data.get('oracle_text', 'N/A'),
-                    power=face_data.get('power', None),
-                    toughness=face_data.get('toughness', None),
-                    loyalty=face_data.get('loyalty', None),
-                    image_url=face_data.get('image_uris', {}).get('normal', '')
-                )
-                faces.append(face)
-        else:
-            card_info = scryfall_data['card_faces'][0] if 'card_faces' in scryfall_data else scryfall_data
-
-            single_face = CardFace(
-                name=scryfall_data.get('name', 'N/A'),
-                mana_cost=card_info.get('mana_cost', ''),
-                type_line=scryfall_data.get('type_line', 'N/A'),
-                oracle_text=card_info.get('oracle_text', 'N/A'),
-                power=scryfall_data.get('power', None),
-                toughness=scryfall_data.get('toughness', None),
-                loyalty=scryfall_data.get('loyalty', None),
-                image_url=card_info.get('image_uris', {}).get('normal', '')
-            )
-            faces.append(single_face)
-
-        return cls(
-            name=scryfall_data.get('name', 'N/A'),
-            colors=scryfall_data.get('colors', []),
-            quantity=quantity,
-            price_usd=scryfall_data.get('prices', {}).get('eur', None),
-            # --- NEW: Extract the rarity from the top-level object ---
-            rarity=scryfall_data.get('rarity', None),
-            card_faces=faces,
-            all_parts=scryfall_data.get('all_parts', None)
-        )
\ No newline at end of file
+        return cls(data=CardData.intern(scryfall_data), quantity=quantity, section=section)
@@ -0,0 +1,219 @@
+# name_index.py
+import marshal
+import os
+import sys
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# ----- Tweakables -----
+MIN_CONFIDENCE = 0.6   # Typo matches scoring below this are left to Scryfall.
+MAX_CANDIDATES = 5
+RERANK_POOL = 50       # Trigram hits that are re-scored by edit distance.
+BUNDLED_INDEX = "name_index.bin"  # Shipped next to the app (or inside the frozen executable).
+
+# Bumped whenever the saved layout changes; older files are rebuilt.
+INDEX_FORMAT = 1
+
+
+class NameMatch(NamedTuple):
+    """A catalogue entry that a query resolved to, with a 0..1 confidence."""
+    name: str
+    card_id: str
+    score: float
+
+
+def normalize(name: str) -> str:
+    """
+    Folds a card name for comparison: diacritics stripped, lowercased and all
+    punctuation dropped, so 'Lim-Dûl's Vault', "lim-dul's vault" and
+    'Lim Duls Vault' collide, as do 'Fire // Ice' and 'fire/ice'.
+    """
+    decomposed = unicodedata.normalize('NFKD', name)
+    folded = "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+    # Apostrophes join words ("duls"); every other non-alphanumeric separates them.
+    folded = folded.replace("'", "").replace("’", "")
+    return " ".join("".join(ch if ch.isalnum() else " " for ch in folded).split())
+
+
+def _trigrams(key: str) -> List[str]:
+    padded = f"  {key} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def _edit_distance(a: str, b: str) -> int:
+    """Damerau-Levenshtein distance (optimal string alignment): a swap of two neighbours costs 1."""
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+    return current[-1]
+
+
+def _edit_similarity(a: str, b: str) -> float:
+    return 1.0 - _edit_distance(a, b) / max(len(a), len(b), 1)
+
+
+class NameIndex:
+    """
+    An in-process card name resolver.
+
+    Exact lookups (after normalize()) hit a dict; anything else falls back to
+    a trigram index. The entries sharing the most trigrams with the query are
+    scored by the better of their Dice similarity and their edit similarity
+    (one minus the Damerau-Levenshtein distance over the longer name), so a
+    transposition in a short name like 'Sol Rnig' still scores high.
+
+    Every card is indexed under its full name and, for split/double-faced
+    cards, under each face name, so 'Fire' finds 'Fire // Ice'.
+    """
+
+    def __init__(self, catalogue: Iterable[Tuple[str, str, Iterable[str]]] = ()):
+        self._exact: Dict[str, int] = {}
+        self._entries: List[Tuple[str, str, int]] = []  # (display name, card id, distinct trigrams)
+        self._postings: Dict[str, array] = {}  # trigram -> entry numbers
+        self._face_names: List[Tuple[str, int]] = []
+
+        for name, card_id, face_names in catalogue:
+            self.add(name, card_id, face_names)
+        self._add_face_names()
+
+    @classmethod
+    def from_store(cls, store) -> 'NameIndex':
+        """Builds an index over every card in a bulk_data.OfflineStore."""
+        return cls(store.catalogue())
+
+    def save(self, path: str, stamp: str = ""):
+        """
+        Writes the built index to a file that load() reads back directly,
+        without normalizing a single name or computing a trigram. stamp
+        identifies the data it was built from, e.g. the store's version.
+        """
+        self._add_face_names()
+        # Posting lists go out as raw bytes: hundreds of thousands of small
+        # ints would dominate the load time if each were its own object.
+        postings = {gram: entries.tobytes() for gram, entries in self._postings.items()}
+        payload = marshal.dumps((INDEX_FORMAT, stamp, self._exact, self._entries, postings))
+        tmp = f"{path}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, stamp: Optional[str] = None) -> Optional['NameIndex']:
+        """
+        Reads an index written by save(). Returns None if the file is missing
+        or unreadable, was written by another version of this module, or (if
+        stamp is given) was built from different data.
+        """
+        try:
+            with open(path, 'rb') as f:
+                data = marshal.loads(f.read())  # marshal.load(f) reads in small pieces and is far slower.
+            file_format, file_stamp, exact, entries, postings = data
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if file_format != INDEX_FORMAT or (stamp is not None and file_stamp != stamp):
+            return None
+        index = cls()
+        index._exact, index._entries = exact, entries
+        for gram, packed in postings.items():
+            index._postings[gram] = entries = array('I')
+            entries.frombytes(packed)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, name: str, card_id: str, face_names: Iterable[str] = ()):
+        key = normalize(name)
+        if not key or key in self._exact:
+            return
+        index = len(self._entries)
+        grams = set(_trigrams(key))
+        self._entries.append((name, card_id, len(grams)))
+        self._exact[key] = index
+        for gram in grams:
+            self._postings.setdefault(gram, array('I')).append(index)
+        # Face names only count as exact keys if no real card already owns them.
+        self._face_names.extend((face, index) for face in face_names)
+
+    def _add_face_names(self):
+        for face, index in self._face_names:
+            self._exact.setdefault(normalize(face), index)
+        self._face_names.clear()
+
+    def lookup(self, name: str) -> Optional[NameMatch]:
+        """Exact (normalized) lookup only."""
+        if self._face_names:
+            self._add_face_names()
+        index = self._exact.get(normalize(name))
+        if index is None:
+            return None
+        display, card_id, _ = self._entries[index]
+        return NameMatch(display, card_id, 1.0)
+
+    def candidates(self, name: str, limit: int = MAX_CANDIDATES) -> List[NameMatch]:
+        """Returns up to `limit` catalogue entries ranked by similarity to `name`."""
+        exact = self.lookup(name)
+        if exact:
+            return [exact]
+
+        key = normalize(name)
+        grams = set(_trigrams(key))
+        if not grams:
+            return []
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+
+        matches = []
+        for index, count in shared.most_common(max(limit * 4, RERANK_POOL)):
+            display, card_id, size = self._entries[index]
+            score = 2.0 * count / (len(grams) + size)
+            other = normalize(display)
+            # The length difference alone bounds the edit similarity; skip names it cannot lift.
+            if 1.0 - abs(len(key) - len(other)) / max(len(key), len(other)) > score:
+                score = max(score, _edit_similarity(key, other))
+            matches.append(NameMatch(display, card_id, score))
+        matches.sort(key=lambda m: m.score, reverse=True)
+        return matches[:limit]
+
+    def resolve(self, name: str, min_confidence: float = MIN_CONFIDENCE) -> Optional[NameMatch]:
+        """Returns the best match for `name` if it is confident enough, else None."""
+        matches = self.candidates(name, limit=1)
+        if matches and matches[0].score >= min_confidence:
+            return matches[0]
+        return None
+
+
+def bundled_index_path() -> str:
+    """Where a prebuilt index shipped with the app lives (see bulk_data.py --export-index)."""
+    base = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, BUNDLED_INDEX)
+
+
+def resolve_queries(card_queries: List[Dict], index: NameIndex) -> List[Dict]:
+    """
+    Runs parsed decklist queries through the index before anything is fetched.
+    Queries that already name an exact printing are passed through untouched.
+
+    Each confidently matched query gains an 'id' (and its canonical 'name');
+    the original spelling is kept under 'query_name'. Unmatched queries are
+    returned unchanged so the API's fuzzy search can still try them.
+    """
+    resolved = []
+    for query in card_queries:
+        if query.get('set') and query.get('collector_number'):
+            # Exact printings need no name matching at all.
+            resolved.append(query)
+            continue
+        match = index.resolve(query['name'])
+        if match:
+            query = dict(query, id=match.card_id, name=match.name, query_name=query['name'])
+        resolved.append(query)
+    return resolved
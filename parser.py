@@ -1,43 +1,212 @@
 # parser.py
 import re
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-def parse_decklist(decklist_text: str) -> List[Dict[str, str]]:
+import metrics
+
+# Section headers as they appear in MTGA/MTGO/Moxfield/Archidekt exports.
+SECTION_HEADERS = {
+    'deck': 'main',
+    'main': 'main',
+    'mainboard': 'main',
+    'main deck': 'main',
+    'sideboard': 'sideboard',
+    'side': 'sideboard',
+    'commander': 'commander',
+    'commanders': 'commander',
+    'companion': 'companion',
+    'maybeboard': 'maybeboard',
+    'considering': 'maybeboard',
+    'about': 'about',  # MTGA metadata ("Name My Deck"), not cards.
+}
+# Sections listed with a deck that are not part of it: left out of card counts and prices.
+UNCOUNTED_SECTIONS = frozenset({'maybeboard'})
+FOIL_MARKERS = {'*f*', '*e*', '*foil*', '*etched*'}
+# MTGO (and older MTGA) exports only set the sideboard off with a blank line.
+SIDEBOARD_SIZE = 15
+
+# A plain prefix match: '4 ', '4x ', '4xName' or '4 x '. An 'x' after a space
+# must be followed by whitespace, so a name that starts with an x
+# ('4 Xenagos') keeps it.
+QUANTITY_PATTERN = re.compile(r"(\d+)(?:x\s*|\s*[xX]\s+|\s+)")
+
+
+def _section_header(line: str) -> Optional[str]:
+    """Returns the section a header line opens ('Sideboard', 'Commander:', 'Sideboard (15)'), else None."""
+    label = line.rstrip(':').strip()
+    if label.endswith(')'):
+        label = label[:label.rfind('(')].strip()
+    return SECTION_HEADERS.get(label.rstrip(':').strip().lower())
+
+
+def _split_quantity(line: str) -> Tuple[int, str]:
+    """Splits a leading '4', '4x' (with or without a space after it) or '4 x' off a line."""
+    match = QUANTITY_PATTERN.match(line)
+    if match is None:
+        return 1, line
+    return int(match.group(1)), line[match.end():]
+
+
+def _split_printing(text: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    Splits a trailing printing tag off a card name: 'Sol Ring (CMM) 400',
+    'Sol Ring (CMM)' or 'Sol Ring [CMM] 400'. Only the last bracket pair is
+    considered and the set code must look like one (2-6 letters/digits), so
+    names like 'B.F.M. (Big Furry Monster)' are left alone. Linear in the
+    length of the line.
+    """
+    if '(' not in text and '[' not in text:
+        return text, None, None
+    for open_char, close_char in (('(', ')'), ('[', ']')):
+        start = text.rfind(' ' + open_char)
+        if start == -1:
+            continue
+        end = text.find(close_char, start)
+        if end == -1:
+            continue
+        set_code = text[start + 2:end].strip()
+        number = text[end + 1:].strip()
+        if not (2 <= len(set_code) <= 6 and set_code.isalnum()):
+            continue
+        if number and (' ' in number or len(number) > 10):
+            continue
+        return text[:start].strip(), set_code.lower(), number or None
+    return text, None, None
+
+
+def parse_line(line: str, section: str = 'main') -> Optional[Dict]:
+    """
+    Parses one card line, e.g. '1x Sol Ring (EOE) 245 *F*' or 'SB: 2 Pyroblast'.
+    Returns None for lines that are not cards.
+    """
+    line = line.strip()
+    if not line:
+        return None
+
+    if line[0] in 'sS' and line[:3].lower() == 'sb:':
+        section = 'sideboard'
+        line = line[3:].strip()
+
+    quantity, rest = _split_quantity(line)
+
+    foil = False
+    while '*' in rest:
+        head, _, last = rest.rpartition(' ')
+        if head and last.lower() in FOIL_MARKERS:
+            foil = True
+            rest = head.rstrip()
+        else:
+            break
+
+    name, set_code, collector_number = _split_printing(rest)
+    if not name:
+        return None
+
+    return {
+        'quantity': quantity,
+        'name': name,
+        'section': section,
+        'set': set_code,
+        'collector_number': collector_number,
+        'foil': foil,
+    }
+
+
+def iter_decklist(source: Union[str, Iterable[str]]) -> Iterator[Dict]:
+    """
+    Streaming variant of parse_decklist.
+
+    Accepts a decklist string, an open file or any iterable of lines, and
+    yields each card query as soon as its line has been read. Duplicates are
+    not merged here; see parse_decklist.
+
+    A list without any section headers whose cards form exactly two
+    blank-line separated groups, the second of at most SIDEBOARD_SIZE cards,
+    is an MTGO export: the second group is its sideboard. Those cards are
+    held back until the end of the list shows whether that is the case.
     """
-    Parses a raw decklist string into a list of card queries.
+    lines = source.splitlines() if isinstance(source, str) else source
+    section = 'main'
+    headed = False
+    groups = 0
+    blank = True
+    held: List[Dict] = []
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            blank = True
+            continue
+
+        header = None
+        if line.startswith('//'):
+            # Archidekt-style "// Sideboard" opens a section; anything else is a comment.
+            header = _section_header(line[2:].strip())
+            if not header:
+                continue
+        elif not line[0].isdigit():
+            # Card lines almost always start with a quantity; headers never do.
+            header = _section_header(line)
+        if header:
+            section = header
+            headed = True
+            yield from held
+            held.clear()
+            continue
+        if section == 'about':
+            continue
+
+        card = parse_line(line, section)
+        if not card:
+            continue
+        if blank:
+            groups += 1
+            blank = False
+        if not headed and groups == 2:
+            held.append(card)
+            continue
+        yield from held
+        held.clear()
+        yield card
+
+    if groups == 2 and sum(card['quantity'] for card in held) <= SIDEBOARD_SIZE:
+        for card in held:
+            card['section'] = 'sideboard'
+    yield from held
+
+
+@metrics.timed('parse_decklist')
+def parse_decklist(decklist_text: Union[str, Iterable[str]]) -> List[Dict]:
+    """
+    Parses a raw decklist into a list of card queries.
 
     Handles formats like:
     - 1x Sol Ring
+    - 4 x Llanowar Elves
+    - 4xLightning Bolt
     - 4 Command Tower
     - Sol Ring
     - Sol Ring (SET) 123
+    - 1 Sol Ring (CMM) 400 *F*           (Moxfield)
+    - Deck / Sideboard / Commander / Companion headers (MTGA, MTGO)
+    - A sideboard after a blank line, without a header (MTGO)
+    - SB: 2 Pyroblast
 
-    Returns a list of dictionaries, e.g., [{'quantity': '1', 'name': 'Sol Ring'}]
-    """
-    # This regex captures:
-    # - Group 1 (Optional): A number, possibly followed by 'x' and whitespace.
-    # - Group 2: The card name, which can contain any characters. We capture it lazily (.*?)
-    # - A non-capturing group for the optional set/collector info, which we discard.
-    card_pattern = re.compile(r"^\s*(\d+x?\s*)?(.*?)(?:\s\(.*\)\s*\d*)?$")
-    
-    parsed_cards = []
-    lines = decklist_text.strip().split('\n')
+    Lines naming the same printing (name, set, collector number and foil)
+    in the same section are merged into one entry with the summed quantity;
+    different printings of a card stay separate entries.
 
-    for line in lines:
-        line = line.strip()
-        if not line or line.startswith('//'): # Skip empty lines and comments
-            continue
-
-        match = card_pattern.match(line)
-        if match:
-            quantity_str = match.group(1)
-            card_name = match.group(2).strip()
-
-            if quantity_str:
-                quantity = int(quantity_str.lower().replace('x', '').strip())
-            else:
-                quantity = 1
-            
-            parsed_cards.append({'quantity': quantity, 'name': card_name})
-            
-    return parsed_cards
\ No newline at end of file
+    Returns a list of dictionaries, e.g.
+    [{'quantity': 1, 'name': 'Sol Ring', 'section': 'main', 'set': 'eoe',
+      'collector_number': '245', 'foil': False}]
+    """
+    merged: Dict[tuple, Dict] = {}
+    for card in iter_decklist(decklist_text):
+        key = (card['section'], card['name'].lower(), card['set'],
+               (card['collector_number'] or '').lower(), card['foil'])
+        existing = merged.get(key)
+        if existing is None:
+            merged[key] = card
+        else:
+            existing['quantity'] += card['quantity']
+    return list(merged.values())
@@ -0,0 +1,214 @@
+# pipeline.py
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import metrics
+from api_client import fetch_cards_batch, get_card_cache, iter_cards_batch, query_key
+from card_cache import PRICES_TTL
+from models import Card
+
+
+def meld_result_name(scryfall_json: Dict) -> Optional[str]:
+    """Returns the name of the card this one melds into, if it is a meld part."""
+    all_parts = scryfall_json.get('all_parts') or []
+    name = scryfall_json.get('name')
+    if not any(part['component'] == 'meld_part' and part['name'] == name for part in all_parts):
+        return None
+    return next((p['name'] for p in all_parts if p['component'] == 'meld_result'), None)
+
+
+def build_card(scryfall_json: Dict, quantity: int,
+               lookup_related: Callable[[str], Optional[Dict]], section: str = 'main') -> Card:
+    """
+    Builds a Card listed in a section, attaching its meld_result_card if it
+    is a meld part.
+
+    lookup_related(name) returns the JSON for a related card, e.g. from the
+    API or from a table that was resolved up front.
+    """
+    card_object = Card.from_scryfall_json(scryfall_json, quantity, section)
+
+    result_name = meld_result_name(scryfall_json)
+    if result_name:
+        result_json = lookup_related(result_name)
+        if result_json:
+            card_object.meld_result_card = Card.from_scryfall_json(result_json, 1)
+
+    return card_object
+
+
+@metrics.timed('resolve_related')
+def resolve_related(cards_json: Iterable[Dict],
+                    known: Optional[Dict[str, Dict]] = None) -> Dict[str, Optional[Dict]]:
+    """
+    The related-card stage: collects the meld results referenced by a set of
+    already fetched cards and resolves them all in one batch.
+
+    known maps lower-cased names to card JSON that is already at hand (e.g.
+    the rest of the deck), so a meld result that is itself in the deck is not
+    fetched again. Returns a table from lower-cased name to card JSON (or None).
+    """
+    known = known or {}
+    table: Dict[str, Optional[Dict]] = {}
+    wanted: List[str] = []
+    for scryfall_json in cards_json:
+        result_name = meld_result_name(scryfall_json)
+        if not result_name:
+            continue
+        key = result_name.lower()
+        if key in table:
+            continue
+        table[key] = known.get(key)
+        if key not in known:
+            wanted.append(key)
+
+    queries = [{'name': name, 'quantity': 1} for name in wanted]
+    table.update(zip(wanted, fetch_cards_batch(queries)))
+    return table
+
+
+def iter_deck_cards(card_queries: List[Dict],
+                    on_batch: Optional[Callable[[int, int, List[str]], None]] = None,
+                    cancel: Optional[threading.Event] = None) -> Iterator[Card]:
+    """
+    Turns parsed card queries into Card objects, yielding each one as soon as
+    its data has arrived.
+
+    Repeated printings within a section are only yielded once, and every
+    meld part gets its meld_result_card attached. Cards keep the section
+    they were listed in. Meld results are not fetched one by one: once
+    the first meld part turns up, it and every later card are held back until
+    the whole deck is in, then all related cards are resolved in one batch.
+    Decks without meld cards stream straight through. Setting cancel, or
+    closing the generator, stops the fetching early; see iter_cards_batch.
+    """
+    fetched = iter_cards_batch(card_queries, on_batch, cancel)
+    try:
+        yield from _assemble_deck(card_queries, fetched, cancel)
+    finally:
+        fetched.close()
+
+
+def _assemble_deck(card_queries: List[Dict], results: Iterable[Optional[Dict]],
+                   cancel: Optional[threading.Event] = None,
+                   related_cache: Optional[Dict[str, Optional[Dict]]] = None) -> Iterator[Card]:
+    """
+    The part of iter_deck_cards after fetching: results holds the card JSON
+    (or None) for each query, in order. Meld results already in related_cache
+    are not fetched again, and newly resolved ones are added to it.
+    """
+    processed_printings = set()
+    first_pass: Dict[str, Dict] = {}
+    held: List[Tuple[Dict, Dict]] = []
+
+    def build(query: Dict, scryfall_json: Dict, related: Dict[str, Optional[Dict]]) -> Optional[Card]:
+        # This check is only for lines that resolved to the same printing within one section.
+        key = (query.get('section', 'main'), scryfall_json.get('id') or scryfall_json.get('name'),
+               bool(query.get('foil')))
+        if key in processed_printings:
+            return None
+
+        card_object = build_card(scryfall_json, query['quantity'], lambda name: related.get(name.lower()),
+                                 key[0])
+
+        # We ONLY add the card we just processed, not its partners.
+        processed_printings.add(key)
+        return card_object
+
+    for query, scryfall_json in zip(card_queries, results):
+        if not scryfall_json:
+            continue
+        first_pass[scryfall_json.get('name', '').lower()] = scryfall_json
+
+        if held or meld_result_name(scryfall_json):
+            held.append((query, scryfall_json))
+            continue
+        card_object = build(query, scryfall_json, {})
+        if card_object:
+            yield card_object
+
+    if not held or (cancel is not None and cancel.is_set()):
+        return
+    known = {name: card for name, card in (related_cache or {}).items() if card}
+    known.update(first_pass)
+    related = resolve_related((scryfall_json for _, scryfall_json in held), known=known)
+    if related_cache is not None:
+        related_cache.update(related)
+    for query, scryfall_json in held:
+        card_object = build(query, scryfall_json, related)
+        if card_object:
+            yield card_object
+
+
+class DeckSession:
+    """
+    Remembers the cards resolved by the last run, so re-processing an edited
+    decklist only fetches the lines that were added or changed.
+
+    Cards are remembered per query_key (name or exact printing), which does
+    not include the quantity: a quantity-only edit needs no network at all,
+    and the shared renderer's memo means only the changed cards are wrapped
+    again. Names that could not be found are retried on the next run.
+    Remembered cards expire like cached prices do: a run that starts more
+    than ttl seconds (default: the card cache's prices TTL) after the
+    oldest remembered card was fetched forgets them all and fetches again.
+    A session is meant to be used by one thread at a time.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+        self._resolved: Dict[tuple, Dict] = {}
+        self._related: Dict[str, Optional[Dict]] = {}
+        self._since: Optional[float] = None
+        self.last_reused = 0
+        self.last_fetched = 0
+
+    def clear(self):
+        """Forgets every remembered card, e.g. to pick up new prices."""
+        self._resolved.clear()
+        self._related.clear()
+        self._since = None
+
+    def _expire(self):
+        ttl = self.ttl
+        if ttl is None:
+            cache = get_card_cache()
+            ttl = cache.prices_ttl if cache else PRICES_TTL
+        if self._since is not None and time.time() - self._since > ttl:
+            self.clear()
+
+    def iter_cards(self, card_queries: List[Dict],
+                   on_batch: Optional[Callable[[int, int, List[str]], None]] = None,
+                   cancel: Optional[threading.Event] = None) -> Iterator[Card]:
+        """Like iter_deck_cards, but only fetches queries the previous run did not resolve."""
+        self._expire()
+        if self._since is None:
+            self._since = time.time()
+        keys = [query_key(query) for query in card_queries]
+        have = [key in self._resolved for key in keys]
+        missing = [query for query, known in zip(card_queries, have) if not known]
+        fetched = iter_cards_batch(missing, on_batch, cancel) if missing else iter(())
+        self.last_fetched = len({key for key, known in zip(keys, have) if not known})
+        self.last_reused = len({key for key, known in zip(keys, have) if known})
+
+        resolved: Dict[tuple, Dict] = {}
+
+        def results() -> Iterator[Optional[Dict]]:
+            for key, known in zip(keys, have):
+                card = self._resolved[key] if known else next(fetched, None)
+                if card is not None:
+                    resolved[key] = card
+                yield card
+
+        try:
+            yield from _assemble_deck(card_queries, results(), cancel, self._related)
+        finally:
+            if missing:
+                fetched.close()
+
+        if cancel is not None and cancel.is_set():
+            self._resolved.update(resolved)
+        else:
+            # Only the latest run is remembered.
+            self._resolved = resolved
@@ -0,0 +1,371 @@
+# prices.py
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import metrics
+from api_client import fetch_prices, get_card_cache, resolve_card_ids, set_card_cache, set_offline_store
+from batch_cli import iter_decklists
+from bulk_data import OfflineStore, default_store_path, iter_bulk_cards
+from card_cache import PRICES_TTL, SQL_BATCH, default_cache_dir
+from parser import UNCOUNTED_SECTIONS, parse_decklist
+
+# ----- Tweakables -----
+# Currency -> (price field, foil price field, symbol). MTGO tickets have no foil price.
+CURRENCIES = {
+    'eur': ('eur', 'eur_foil', '€'),
+    'usd': ('usd', 'usd_foil', '$'),
+    'tix': ('tix', None, 'TIX '),
+}
+# The Scryfall price fields kept in the history, as integer cents.
+HISTORY_FIELDS = ('usd', 'usd_foil', 'usd_etched', 'eur', 'eur_foil', 'tix')
+TOP_CARDS = 10
+
+
+def _cents(value: Optional[str]) -> Optional[int]:
+    return round(float(value) * 100) if value else None
+
+
+class PriceHistory:
+    """
+    A compact per-card price history in SQLite.
+
+    Every price field is stored as integer cents, and a card gets a new row
+    only when one of its prices moved since the last row, so refreshing a
+    20,000-card collection every day grows the file by the cards whose
+    price actually changed.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        if path is None:
+            os.makedirs(default_cache_dir(), exist_ok=True)
+            path = os.path.join(default_cache_dir(), "price_history.sqlite3")
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        columns = ", ".join(f"{name} INTEGER" for name in HISTORY_FIELDS)
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS price_history (
+                card_id  TEXT NOT NULL,
+                observed INTEGER NOT NULL,
+                {columns},
+                PRIMARY KEY (card_id, observed)
+            ) WITHOUT ROWID
+        """)
+
+    def close(self):
+        self._conn.close()
+
+    def latest(self, card_ids: Iterable[str]) -> Dict[str, Tuple]:
+        """Returns {id: (observed, *cents)} of the newest row of each card that has one."""
+        ids = list(dict.fromkeys(card_ids))
+        found = {}
+        for start in range(0, len(ids), SQL_BATCH):
+            chunk = ids[start:start + SQL_BATCH]
+            # SQLite takes the other columns from the row that holds the MAX().
+            rows = self._conn.execute(
+                f"SELECT card_id, MAX(observed), {', '.join(HISTORY_FIELDS)} FROM price_history "
+                f"WHERE card_id IN ({','.join('?' * len(chunk))}) GROUP BY card_id", chunk
+            )
+            for row in rows:
+                found[row[0]] = row[1:]
+        return found
+
+    def record(self, observations: Dict[str, Tuple[Dict, float]]) -> int:
+        """
+        Records {id: (prices, observed timestamp)} and returns the number of
+        rows written. Prices equal to a card's latest row, and observations
+        older than it, are skipped.
+        """
+        latest = self.latest(observations)
+        rows = []
+        for card_id, (prices, observed) in observations.items():
+            cents = tuple(_cents(prices.get(name)) for name in HISTORY_FIELDS)
+            last = latest.get(card_id)
+            if last is not None and (last[0] >= int(observed) or last[1:] == cents):
+                continue
+            rows.append((card_id, int(observed)) + cents)
+        self._conn.executemany(
+            f"INSERT OR REPLACE INTO price_history VALUES ({','.join('?' * (2 + len(HISTORY_FIELDS)))})", rows
+        )
+        self._conn.commit()
+        return len(rows)
+
+    def history(self, card_id: str) -> List[Dict]:
+        """Every recorded change of a card's prices, oldest first, with prices as strings like Scryfall's."""
+        rows = self._conn.execute(
+            f"SELECT observed, {', '.join(HISTORY_FIELDS)} FROM price_history WHERE card_id = ? ORDER BY observed",
+            (card_id,)
+        )
+        return [{'observed': datetime.fromtimestamp(row[0], timezone.utc).isoformat(timespec='seconds'),
+                 **{name: None if cents is None else f"{cents / 100:.2f}"
+                    for name, cents in zip(HISTORY_FIELDS, row[1:])}}
+                for row in rows]
+
+
+def prices_from_dump(path: str, card_ids: Iterable[str]) -> Dict[str, Dict]:
+    """
+    Reads the 'prices' of the given ids from a Scryfall bulk-data file
+    (default_cards has one entry per printing). The file is streamed, so
+    nothing is downloaded and memory does not grow with its size.
+    """
+    wanted = set(card_ids)
+    found = {}
+    for card in iter_bulk_cards(path):
+        if card.get('id') in wanted:
+            found[card['id']] = card.get('prices') or {}
+            if len(found) == len(wanted):
+                break
+    return found
+
+
+def recent_store(max_age: float) -> Optional[OfflineStore]:
+    """
+    The bulk-data store at the default location (see bulk_data.py), if it
+    was built from a file updated less than max_age seconds ago, else None.
+    """
+    if not os.path.exists(default_store_path()):
+        return None
+    store = OfflineStore()
+    try:
+        updated = datetime.fromisoformat((store.version or "").replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        updated = None
+    if updated is None or time.time() - updated > max_age:
+        store.close()
+        return None
+    return store
+
+
+def prices_from_store(store: OfflineStore, card_ids: Iterable[str]) -> Dict[str, Dict]:
+    """Reads the 'prices' of the given ids from an offline store; ids it does not hold are left out."""
+    found = {}
+    for card_id in card_ids:
+        card = store.get_by_id(card_id)
+        if card:
+            found[card_id] = card.get('prices') or {}
+    return found
+
+
+def refresh_prices(card_ids: List[str], dump: Optional[str] = None, history: Optional[PriceHistory] = None,
+                   on_batch=None, store: Optional[OfflineStore] = None) -> Tuple[Dict[str, Dict], Dict]:
+    """
+    Returns the prices of every card id, refreshing only the ones whose
+    cached prices have expired (or that are not cached), plus a report of
+    what was refreshed.
+
+    Stale prices are read from a bulk-data dump if one is given. Otherwise
+    they are taken from store (a recent offline store, see recent_store) as
+    far as it holds them, and the rest are fetched in /cards/collection
+    batches (see api_client.fetch_prices). Scryfall has no price-only
+    endpoint, so that last path downloads each stale card in full. A card
+    whose refresh failed keeps its last cached prices. Everything observed
+    is recorded in history, if given.
+    """
+    ids = list(dict.fromkeys(card_ids))
+    cache = get_card_cache()
+    known = cache.get_prices(ids) if cache else {}
+    stale = cache.stale_price_ids(ids) if cache else ids
+    now = time.time()
+
+    start = time.perf_counter()
+    if dump:
+        fresh = prices_from_dump(dump, stale)
+    else:
+        fresh = prices_from_store(store, stale) if store else {}
+    from_files = len(fresh)
+    if cache and fresh:
+        cache.update_prices(fresh)
+    if not dump:
+        fresh.update(fetch_prices([card_id for card_id in stale if card_id not in fresh], on_batch=on_batch))
+    seconds = time.perf_counter() - start
+
+    observations = dict(known)
+    observations.update((card_id, (prices, now)) for card_id, prices in fresh.items())
+    report = {'cards': len(ids), 'stale': len(stale), 'refreshed': len(fresh),
+              'downloaded': len(fresh) - from_files, 'failed': len(stale) - len(fresh),
+              'seconds': round(seconds, 3)}
+    if history is not None:
+        report['history_rows'] = history.record(observations)
+    return {card_id: prices for card_id, (prices, _) in observations.items()}, report
+
+
+def value_deck(card_queries: List[Dict], card_ids: List[Optional[str]], prices: Dict[str, Dict],
+               currency: str = 'eur') -> Dict:
+    """
+    Values one deck or collection in a currency. Foil lines use the foil
+    price where the currency has one, falling back to the regular price.
+    Maybeboard lines are not counted.
+    Returns the total, the cards without a price, the names that could not
+    be resolved and the value per card (lines of the same card and finish
+    added up), most valuable first.
+    """
+    field, foil_field, _ = CURRENCIES[currency]
+    total = 0
+    lines: Dict[tuple, Dict] = {}
+    unpriced = 0
+    not_found = []
+    counted = [(query, card_id) for query, card_id in zip(card_queries, card_ids)
+               if query.get('section', 'main') not in UNCOUNTED_SECTIONS]
+    for query, card_id in counted:
+        if card_id is None:
+            not_found.append(query['name'])
+            continue
+        card_prices = prices.get(card_id) or {}
+        foil = bool(query.get('foil') and foil_field and card_prices.get(foil_field))
+        unit = _cents(card_prices.get(foil_field if foil else field))
+        if unit is None:
+            unpriced += query['quantity']
+            continue
+        total += unit * query['quantity']
+        line = lines.get((card_id, foil))
+        if line is None:
+            line = lines[(card_id, foil)] = {'id': card_id, 'name': query['name'], 'quantity': 0, 'foil': foil,
+                                             'unit_price': unit / 100, 'total': 0.0}
+        line['quantity'] += query['quantity']
+        line['total'] = round(unit * line['quantity'] / 100, 2)
+    return {'currency': currency, 'cards': sum(query['quantity'] for query, _ in counted),
+            'total': total / 100, 'unpriced_cards': unpriced, 'not_found': not_found,
+            'lines': sorted(lines.values(), key=lambda line: -line['total'])}
+
+
+def value_decks(decks: Dict[str, List[Dict]], currency: str = 'eur', dump: Optional[str] = None,
+                history: Optional[PriceHistory] = None, on_batch=None,
+                store: Optional[OfflineStore] = None) -> Dict:
+    """
+    Values every deck and the collection as a whole. Card ids are resolved
+    once for all decks, mostly from the card cache, and each distinct card's
+    price is refreshed at most once (see refresh_prices for dump and store).
+    """
+    all_queries = [query for queries in decks.values() for query in queries]
+    start = time.perf_counter()
+    all_ids = resolve_card_ids(all_queries)
+    resolve_seconds = time.perf_counter() - start
+    prices, refresh = refresh_prices([card_id for card_id in all_ids if card_id], dump, history, on_batch, store)
+    refresh['resolve_seconds'] = round(resolve_seconds, 3)
+
+    result = {'currency': currency, 'refresh': refresh, 'decks': {}}
+    position = 0
+    for name, queries in decks.items():
+        ids = all_ids[position:position + len(queries)]
+        position += len(queries)
+        deck = value_deck(queries, ids, prices, currency)
+        del deck['lines']
+        result['decks'][name] = deck
+    result['collection'] = value_deck(all_queries, all_ids, prices, currency)
+    return result
+
+
+def _money(amount: float, symbol: str) -> str:
+    return f"{symbol}{amount:,.2f}"
+
+
+def format_valuation(result: Dict, top: int = TOP_CARDS) -> str:
+    """A plain-text table of deck totals, the collection total and its most valuable lines."""
+    symbol = CURRENCIES[result['currency']][2]
+    decks = result['decks']
+    width = max([len(name) for name in decks] + [len("Collection")])
+    lines = [f"{'Deck'.ljust(width)}  {'Cards':>6}  {'Value':>12}"]
+    for name, deck in decks.items():
+        note = f"   ({deck['unpriced_cards']} without a price)" if deck['unpriced_cards'] else ""
+        lines.append(f"{name.ljust(width)}  {deck['cards']:>6}  {_money(deck['total'], symbol):>12}{note}")
+    collection = result['collection']
+    lines.append("-" * (width + 22))
+    lines.append(f"{'Collection'.ljust(width)}  {collection['cards']:>6}  {_money(collection['total'], symbol):>12}")
+    if collection['lines'][:top]:
+        lines.append("")
+        lines.append("Most valuable:")
+        for line in collection['lines'][:top]:
+            foil = " (foil)" if line['foil'] else ""
+            lines.append(f"  {line['quantity']}x {line['name']}{foil}: {_money(line['total'], symbol)}")
+    if collection['not_found']:
+        lines.append("")
+        lines.append(f"Not found: {', '.join(sorted(set(collection['not_found'])))}")
+    refresh = result['refresh']
+    lines.append("")
+    lines.append(f"Prices: {refresh['cards']} cards, {refresh['refreshed']} refreshed, "
+                 f"{refresh['cards'] - refresh['stale']} still fresh"
+                 + (f", {refresh['failed']} could not be refreshed" if refresh['failed'] else ""))
+    return "\n".join(lines) + "\n"
+
+
+def main(argv: Optional[List[str]] = None):
+    arg_parser = argparse.ArgumentParser(description="Value decks and collections with refreshed card prices.")
+    arg_parser.add_argument("sources", nargs="*",
+                            help="Decklist files, directories of .txt decklists, glob patterns or .jsonl files.")
+    arg_parser.add_argument("--currency", choices=sorted(CURRENCIES), default='eur')
+    arg_parser.add_argument("--dump", metavar="FILE",
+                            help="Refresh stale prices from this Scryfall bulk-data file instead of the API. "
+                                 "Without it, a store imported by bulk_data.py from a file newer than the "
+                                 "price TTL is used first, and only the cards it lacks are downloaded.")
+    arg_parser.add_argument("--api", action="store_true",
+                            help="Refresh stale prices from the API even if a recent bulk-data store exists. "
+                                 "Scryfall has no price-only endpoint, so every stale card is downloaded in full.")
+    arg_parser.add_argument("--offline", metavar="DB",
+                            help="Take every card and price from a store built by bulk_data.py.")
+    arg_parser.add_argument("--max-age", type=float, metavar="HOURS",
+                            help="Refresh cached prices older than this (default: the card cache's price TTL).")
+    arg_parser.add_argument("--top", type=int, default=TOP_CARDS, help="Most valuable lines to list.")
+    arg_parser.add_argument("--json", metavar="FILE", help="Also write the full valuation, every line included.")
+    arg_parser.add_argument("--history-db", metavar="FILE", help="Price history database (default: in the cache dir).")
+    arg_parser.add_argument("--history", metavar="NAME", help="Print the recorded price history of a card and exit.")
+    arg_parser.add_argument("--metrics", metavar="FILE",
+                            help="Write request counters and per-stage timings of the run to this JSON file.")
+    args = arg_parser.parse_args(argv)
+    if not args.sources and not args.history:
+        arg_parser.error("the decklists to value are required, unless --history is given")
+
+    if args.metrics:
+        metrics.enable()
+    if args.offline:
+        # The store answers everything, prices included; there is nothing to cache.
+        set_offline_store(OfflineStore(args.offline))
+        set_card_cache(None)
+    elif args.max_age is not None and get_card_cache():
+        get_card_cache().prices_ttl = args.max_age * 60 * 60
+    store = None
+    if not (args.offline or args.dump or args.api):
+        cache = get_card_cache()
+        store = recent_store(cache.prices_ttl if cache else PRICES_TTL)
+    history = PriceHistory(args.history_db)
+
+    if args.history:
+        card_id = resolve_card_ids([{'name': args.history, 'quantity': 1}])[0]
+        if card_id is None:
+            print(f"Error: Card '{args.history}' not found.", file=sys.stderr)
+            sys.exit(1)
+        json.dump(history.history(card_id), sys.stdout, indent=2)
+        print()
+        return
+
+    decks = {}
+    for source in args.sources:
+        for name, text in iter_decklists(source):
+            # Decks of different sources can share a name (a/deck.txt, b/deck.txt).
+            while name in decks:
+                name += '_'
+            queries = parse_decklist(text)
+            if queries:
+                decks[name] = queries
+    if not decks:
+        print("No decklists found.", file=sys.stderr)
+        sys.exit(1)
+
+    result = value_decks(decks, args.currency, dump=args.dump, history=history, store=store)
+    history.close()
+    if store:
+        store.close()
+    print(format_valuation(result, args.top), end="")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+    if args.metrics:
+        metrics.write_report(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# service.py
+import argparse
+import json
+import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import metrics
+from api_client import get_card_cache, set_offline_store
+from bulk_data import OfflineStore
+from formatter import WIDTH, format_deck_as_text
+from parser import parse_decklist
+from pipeline import iter_deck_cards
+
+# ----- Tweakables -----
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 1024 * 1024
+MAX_WIDTH = 200
+
+
+def format_decklist(decklist_text: str, width: int = WIDTH) -> Dict:
+    """
+    Parses, resolves and formats one decklist, as main.py does, and returns
+    the report with its card counts.
+    """
+    card_queries = parse_decklist(decklist_text)
+    deck = list(iter_deck_cards(card_queries)) if card_queries else []
+    return {
+        'report': format_deck_as_text(deck, width=width),
+        'unique_cards': len(deck),
+        'total_cards': sum(card.quantity for card in deck),
+        'lines': len(card_queries),
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    GET  /health   service and card cache statistics (JSON)
+    GET  /metrics  Prometheus metrics (start with --metrics)
+    POST /parse    decklist in the body -> parsed card queries (JSON)
+    POST /format   decklist in the body -> report; as text/plain, or as JSON
+                   if the request was JSON ({"decklist": ..., "width": ...})
+    """
+    protocol_version = "HTTP/1.1"
+    started = time.time()
+    served = 0
+    _served_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_json(self, status: int, body: Dict):
+        self._send(status, json.dumps(body, ensure_ascii=False).encode('utf-8'), 'application/json; charset=utf-8')
+
+    def _error(self, status: int, message: str):
+        self._send_json(status, {'error': message})
+
+    def _read_request(self) -> Optional[Dict]:
+        """The decklist and options of a POST, or None if an error was already sent."""
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # Without a usable length the body cannot be skipped, so the connection cannot be reused.
+            self.close_connection = True
+            self._error(400, "Invalid Content-Length header.")
+            return None
+        if length > MAX_BODY_BYTES:
+            # The body is left unread; closing keeps it from being parsed as the next request.
+            self.close_connection = True
+            self._error(413, f"Decklists are limited to {MAX_BODY_BYTES} bytes.")
+            return None
+        body = self.rfile.read(length).decode('utf-8', errors='replace')
+        options = {k: v[-1] for k, v in parse_qs(urlsplit(self.path).query).items()}
+
+        if self.headers.get('Content-Type', '').startswith('application/json'):
+            try:
+                data = json.loads(body or '{}')
+            except ValueError as err:
+                self._error(400, f"Invalid JSON: {err}")
+                return None
+            if not isinstance(data, dict) or not isinstance(data.get('decklist'), str):
+                self._error(400, "Expected an object with a 'decklist' string.")
+                return None
+            options.update({k: v for k, v in data.items() if k != 'decklist'})
+            options['json'] = True
+            body = data['decklist']
+
+        try:
+            width = int(options.get('width', WIDTH))
+        except (TypeError, ValueError):
+            width = 0
+        if not 20 <= width <= MAX_WIDTH:
+            self._error(400, f"width must be between 20 and {MAX_WIDTH}.")
+            return None
+        return {'decklist': body, 'width': width, 'json': options.get('json', False)}
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/health':
+            cache = get_card_cache()
+            self._send_json(200, {
+                'status': 'ok',
+                'uptime_seconds': round(time.time() - self.started, 3),
+                'requests_served': _Handler.served,
+                'card_cache': cache.stats() if cache else None,
+            })
+        elif path == '/metrics':
+            self._send(200, metrics.prometheus_text().encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8')
+        else:
+            self._error(404, f"Unknown path: {path}")
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        if path not in ('/parse', '/format'):
+            self._error(404, f"Unknown path: {path}")
+            return
+        request = self._read_request()
+        if request is None:
+            return
+        with self._served_lock:
+            _Handler.served += 1
+
+        try:
+            with metrics.timer('service_' + path[1:]):
+                if path == '/parse':
+                    self._send_json(200, {'cards': parse_decklist(request['decklist'])})
+                    return
+                result = format_decklist(request['decklist'], request['width'])
+        except Exception as err:
+            self._error(500, f"Could not process the decklist: {err}")
+            return
+
+        if request['json']:
+            self._send_json(200, result)
+        else:
+            self._send(200, result['report'].encode('utf-8'), 'text/plain; charset=utf-8')
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def get_request(self):
+            # BaseHTTPRequestHandler expects a (host, port) client address.
+            request, _ = super().get_request()
+            return request, ('local', 0)
+
+
+def make_server(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, socket_path: Optional[str] = None):
+    """
+    Creates the HTTP server, listening on host:port or, if socket_path is
+    given, on a Unix domain socket. Call serve_forever() on the result.
+    """
+    _Handler.started = time.time()
+    if socket_path:
+        if not hasattr(socketserver, 'UnixStreamServer'):
+            raise OSError("Unix domain sockets are not available on this platform.")
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return _UnixHTTPServer(socket_path, _Handler)
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Serve decklist formatting over local HTTP, sharing one warm card cache, "
+                    "connection pool and Scryfall rate limit between all clients.")
+    arg_parser.add_argument("--host", default=DEFAULT_HOST)
+    arg_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    arg_parser.add_argument("--socket", metavar="PATH", help="Listen on a Unix domain socket instead of TCP.")
+    arg_parser.add_argument("--offline", metavar="DB",
+                            help="Answer every lookup from a store built by bulk_data.py instead of the API.")
+    arg_parser.add_argument("--metrics", action="store_true", help="Collect metrics for GET /metrics.")
+    args = arg_parser.parse_args()
+
+    if args.metrics:
+        metrics.enable()
+    if args.offline:
+        set_offline_store(OfflineStore(args.offline))
+    get_card_cache()  # Open the cache up front rather than on the first request.
+
+    server = make_server(args.host, args.port, args.socket)
+    where = args.socket or f"http://{args.host}:{args.port}"
+    print(f"Serving decklist formatting on {where} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+# snapshot.py
+import json
+import mmap
+import os
+import struct
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from models import Card, CardData, CardFace, RelatedPart
+
+MAGIC = b"MTGSNAP\x00"
+VERSION = 3
+NONE = 0xFFFFFFFF  # A missing string or link.
+
+# Every table is an array of fixed-size little-endian records, so record i
+# of any table is read with one unpack_from at a computed offset.
+_HEADER = struct.Struct("<8sI" + "QI" * 9)
+_FACE = struct.Struct("<8I")      # name, mana_cost, type_line, oracle_text, power, toughness, loyalty, image_url
+_PART = struct.Struct("<4I")      # id, component, name, type_line
+_CARD = struct.Struct("<5If5I")   # id, name, colors, eur, rarity, mana_value, first face, faces, first part, parts, usd
+_ENTRY = struct.Struct("<5I")     # card, quantity, meld result card, meld result quantity, section
+_QUERY = struct.Struct("<6I")     # quantity, name, section, set, collector_number, foil
+_DECK = struct.Struct("<8I")      # name, source, text, first entry, entries, first query, queries, reserved
+_OFFSET = struct.Struct("<I")
+
+_TABLES = ('strings', 'blob', 'faces', 'parts', 'cards', 'entries', 'queries', 'decks', 'meta')
+
+
+@dataclass
+class SnapshotDeck:
+    """One resolved deck: its cards, the parsed queries they came from, and where it came from."""
+    name: str
+    cards: List[Card]
+    queries: List[Dict] = field(default_factory=list)
+    source: str = ""
+    text: str = ""
+
+
+def decklist_text(card_queries: List[Dict]) -> str:
+    """Writes parsed queries back out as a decklist that parse_decklist reads the same way."""
+    lines = []
+    section = 'main'
+    for query in card_queries:
+        if query.get('section', 'main') != section:
+            section = query['section']
+            lines.append("")
+            lines.append(section.title())
+        line = f"{query['quantity']} {query['name']}"
+        if query.get('set'):
+            line += f" ({query['set'].upper()})"
+            if query.get('collector_number'):
+                line += f" {query['collector_number']}"
+        if query.get('foil'):
+            line += " *F*"
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+class _Writer:
+    def __init__(self):
+        self.strings: Dict[str, int] = {}
+        self.faces = bytearray()
+        self.parts = bytearray()
+        self.cards = bytearray()
+        self.entries = bytearray()
+        self.queries = bytearray()
+        self.decks = bytearray()
+        self.card_rows: Dict[CardData, int] = {}  # Holds on to the cards, so each is written once.
+        self.face_count = self.part_count = self.entry_count = self.query_count = 0
+
+    def string(self, value: Optional[str]) -> int:
+        if value is None:
+            return NONE
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        return index
+
+    def card(self, data: CardData) -> int:
+        row = self.card_rows.get(data)
+        if row is not None:
+            return row
+        s = self.string
+        first_face = self.face_count
+        for face in data.card_faces:
+            self.faces += _FACE.pack(s(face.name), s(face.mana_cost), s(face.type_line), s(face.oracle_text),
+                                     s(face.power), s(face.toughness), s(face.loyalty), s(face.image_url))
+        self.face_count += len(data.card_faces)
+        first_part = self.part_count
+        for part in data.all_parts or ():
+            self.parts += _PART.pack(s(part.id), s(part.component), s(part.name), s(part.type_line))
+        self.part_count += len(data.all_parts or ())
+        row = self.card_rows[data] = len(self.card_rows)
+        self.cards += _CARD.pack(s(data.id), s(data.name), s(",".join(data.colors)), s(data.price_eur),
+                                 s(data.rarity), data.mana_value, first_face, len(data.card_faces),
+                                 first_part, NONE if data.all_parts is None else len(data.all_parts),
+                                 s(data.price_usd))
+        return row
+
+    def deck(self, deck: SnapshotDeck):
+        s = self.string
+        first_entry, first_query = self.entry_count, self.query_count
+        for card in deck.cards:
+            meld = card.meld_result_card
+            self.entries += _ENTRY.pack(self.card(card.data), card.quantity,
+                                        self.card(meld.data) if meld else NONE, meld.quantity if meld else 0,
+                                        s(card.section))
+        for query in deck.queries:
+            self.queries += _QUERY.pack(query['quantity'], s(query['name']), s(query.get('section', 'main')),
+                                        s(query.get('set')), s(query.get('collector_number')),
+                                        int(bool(query.get('foil'))))
+        self.entry_count += len(deck.cards)
+        self.query_count += len(deck.queries)
+        self.decks += _DECK.pack(s(deck.name), s(deck.source), s(deck.text), first_entry, len(deck.cards),
+                                 first_query, len(deck.queries), 0)
+
+
+def write_snapshot(path: str, decks: Iterable[SnapshotDeck], metadata: Optional[Dict] = None) -> int:
+    """
+    Writes resolved decks to a snapshot file and returns the number of decks.
+
+    Every string (names, oracle text, image URLs, ...) is stored once in a
+    string table, and every distinct card once in a card table that decks
+    refer to by index, so a staple shared by 10,000 decks costs one record.
+    metadata is any JSON-serializable dict, e.g. where the decks came from.
+    """
+    writer = _Writer()
+    count = 0
+    for deck in decks:
+        writer.deck(deck)
+        count += 1
+
+    meta = dict(metadata or {})
+    meta.setdefault('created', datetime.now(timezone.utc).isoformat(timespec='seconds'))
+    meta['decks'] = count
+    meta['cards'] = len(writer.card_rows)
+
+    encoded = [value.encode('utf-8') for value in writer.strings]
+    offsets = bytearray(_OFFSET.pack(0))
+    position = 0
+    for value in encoded:
+        position += len(value)
+        offsets += _OFFSET.pack(position)
+    tables = {
+        'strings': (bytes(offsets), len(encoded)),
+        'blob': (b"".join(encoded), position),
+        'faces': (writer.faces, writer.face_count),
+        'parts': (writer.parts, writer.part_count),
+        'cards': (writer.cards, len(writer.card_rows)),
+        'entries': (writer.entries, writer.entry_count),
+        'queries': (writer.queries, writer.query_count),
+        'decks': (writer.decks, count),
+        'meta': (json.dumps(meta, ensure_ascii=False).encode('utf-8'), 0),
+    }
+
+    header_fields = []
+    position = _HEADER.size
+    for name in _TABLES:
+        data, length = tables[name]
+        header_fields += [position, length if name != 'meta' else len(data)]
+        position += len(data)
+
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, *header_fields))
+        for name in _TABLES:
+            f.write(tables[name][0])
+    os.replace(tmp, path)
+    return count
+
+
+class Snapshot:
+    """
+    A snapshot file opened for reading.
+
+    The file is memory-mapped and nothing is decoded up front: deck(name)
+    reads that deck's records and only the cards and strings it refers to,
+    so re-rendering one deck of a 10,000-deck archive touches a few pages
+    of the file. Cards come back exactly as they were saved: the usual
+    shared CardData objects where those still match, separate ones where
+    the card (e.g. its price) has changed since.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # An empty file cannot be mapped.
+            self._file.close()
+            raise ValueError(f"{path} is not a deck snapshot.")
+        if len(self._map) < _HEADER.size or self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a deck snapshot.")
+        fields = _HEADER.unpack_from(self._map, 0)
+        if fields[1] != VERSION:
+            self.close()
+            raise ValueError(f"{path} is a version {fields[1]} snapshot; this version reads version {VERSION}.")
+        self._tables = {name: (fields[2 + 2 * i], fields[3 + 2 * i]) for i, name in enumerate(_TABLES)}
+        self._strings: Dict[int, str] = {}
+        self._cards: Dict[int, CardData] = {}
+        self._names: Optional[Dict[str, int]] = None
+        self._metadata: Optional[Dict] = None
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> 'Snapshot':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._tables['decks'][1]
+
+    @property
+    def metadata(self) -> Dict:
+        if self._metadata is None:
+            offset, length = self._tables['meta']
+            self._metadata = json.loads(self._map[offset:offset + length].decode('utf-8'))
+        return self._metadata
+
+    def _record(self, table: str, layout: struct.Struct, index: int) -> tuple:
+        return layout.unpack_from(self._map, self._tables[table][0] + index * layout.size)
+
+    def _string(self, index: int) -> Optional[str]:
+        if index == NONE:
+            return None
+        value = self._strings.get(index)
+        if value is None:
+            start, end = struct.unpack_from("<II", self._map, self._tables['strings'][0] + index * _OFFSET.size)
+            blob = self._tables['blob'][0]
+            value = self._strings[index] = self._map[blob + start:blob + end].decode('utf-8')
+        return value
+
+    def _card(self, row: int) -> CardData:
+        data = self._cards.get(row)
+        if data is not None:
+            return data
+        s = self._string
+        id_, name, colors, eur, rarity, mana_value, first_face, faces, first_part, parts, usd = \
+            self._record('cards', _CARD, row)
+        card_faces = tuple(CardFace(*(s(i) for i in self._record('faces', _FACE, first_face + n)))
+                           for n in range(faces))
+        all_parts = None if parts == NONE else tuple(
+            RelatedPart(*(s(i) for i in self._record('parts', _PART, first_part + n))) for n in range(parts))
+        colors = s(colors)
+        data = self._cards[row] = CardData._from_fields(
+            s(id_), s(name), tuple(colors.split(",")) if colors else (), s(eur), s(rarity),
+            card_faces, all_parts, mana_value, s(usd))
+        return data
+
+    def deck_names(self) -> List[str]:
+        """The name of every deck, in the order they were written."""
+        return list(self._index())
+
+    def _index(self) -> Dict[str, int]:
+        if self._names is None:
+            self._names = {}
+            for i in range(len(self)):
+                self._names.setdefault(self._string(self._record('decks', _DECK, i)[0]), i)
+        return self._names
+
+    def deck(self, key: Union[int, str] = 0) -> SnapshotDeck:
+        """Decodes one deck, by position or by name. Raises KeyError if there is no such deck."""
+        if isinstance(key, str):
+            key = self._index()[key]
+        if not 0 <= key < len(self):
+            raise KeyError(key)
+        s = self._string
+        name, source, text, first_entry, entries, first_query, queries, _ = self._record('decks', _DECK, key)
+
+        cards = []
+        for n in range(entries):
+            row, quantity, meld_row, meld_quantity, section = self._record('entries', _ENTRY, first_entry + n)
+            card = Card(self._card(row), quantity, section=s(section) or 'main')
+            if meld_row != NONE:
+                card.meld_result_card = Card(self._card(meld_row), meld_quantity)
+            cards.append(card)
+
+        card_queries = []
+        for n in range(queries):
+            quantity, qname, section, set_code, number, foil = self._record('queries', _QUERY, first_query + n)
+            card_queries.append({'quantity': quantity, 'name': s(qname), 'section': s(section),
+                                 'set': s(set_code), 'collector_number': s(number), 'foil': bool(foil)})
+        return SnapshotDeck(s(name), cards, card_queries, s(source) or "", s(text) or "")
+
+    def __iter__(self) -> Iterator[SnapshotDeck]:
+        for i in range(len(self)):
+            yield self.deck(i)
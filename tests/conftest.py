@@ -0,0 +1,48 @@
+# tests/conftest.py
+"""
+Shared fixtures. The tests run against benchmarks/scryfall_stub.py serving
+fixtures/bulk_sample.json, so none of them needs network access.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+FIXTURE = os.path.join(ROOT, "fixtures", "bulk_sample.json")
+
+
+@pytest.fixture
+def fixture_cards():
+    from bulk_data import iter_bulk_cards
+    return list(iter_bulk_cards(FIXTURE))
+
+
+@pytest.fixture
+def stub(monkeypatch, fixture_cards):
+    """
+    A running stub with the fixture's cards. The client is pointed at it with
+    no card cache, name index or offline store, and without rate limiting;
+    tests that want any of those set them up themselves.
+    """
+    import api_client
+    import fetch_engine
+    from scryfall_stub import StubScryfall
+
+    server = StubScryfall(fixture_cards)
+    monkeypatch.setattr(api_client, 'SCRYFALL_API_BASE', server.start())
+    monkeypatch.setattr(api_client, '_card_cache', None)
+    monkeypatch.setattr(api_client, '_name_index', None)
+    monkeypatch.setattr(api_client, '_offline_store', None)
+    monkeypatch.setattr(fetch_engine, 'limiter', fetch_engine.TokenBucket(1000))
+    yield server
+    server.stop()
+
+
+def requests_sent(server, endpoint=None) -> int:
+    stats = server.stats.snapshot()
+    return stats['by_endpoint'].get(endpoint, 0) if endpoint else stats['requests']
@@ -0,0 +1,90 @@
+# tests/test_fetch.py
+import time
+
+import api_client
+import fetch_engine
+from card_cache import CardCache
+from conftest import FIXTURE, requests_sent
+from parser import parse_decklist
+
+DECK = "4 Lightning Bolt\n1 Sol Ring (CMM) 400\n2 Counterspell\n1 Fire\n20 Mountain\n1 Not A Real Card\n"
+
+
+def _ids(cards):
+    return [card['id'] if card else None for card in cards]
+
+
+def test_cold_then_warm_cache(stub, tmp_path):
+    api_client.set_card_cache(CardCache(str(tmp_path / "cards.sqlite3")))
+    queries = parse_decklist(DECK)
+
+    cold = api_client.fetch_cards_batch(queries)
+    assert [card['name'] if card else None for card in cold] == [
+        "Lightning Bolt", "Sol Ring", "Counterspell", "Fire // Ice", "Mountain", None]
+    assert cold[1]['set'] == 'cmm'
+    sent = requests_sent(stub)
+    assert requests_sent(stub, 'collection') == 1
+
+    warm = api_client.fetch_cards_batch(queries)
+    assert _ids(warm) == _ids(cold)
+    # Only the card that does not exist is asked for again.
+    assert requests_sent(stub) - sent == 2
+
+
+def test_expired_entries(stub, tmp_path):
+    path = str(tmp_path / "cards.sqlite3")
+    api_client.set_card_cache(CardCache(path))
+    api_client.fetch_cards_batch(parse_decklist("4 Lightning Bolt\n"))
+    api_client.fetch_card_data("Sol Ring")
+
+    api_client.set_card_cache(CardCache(path, rules_ttl=-1, prices_ttl=-1))
+    # Single-card lookups kept an ETag and are answered with a 304 ...
+    assert api_client.fetch_card_data("Sol Ring")['name'] == "Sol Ring"
+    assert stub.stats.snapshot()['not_modified'] == 1
+    # ... while cards from a collection batch are fetched in a batch again.
+    assert api_client.fetch_cards_batch(parse_decklist("4 Lightning Bolt\n"))[0]['name'] == "Lightning Bolt"
+    assert requests_sent(stub, 'collection') == 2
+
+
+def test_collection_results_are_matched_by_card(stub):
+    collection = stub.collection
+    stub.collection = lambda identifiers: dict(collection(identifiers),
+                                               data=collection(identifiers)['data'][::-1])
+    names = ["Lightning Bolt", "Counterspell", "Llanowar Elves", "Mountain"]
+    cards = api_client.fetch_cards_batch([{'name': name, 'quantity': 1} for name in names])
+    assert [card['name'] for card in cards] == names
+
+
+def test_offline_store(stub, tmp_path):
+    from bulk_data import OfflineStore
+    store = OfflineStore(str(tmp_path / "store.sqlite3"))
+    assert store.import_file(FIXTURE, force=True)
+    api_client.set_offline_store(store)
+    try:
+        cards = api_client.fetch_cards_batch(parse_decklist("1 Sol Rnig\n1 Sol Ring (EOE) 245\n1 Insectile Aberration\n"))
+    finally:
+        api_client.set_offline_store(None)
+        api_client.set_name_index(None)
+        store.close()
+    assert [card['name'] for card in cards] == [
+        "Sol Ring", "Sol Ring", "Delver of Secrets // Insectile Aberration"]
+    assert cards[1]['set'] == 'eoe'
+    assert requests_sent(stub) == 0
+
+
+def test_closing_the_batch_drops_unsent_chunks(stub, monkeypatch):
+    from common import card_pool
+    from scryfall_stub import StubScryfall
+    pool = card_pool(600)
+    server = StubScryfall(pool)
+    monkeypatch.setattr(api_client, 'SCRYFALL_API_BASE', server.start())
+    monkeypatch.setattr(fetch_engine, 'limiter', fetch_engine.TokenBucket(5))
+    try:
+        batch = api_client.iter_cards_batch([{'name': card['name'], 'quantity': 1} for card in pool])
+        assert next(batch)['name'] == pool[0]['name']
+        batch.close()
+        time.sleep(1.5)
+        # 600 cards are 8 chunks; only those already let through by the limiter went out.
+        assert requests_sent(server, 'collection') < 8
+    finally:
+        server.stop()
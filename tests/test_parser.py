@@ -0,0 +1,61 @@
+# tests/test_parser.py
+import pytest
+
+from parser import parse_decklist, parse_line
+
+
+def _cards(text):
+    return [(card['quantity'], card['name'], card['section']) for card in parse_decklist(text)]
+
+
+@pytest.mark.parametrize("line, quantity, name", [
+    ("4 Lightning Bolt", 4, "Lightning Bolt"),
+    ("4x Lightning Bolt", 4, "Lightning Bolt"),
+    ("4xLightning Bolt", 4, "Lightning Bolt"),
+    ("4 x Llanowar Elves", 4, "Llanowar Elves"),
+    ("4X Llanowar Elves", 4, "Llanowar Elves"),
+    ("4 Xenagos, the Reveler", 4, "Xenagos, the Reveler"),
+    ("Sol Ring", 1, "Sol Ring"),
+])
+def test_quantity_prefixes(line, quantity, name):
+    card = parse_line(line)
+    assert (card['quantity'], card['name']) == (quantity, name)
+
+
+def test_printing_and_foil():
+    card = parse_line("1 Sol Ring (CMM) 400 *F*")
+    assert (card['name'], card['set'], card['collector_number'], card['foil']) == ("Sol Ring", 'cmm', '400', True)
+    card = parse_line("1 Sol Ring [EOE]")
+    assert (card['name'], card['set'], card['collector_number']) == ("Sol Ring", 'eoe', None)
+
+
+def test_bracketed_names_are_not_printings():
+    card = parse_line("1 B.F.M. (Big Furry Monster)")
+    assert (card['name'], card['set']) == ("B.F.M. (Big Furry Monster)", None)
+
+
+def test_section_headers():
+    text = ("About\nName Burn\n\nCommander\n1 Jace, the Mind Sculptor\n\nDeck\n4 Lightning Bolt\n\n"
+            "Sideboard (2)\n2 Counterspell\n// Maybeboard\n1 Fire // Ice\nSB: 1 Mountain\n")
+    assert _cards(text) == [
+        (1, "Jace, the Mind Sculptor", 'commander'),
+        (4, "Lightning Bolt", 'main'),
+        (2, "Counterspell", 'sideboard'),
+        (1, "Fire // Ice", 'maybeboard'),
+        (1, "Mountain", 'sideboard'),
+    ]
+
+
+def test_mtgo_blank_line_sideboard():
+    assert _cards("4 Lightning Bolt\n20 Mountain\n\n3 Counterspell\n") == [
+        (4, "Lightning Bolt", 'main'), (20, "Mountain", 'main'), (3, "Counterspell", 'sideboard')]
+    # More groups, or a second group too large for a sideboard, stay in the main deck.
+    assert {section for _, _, section in _cards("4 Lightning Bolt\n\n20 Mountain\n\n3 Counterspell\n")} == {'main'}
+    assert {section for _, _, section in _cards("4 Lightning Bolt\n\n20 Mountain\n")} == {'main'}
+
+
+def test_lines_of_one_printing_are_merged():
+    text = "2 Sol Ring\n1 sol ring\n1 Sol Ring (CMM) 400\n1 Sol Ring (CMM) 400 *F*\nSideboard\n1 Sol Ring\n"
+    cards = parse_decklist(text)
+    assert [(c['quantity'], c['set'], c['foil'], c['section']) for c in cards] == [
+        (3, None, False, 'main'), (1, 'cmm', False, 'main'), (1, 'cmm', True, 'main'), (1, None, False, 'sideboard')]
@@ -0,0 +1,35 @@
+# tests/test_snapshot.py
+from formatter import format_deck_as_text
+from parser import parse_decklist
+from pipeline import iter_deck_cards
+from snapshot import Snapshot, SnapshotDeck, decklist_text, write_snapshot
+
+DECK = ("Commander\n1 Jace, the Mind Sculptor\n\nDeck\n4 Lightning Bolt\n1 Sol Ring (CMM) 400 *F*\n"
+        "1 Bruna, the Fading Light\n1 Gisela, the Broken Blade\n\nSideboard\n2 Counterspell\n\n"
+        "Maybeboard\n1 Fire // Ice\n")
+
+
+def test_round_trip(stub, tmp_path):
+    queries = parse_decklist(DECK)
+    cards = list(iter_deck_cards(queries))
+    path = str(tmp_path / "decks.snapshot")
+    assert write_snapshot(path, [SnapshotDeck("burn", cards, queries, "decks/burn.txt", DECK)],
+                          {'source': "decks"}) == 1
+
+    with Snapshot(path) as snapshot:
+        assert snapshot.deck_names() == ["burn"]
+        assert snapshot.metadata['source'] == "decks"
+        deck = snapshot.deck("burn")
+
+    assert [(c.name, c.quantity, c.section) for c in deck.cards] == [
+        (c.name, c.quantity, c.section) for c in cards]
+    assert [c.meld_result_card.name for c in deck.cards if c.meld_result_card] == [
+        "Brisela, Voice of Nightmares"] * 2
+    assert deck.queries == queries
+    assert (deck.source, deck.text) == ("decks/burn.txt", DECK)
+    assert format_deck_as_text(deck.cards) == format_deck_as_text(cards)
+
+
+def test_decklist_text_parses_back():
+    queries = parse_decklist(DECK)
+    assert parse_decklist(decklist_text(queries)) == queries